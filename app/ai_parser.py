@@ -2,6 +2,8 @@ import logging
 import re
 from typing import Any, Optional
 
+from app.lead_fields import normalize_phone
+
 
 logger = logging.getLogger(__name__)
 
@@ -17,6 +19,11 @@ class AIParserService:
             len(raw_text) if raw_text else 0,
         )
 
+        return self.parse(raw_text)
+
+    def parse(self, raw_text: str) -> dict[str, Any]:
+        """Синхронный разбор — годится и для пула процессов (bulk import)."""
+
         if not raw_text:
             return self._empty()
 
@@ -152,14 +159,7 @@ class AIParserService:
         return None, None
 
     def _normalize_phone(self, phone: str) -> str:
-        digits = re.sub(r"\D", "", phone)
-
-        if digits.startswith("8") and len(digits) == 11:
-            return "+7" + digits[1:]
-        if digits.startswith("7") and len(digits) == 11:
-            return "+7" + digits[1:]
-
-        return phone
+        return normalize_phone(phone)
 
     # =====================================================
     # WEIGHT / HEIGHT (только из подтверждения)
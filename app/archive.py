@@ -0,0 +1,135 @@
+import asyncio
+import logging
+import uuid
+from datetime import timedelta
+from typing import Callable
+
+from sqlalchemy import delete, func, insert, literal_column, select
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from app.models import ArchivedLead, Lead, LeadStatus
+from app.partitions import ensure_partition_for, ensure_partitions
+
+
+logger = logging.getLogger(__name__)
+
+
+# Финальные статусы: такие лиды бот больше не трогает
+CLOSED_STATUSES = (LeadStatus.rejected, LeadStatus.operated)
+
+LEAD_COLUMNS = [column.name for column in Lead.__table__.columns]
+
+
+class LeadArchiver:
+    """
+    Переносит закрытые старые лиды из leads в leads_archive, чтобы рабочая
+    таблица и её индексы оставались маленькими и помещались в shared_buffers.
+    """
+
+    def __init__(self, archive_after_days: int, batch_size: int = 1000) -> None:
+        self.archive_after = timedelta(days=archive_after_days)
+        self.batch_size = batch_size
+
+    async def _move(self, session: AsyncSession, source, target, where) -> int:
+        # DELETE ... RETURNING + INSERT одним запросом: строка не теряется и не дублируется
+        candidates = (
+            select(source.c.id, source.c.created_at)
+            .where(*where)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)
+            .cte("candidates")
+        )
+        moved = (
+            delete(source)
+            .where(
+                source.c.id == candidates.c.id,
+                source.c.created_at == candidates.c.created_at,
+            )
+            .returning(*[source.c[name] for name in LEAD_COLUMNS])
+            .cte("moved")
+        )
+        stmt = insert(target).from_select(
+            LEAD_COLUMNS,
+            select(*[moved.c[name] for name in LEAD_COLUMNS]),
+        ).returning(literal_column("1"))
+
+        result = await session.execute(stmt)
+        return len(result.all())
+
+    async def archive_batch(self, session: AsyncSession) -> int:
+        leads = Lead.__table__
+        count = await self._move(
+            session,
+            leads,
+            ArchivedLead.__table__,
+            (
+                leads.c.manager_status.in_(CLOSED_STATUSES),
+                leads.c.updated_at < func.now() - self.archive_after,
+            ),
+        )
+        await session.commit()
+        return count
+
+    async def restore(self, session: AsyncSession, lead_id: uuid.UUID) -> bool:
+        """
+        Возвращает лид из архива в leads (для поздних нажатий на статус).
+        Не коммитит: вызывающий продолжает работу в той же транзакции.
+        """
+
+        archive = ArchivedLead.__table__
+        result = await session.execute(select(archive.c.created_at).where(archive.c.id == lead_id).limit(1))
+        created_at = result.scalar_one_or_none()
+        if created_at is None:
+            return False
+
+        # секция старого месяца могла не создаваться — без неё лид лёг бы в leads_default
+        await ensure_partition_for(await session.connection(), "leads", created_at.date())
+        count = await self._move(session, archive, Lead.__table__, (archive.c.id == lead_id,))
+        return count > 0
+
+    async def run(
+        self,
+        engine: AsyncEngine,
+        session_factory: Callable[[], AsyncSession],
+        interval_seconds: int,
+    ) -> None:
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                async with session_factory() as session:
+                    oldest = await session.execute(select(func.min(Lead.created_at)))
+                    since = oldest.scalar_one_or_none()
+
+                async with engine.begin() as connection:
+                    await ensure_partitions(connection, "leads_archive", since=since.date() if since else None)
+
+                total = 0
+                while True:
+                    async with session_factory() as session:
+                        moved = await self.archive_batch(session)
+                    total += moved
+                    if moved < self.batch_size:
+                        break
+
+                if total:
+                    logger.info("Archived %s closed leads", total)
+            except Exception:
+                logger.exception("Lead archival failed")
+
+
+async def get_lead(
+    session: AsyncSession,
+    lead_id: uuid.UUID,
+    archiver: LeadArchiver | None = None,
+) -> Lead | None:
+    """Ищет лид в leads, а если его там нет — поднимает из архива."""
+
+    result = await session.execute(select(Lead).where(Lead.id == lead_id))
+    lead = result.scalar_one_or_none()
+
+    if lead is None and archiver is not None and await archiver.restore(session, lead_id):
+        logger.info("Lead %s restored from archive", lead_id)
+        result = await session.execute(select(Lead).where(Lead.id == lead_id))
+        lead = result.scalar_one_or_none()
+
+    return lead
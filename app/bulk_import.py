@@ -0,0 +1,422 @@
+import asyncio
+import csv
+import io
+import logging
+import multiprocessing
+import os
+import time
+import uuid
+import zipfile
+from collections import Counter
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.ai_parser import AIParserService
+from app.image_ingest import DEFAULT_MAX_PIXELS, ImageIngest, ImageRejected, image_size
+from app.lead_fields import calculate_bmi, normalize_phone
+from app.models import Manager
+from app.ocr_service import image_to_text
+from app.sheets_service import SheetsService
+from app.stats_service import StatsService
+
+
+logger = logging.getLogger(__name__)
+
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp"}
+COPY_CHUNK_SIZE = 1000
+PROGRESS_INTERVAL = 2.0
+
+# Заголовки CSV/XLSX (в т.ч. выгрузки из кабинета VK) -> ключ результата парсера
+HEADER_ALIASES = {
+    "name": "name",
+    "имя": "name",
+    "фио": "name",
+    "phone": "phone",
+    "телефон": "phone",
+    "номер телефона": "phone",
+    "telegram": "telegram",
+    "телеграм": "telegram",
+    "whatsapp": "whatsapp",
+    "max": "max",
+    "email": "email",
+    "e-mail": "email",
+    "почта": "email",
+    "weight": "weight_kg",
+    "вес": "weight_kg",
+    "height": "height_cm",
+    "рост": "height_cm",
+}
+
+LEAD_COPY_COLUMNS = [
+    "id",
+    "created_at",
+    "updated_at",
+    "source",
+    "name",
+    "phone",
+    "telegram_username",
+    "whatsapp",
+    "messenger_max",
+    "email",
+    "weight_kg",
+    "height_cm",
+    "bmi",
+    "lead_type",
+    "manager_id",
+    "manager_status",
+    "comment_from_admin",
+    "created_by",
+]
+
+EVENT_COPY_COLUMNS = ["lead_id", "created_at", "manager_id", "to_status", "changed_by"]
+
+
+# ================= Пул процессов =================
+
+_worker_parser: Optional[AIParserService] = None
+
+
+def _init_worker() -> None:
+    global _worker_parser
+    _worker_parser = AIParserService()
+
+
+def _ocr_and_parse(image_bytes: bytes, max_pixels: int = DEFAULT_MAX_PIXELS) -> dict[str, Any]:
+    """Выполняется в дочернем процессе: OCR + разбор одного скриншота."""
+
+    try:
+        raw_text = image_to_text(image_bytes, max_pixels)
+    except Exception:
+        return {}
+
+    if not raw_text.strip():
+        return {}
+
+    return _worker_parser.parse(raw_text)
+
+
+# ================= Результат =================
+
+@dataclass(slots=True)
+class ImportResult:
+    total: int = 0
+    imported: int = 0
+    duplicates: int = 0
+    failed: int = 0
+
+    def summary(self) -> str:
+        return (
+            f"Обработано: {self.total}\n"
+            f"Загружено: {self.imported}\n"
+            f"Дубликатов: {self.duplicates}\n"
+            f"Не распознано: {self.failed}"
+        )
+
+
+def _number(value: Any) -> Optional[float]:
+    if value in (None, ""):
+        return None
+    try:
+        return float(str(value).replace(",", "."))
+    except ValueError:
+        return None
+
+
+def _text(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+class BulkImportService:
+    def __init__(
+        self,
+        sheets_service: SheetsService,
+        stats_service: StatsService,
+        workers: int | None = None,
+        image_ingest: Optional[ImageIngest] = None,
+    ) -> None:
+        self.sheets_service = sheets_service
+        self.stats_service = stats_service
+        self.workers = workers or os.cpu_count() or 1
+        # общий с фото бюджет памяти под декодирование скриншотов
+        self.image_ingest = image_ingest
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _pool(self) -> ProcessPoolExecutor:
+        # пул создаётся при первой загрузке: обычной работе бота он не нужен
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+        return self._executor
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    # =========================================================
+    # SOURCES
+    # =========================================================
+
+    async def _parse_images(self, archive: zipfile.ZipFile) -> AsyncIterator[dict[str, Any]]:
+        members = [
+            info for info in archive.infolist()
+            if not info.is_dir() and os.path.splitext(info.filename)[1].lower() in IMAGE_EXTENSIONS
+        ]
+
+        loop = asyncio.get_running_loop()
+        pool = self._pool()
+        pending: set[asyncio.Future] = set()
+
+        async def recognize(data: bytes) -> dict[str, Any]:
+            if self.image_ingest is None:
+                return await loop.run_in_executor(pool, _ocr_and_parse, data)
+
+            width, height = image_size(data)
+            try:
+                async with self.image_ingest.reserve_memory(len(data), width, height):
+                    return await loop.run_in_executor(pool, _ocr_and_parse, data, self.image_ingest.max_pixels)
+            except ImageRejected:
+                return {}
+
+        # держим в работе не больше 2×workers картинок, чтобы не читать весь ZIP в память
+        for info in members:
+            if len(pending) >= self.workers * 2:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+
+            pending.add(asyncio.ensure_future(recognize(archive.read(info))))
+
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+    @staticmethod
+    def _table_rows(filename: str, data: bytes) -> Iterator[dict[str, Any]]:
+        if filename.endswith(".xlsx"):
+            from openpyxl import load_workbook
+
+            workbook = load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+            rows = workbook.active.iter_rows(values_only=True)
+        else:
+            text = data.decode("utf-8-sig", errors="replace")
+            dialect = csv.Sniffer().sniff(text[:4096], delimiters=",;\t")
+            rows = csv.reader(io.StringIO(text), dialect)
+
+        header = next(rows, None)
+        if not header:
+            return
+
+        keys = [HEADER_ALIASES.get(str(cell or "").strip().lower()) for cell in header]
+
+        for row in rows:
+            yield {key: value for key, value in zip(keys, row) if key}
+
+    # =========================================================
+    # NORMALIZE + DEDUPE
+    # =========================================================
+
+    @staticmethod
+    def _build_record(
+        parsed: dict[str, Any],
+        manager: Optional[Manager],
+        created_by: Optional[int],
+        created_at: datetime,
+        source_name: str,
+    ) -> Optional[dict[str, Any]]:
+        phone = _text(parsed.get("phone"))
+        telegram = _text(parsed.get("telegram"))
+        whatsapp = _text(parsed.get("whatsapp"))
+        messenger_max = _text(parsed.get("max"))
+        email = _text(parsed.get("email"))
+        name = _text(parsed.get("name"))
+
+        if phone:
+            phone = normalize_phone(phone)
+        if whatsapp:
+            whatsapp = normalize_phone(whatsapp)
+        if telegram and not telegram.startswith("@"):
+            telegram = f"@{telegram}"
+        if email:
+            email = email.lower()
+
+        weight = _number(parsed.get("weight_kg"))
+        height = _number(parsed.get("height_cm"))
+
+        has_contact = any([phone, telegram, whatsapp, messenger_max, email])
+        if not has_contact and not name:
+            return None
+
+        return {
+            "id": uuid.uuid4(),
+            "created_at": created_at,
+            "updated_at": created_at,
+            "source": "import",
+            "name": name or "-",
+            "phone": phone,
+            "telegram_username": telegram,
+            "whatsapp": whatsapp,
+            "messenger_max": messenger_max,
+            "email": email,
+            "weight_kg": weight,
+            "height_cm": height,
+            "bmi": calculate_bmi(weight, height),
+            "lead_type": "hot" if has_contact else "cold",
+            "manager_id": manager.id if manager and has_contact else None,
+            "manager_status": "new",
+            "comment_from_admin": f"Импорт: {source_name}",
+            "created_by": created_by,
+        }
+
+    @staticmethod
+    def _dedupe_keys(record: dict[str, Any]) -> list[tuple[str, str]]:
+        keys = []
+        for column in ("phone", "telegram_username", "whatsapp", "messenger_max", "email"):
+            if record[column]:
+                keys.append((column, record[column].lower()))
+        return keys
+
+    # =========================================================
+    # WRITE
+    # =========================================================
+
+    async def _copy_chunk(
+        self,
+        session: AsyncSession,
+        records: list[dict[str, Any]],
+        created_at: datetime,
+    ) -> None:
+        counts = Counter((record["manager_id"], record["lead_type"]) for record in records)
+
+        # счётчики первыми: этот запрос открывает транзакцию asyncpg,
+        # и COPY ниже идут в неё же
+        await self.stats_service.record_leads_created_bulk(session, created_at, counts)
+
+        connection = await session.connection()
+        raw = await connection.get_raw_connection()
+        driver = raw.driver_connection
+
+        await driver.copy_records_to_table(
+            "leads",
+            records=[tuple(record[column] for column in LEAD_COPY_COLUMNS) for record in records],
+            columns=LEAD_COPY_COLUMNS,
+        )
+        await driver.copy_records_to_table(
+            "lead_status_events",
+            records=[
+                (record["id"], created_at, record["manager_id"], "new", record["created_by"])
+                for record in records
+            ],
+            columns=EVENT_COPY_COLUMNS,
+        )
+
+        await session.commit()
+
+    @staticmethod
+    def _sheet_payload(record: dict[str, Any], manager_name: Optional[str]) -> dict[str, Any]:
+        return {
+            **record,
+            "id": str(record["id"]),
+            "created_at": record["created_at"].isoformat(),
+            "manager_name": manager_name,
+            "tg_link": None,
+        }
+
+    # =========================================================
+    # ENTRY POINT
+    # =========================================================
+
+    async def import_document(
+        self,
+        session: AsyncSession,
+        filename: str,
+        data: bytes,
+        manager: Optional[Manager],
+        created_by: Optional[int],
+        progress: Callable[[str], Awaitable[Any]],
+    ) -> ImportResult:
+        filename = filename.lower()
+        result = ImportResult()
+        created_at = datetime.now(timezone.utc)
+
+        seen: set[tuple[str, str]] = set()
+        chunk: list[dict[str, Any]] = []
+        imported: list[dict[str, Any]] = []
+        last_progress = time.monotonic()
+
+        async def parsed_items() -> AsyncIterator[dict[str, Any]]:
+            if filename.endswith(".zip"):
+                with zipfile.ZipFile(io.BytesIO(data)) as archive:
+                    async for parsed in self._parse_images(archive):
+                        yield parsed
+            elif filename.endswith((".csv", ".xlsx")):
+                for row in self._table_rows(filename, data):
+                    yield row
+            else:
+                raise ValueError("Поддерживаются ZIP со скриншотами, CSV и XLSX.")
+
+        async for parsed in parsed_items():
+            result.total += 1
+
+            record = self._build_record(parsed, manager, created_by, created_at, filename)
+            if record is None:
+                result.failed += 1
+            else:
+                keys = self._dedupe_keys(record)
+                if any(key in seen for key in keys):
+                    result.duplicates += 1
+                else:
+                    seen.update(keys)
+                    chunk.append(record)
+
+            if len(chunk) >= COPY_CHUNK_SIZE:
+                await self._copy_chunk(session, chunk, created_at)
+                result.imported += len(chunk)
+                imported.extend(chunk)
+                chunk = []
+
+            if time.monotonic() - last_progress >= PROGRESS_INTERVAL:
+                last_progress = time.monotonic()
+                await progress(f"⏳ Импорт…\n{result.summary()}")
+
+        if chunk:
+            await self._copy_chunk(session, chunk, created_at)
+            result.imported += len(chunk)
+            imported.extend(chunk)
+
+        # -------- Google Sheets: один append на каждую таблицу --------
+        manager_name = manager.name if manager else None
+
+        await self.sheets_service.append_many_to_master(
+            [self._sheet_payload(record, manager_name if record["manager_id"] else None) for record in imported]
+        )
+
+        if manager and manager.manager_sheet_id:
+            await self.sheets_service.append_many_to_manager_sheet(
+                manager.manager_sheet_id,
+                [self._sheet_payload(record, manager_name) for record in imported if record["manager_id"]],
+            )
+
+        logger.info(
+            "Bulk import %s: total=%s imported=%s duplicates=%s failed=%s",
+            filename,
+            result.total,
+            result.imported,
+            result.duplicates,
+            result.failed,
+        )
+
+        return result
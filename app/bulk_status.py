@@ -0,0 +1,86 @@
+import uuid
+from typing import Optional
+
+from aiogram.fsm.state import State, StatesGroup
+from sqlalchemy import any_, bindparam, select, update
+from sqlalchemy.dialects.postgresql import ARRAY, UUID
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.archive import CLOSED_STATUSES
+from app.models import Lead, LeadStatus, Manager
+
+
+# больше кнопок в одной клавиатуре Telegram не покажет удобно
+BULK_LIMIT = 40
+
+
+class BulkFSM(StatesGroup):
+    selecting = State()
+    choosing_status = State()
+
+
+async def find_bulk_manager(
+    session: AsyncSession,
+    chat_id: int,
+    user_id: Optional[int],
+    name: Optional[str] = None,
+) -> Optional[Manager]:
+    """Менеджер по имени (для администратора), группе менеджера или его telegram_id."""
+
+    if name:
+        condition = Manager.name == name
+    else:
+        condition = (Manager.manager_group_chat_id == chat_id) | (Manager.telegram_id == user_id)
+
+    result = await session.execute(select(Manager).where(Manager.active.is_(True), condition))
+    return result.scalars().first()
+
+
+async def open_leads(session: AsyncSession, manager_id: uuid.UUID, limit: int = BULK_LIMIT) -> list[Lead]:
+    result = await session.execute(
+        select(Lead)
+        .where(Lead.manager_id == manager_id, Lead.manager_status.not_in(CLOSED_STATUSES))
+        .order_by(Lead.created_at.desc())
+        .limit(limit)
+    )
+    return list(result.scalars().all())
+
+
+def lead_label(lead: Lead) -> str:
+    contact = lead.phone or lead.telegram_username or lead.whatsapp or lead.messenger_max or lead.email or "-"
+    return f"{lead.name} · {contact} · {lead.manager_status.value}"[:60]
+
+
+async def change_statuses(
+    session: AsyncSession,
+    lead_ids: list[uuid.UUID],
+    status: LeadStatus,
+) -> list[tuple[Lead, LeadStatus]]:
+    """
+    Один UPDATE ... WHERE id = ANY(:ids) в транзакции вызывающего.
+    Старый статус отдаёт CTE с FOR UPDATE: параллельный клик по карточке
+    ждёт нас, а не подменяет old_status. Возвращает пары (лид, старый
+    статус); лиды, уже стоящие в status, не трогаются и не возвращаются.
+    """
+
+    leads = Lead.__table__
+    ids = bindparam("lead_ids", lead_ids, type_=ARRAY(UUID(as_uuid=True)))
+
+    old = (
+        select(leads.c.id, leads.c.created_at, leads.c.manager_status.label("old_status"))
+        .where(leads.c.id == any_(ids), leads.c.manager_status != status)
+        .with_for_update()
+        .cte("old")
+    )
+    stmt = (
+        update(leads)
+        .where(leads.c.id == old.c.id, leads.c.created_at == old.c.created_at)
+        .values(manager_status=status)
+        .returning(*leads.c, old.c.old_status)
+    )
+
+    result = await session.execute(stmt)
+    return [
+        (Lead(**{column.name: row._mapping[column.name] for column in leads.c}), row.old_status)
+        for row in result.all()
+    ]
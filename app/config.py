@@ -1,3 +1,4 @@
+import hashlib
 import os
 from dataclasses import dataclass
 from typing import List
@@ -14,11 +15,62 @@ class Settings:
     bot_token: str
     admin_ids: List[int]
     database_url: str
+    database_direct_url: str
     openai_api_key: str
     openai_model: str
     google_service_account_json: str
     master_sheet_id: str
     log_level: str
+    stats_timezone: str
+    stats_reconcile_interval: int
+    partition_maintenance_interval: int
+    status_events_retention_months: int
+    archive_after_days: int
+    archive_interval: int
+    archive_batch_size: int
+    import_workers: int
+    photo_queue_enabled: bool
+    job_workers: int
+    fsm_storage: str
+    fsm_cache_ttl: float
+    fsm_state_ttl_hours: int
+    fsm_sweep_interval: int
+    run_mode: str
+    webhook_base_url: str
+    webhook_path: str
+    webhook_secret: str
+    webhook_host: str
+    webhook_port: int
+    webhook_workers: int
+    telegram_api_url: str
+    shard_workers: int
+    shard_base_port: int
+    heavy_concurrency: int
+    heavy_queue_limit: int
+    outbound_global_rate: float
+    outbound_chat_rate: float
+    outbound_group_per_minute: float
+    metrics_host: str
+    metrics_port: int
+    job_worker_metrics_port: int
+    profile_sample_rate: float
+    profile_slow_threshold: float
+    profile_dir: str
+    profile_keep: int
+    sheets_timeout: float
+    telegram_timeout: float
+    breaker_failures: int
+    breaker_reset_seconds: float
+    image_max_pixels: int
+    image_memory_limit_mb: int
+    auto_assign: bool
+    routing_reconcile_interval: int
+    reminder_window_seconds: int
+    db_pool_profile: str
+    db_pool_size: int
+    db_max_overflow: int
+    db_pgbouncer: bool
+    db_pgbouncer_prepared: bool
 
 
 def _build_database_url() -> str:
@@ -37,6 +89,14 @@ def _build_database_url() -> str:
     return f"postgresql+asyncpg://{user}:{password}@{host}:{port}/{name}"
 
 
+def _build_direct_database_url(database_url: str) -> str:
+    # LISTEN/NOTIFY не работает через PgBouncer в transaction pooling — нужен прямой адрес
+    direct_url = os.getenv("DATABASE_DIRECT_URL")
+    if direct_url:
+        return direct_url.replace("postgresql://", "postgresql+asyncpg://")
+    return database_url
+
+
 def _parse_admin_ids(raw_ids: str) -> List[int]:
     if not raw_ids:
         return []
@@ -48,13 +108,90 @@ def get_settings() -> Settings:
     if not bot_token:
         raise ValueError("BOT_TOKEN is not set in environment.")
 
+    run_mode = os.getenv("RUN_MODE", "polling").lower()
+    webhook_base_url = os.getenv("WEBHOOK_BASE_URL", "")
+    if run_mode == "webhook" and not webhook_base_url:
+        raise ValueError("WEBHOOK_BASE_URL is not set in environment (required for RUN_MODE=webhook).")
+
+    database_url = _build_database_url()
+
     return Settings(
         bot_token=bot_token,
         admin_ids=_parse_admin_ids(os.getenv("ADMIN_IDS", "")),
-        database_url=_build_database_url(),
+        database_url=database_url,
+        database_direct_url=_build_direct_database_url(database_url),
         openai_api_key=os.getenv("OPENAI_API_KEY", ""),
         openai_model=os.getenv("OPENAI_MODEL", "gpt-4o-mini"),
         google_service_account_json=os.getenv("GOOGLE_SERVICE_ACCOUNT_JSON", ""),
         master_sheet_id=os.getenv("MASTER_SHEET_ID", ""),
         log_level=os.getenv("LOG_LEVEL", "INFO"),
+        stats_timezone=os.getenv("STATS_TIMEZONE", "Europe/Moscow"),
+        stats_reconcile_interval=int(os.getenv("STATS_RECONCILE_INTERVAL", "3600")),
+        partition_maintenance_interval=int(os.getenv("PARTITION_MAINTENANCE_INTERVAL", "21600")),
+        # 0 — не отсоединять старые секции журнала статусов
+        status_events_retention_months=int(os.getenv("STATUS_EVENTS_RETENTION_MONTHS", "0")),
+        archive_after_days=int(os.getenv("ARCHIVE_AFTER_DAYS", "90")),
+        archive_interval=int(os.getenv("ARCHIVE_INTERVAL", "3600")),
+        archive_batch_size=int(os.getenv("ARCHIVE_BATCH_SIZE", "1000")),
+        # 0 — по числу ядер
+        import_workers=int(os.getenv("IMPORT_WORKERS", "0")),
+        photo_queue_enabled=os.getenv("PHOTO_QUEUE_ENABLED", "true").lower() in ("1", "true", "yes"),
+        # воркеры очереди внутри процесса бота; 0 — только отдельные `python -m app.job_worker`
+        job_workers=int(os.getenv("JOB_WORKERS", "2")),
+        # postgres — черновики общие для всех процессов; memory — только для локального запуска
+        fsm_storage=os.getenv("FSM_STORAGE", "postgres").lower(),
+        fsm_cache_ttl=float(os.getenv("FSM_CACHE_TTL", "30")),
+        fsm_state_ttl_hours=int(os.getenv("FSM_STATE_TTL_HOURS", "72")),
+        fsm_sweep_interval=int(os.getenv("FSM_SWEEP_INTERVAL", "3600")),
+        run_mode=run_mode,
+        webhook_base_url=webhook_base_url,
+        webhook_path=os.getenv("WEBHOOK_PATH", "/telegram/webhook"),
+        # по умолчанию секрет выводится из токена — одинаковый во всех процессах
+        webhook_secret=os.getenv("WEBHOOK_SECRET") or hashlib.sha256(bot_token.encode()).hexdigest()[:64],
+        webhook_host=os.getenv("WEBHOOK_HOST", "0.0.0.0"),
+        webhook_port=int(os.getenv("PORT") or os.getenv("WEBHOOK_PORT", "8080")),
+        webhook_workers=int(os.getenv("WEBHOOK_WORKERS", "1")),
+        # свой Bot API сервер (local bot-api или фейковый для нагрузочных тестов)
+        telegram_api_url=os.getenv("TELEGRAM_API_URL", ""),
+        # >0 — супервизор раздаёт апдейты N процессам по chat_id
+        shard_workers=int(os.getenv("SHARD_WORKERS", "0")),
+        shard_base_port=int(os.getenv("SHARD_BASE_PORT", "9100")),
+        # фото/импорт/экспорт одновременно и сколько их может ждать в очереди
+        heavy_concurrency=int(os.getenv("HEAVY_CONCURRENCY", "4")),
+        heavy_queue_limit=int(os.getenv("HEAVY_QUEUE_LIMIT", "20")),
+        # лимиты Telegram: ~30 msg/s на бота, 1 msg/s в личку, 20 msg/min в группу.
+        # При нескольких процессах общий лимит делится между ними.
+        outbound_global_rate=float(os.getenv("OUTBOUND_GLOBAL_RATE", "25")),
+        outbound_chat_rate=float(os.getenv("OUTBOUND_CHAT_RATE", "1")),
+        outbound_group_per_minute=float(os.getenv("OUTBOUND_GROUP_PER_MINUTE", "20")),
+        # 0 — без /metrics; воркеры и шарды слушают METRICS_PORT + номер
+        metrics_host=os.getenv("METRICS_HOST", "127.0.0.1"),
+        metrics_port=int(os.getenv("METRICS_PORT", "0")),
+        # /metrics отдельного воркера очереди (python -m app.job_worker); 0 — выключено
+        job_worker_metrics_port=int(os.getenv("JOB_WORKER_METRICS_PORT", "0")),
+        # профилирование выключено, пока не задана доля или порог (сек)
+        profile_sample_rate=float(os.getenv("PROFILE_SAMPLE_RATE", "0")),
+        profile_slow_threshold=float(os.getenv("PROFILE_SLOW_THRESHOLD", "0")),
+        profile_dir=os.getenv("PROFILE_DIR", "profiles"),
+        profile_keep=int(os.getenv("PROFILE_KEEP", "200")),
+        # дедлайны внешних вызовов и размыкатели по таблице/чату
+        sheets_timeout=float(os.getenv("SHEETS_TIMEOUT", "15")),
+        telegram_timeout=float(os.getenv("TELEGRAM_SEND_TIMEOUT", "10")),
+        breaker_failures=int(os.getenv("BREAKER_FAILURES", "3")),
+        breaker_reset_seconds=float(os.getenv("BREAKER_RESET_SECONDS", "60")),
+        # больше IMAGE_MAX_PIXELS фото уменьшается перед OCR; память на фото в обработке — на процесс
+        image_max_pixels=int(os.getenv("IMAGE_MAX_PIXELS", "12000000")),
+        image_memory_limit_mb=int(os.getenv("IMAGE_MEMORY_LIMIT_MB", "256")),
+        # горячие лиды сразу назначаются наименее загруженному менеджеру
+        auto_assign=os.getenv("AUTO_ASSIGN", "false").lower() in {"1", "true", "yes"},
+        routing_reconcile_interval=int(os.getenv("ROUTING_RECONCILE_INTERVAL", "60")),
+        # напоминания «перезвонить»: как далеко вперёд читать ждущие за раз
+        reminder_window_seconds=int(os.getenv("REMINDER_WINDOW_SECONDS", "300")),
+        # пул соединений: профиль (bot / worker / default) и переопределения размера;
+        # DB_PGBOUNCER — DATABASE_URL смотрит на PgBouncer в transaction pooling
+        db_pool_profile=os.getenv("DB_POOL_PROFILE", ""),
+        db_pool_size=int(os.getenv("DB_POOL_SIZE", "0")),
+        db_max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "-1")),
+        db_pgbouncer=os.getenv("DB_PGBOUNCER", "false").lower() in {"1", "true", "yes"},
+        db_pgbouncer_prepared=os.getenv("DB_PGBOUNCER_PREPARED", "false").lower() in {"1", "true", "yes"},
     )
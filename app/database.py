@@ -1,32 +1,263 @@
+import asyncio
+import logging
+import uuid
+from collections import defaultdict
 from collections.abc import AsyncGenerator
+from dataclasses import dataclass
+from typing import Any, Optional
 
+from sqlalchemy import event, select, text
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 
-from app.models import Base
+from app.config import Settings
+from app.models import Base, FsmRecord, Lead, Manager
+from app.partitions import PARTITIONED_TABLES, ensure_partitions
+
+
+logger = logging.getLogger(__name__)
 
 
 engine = None
 SessionLocal = None
+# конфигурация пула текущего engine (init_database)
+pool_settings = None
+
+# события пула с запуска процесса: connect / checkout / invalidate
+pool_events: dict[str, int] = defaultdict(int)
+
+
+@dataclass(slots=True, frozen=True)
+class PoolProfile:
+    size: int
+    max_overflow: int
+    # сколько ждать свободное соединение, с
+    timeout: float
+    # пересоздавать соединения старше, с (-1 — никогда)
+    recycle: int
+
+
+POOL_PROFILES = {
+    # дефолты SQLAlchemy — скрипты и бенчмарки
+    "default": PoolProfile(size=5, max_overflow=10, timeout=30, recycle=-1),
+    # процесс бота: обработчики и фоновые задачи; апдейт лучше уронить, чем держать
+    "bot": PoolProfile(size=10, max_overflow=10, timeout=10, recycle=1800),
+    # отдельный воркер очереди: по соединению на воркер и запас на доставку
+    "worker": PoolProfile(size=4, max_overflow=4, timeout=30, recycle=1800),
+}
+
+
+@dataclass(slots=True, frozen=True)
+class PoolConfig:
+    profile: PoolProfile
+    # PgBouncer в режиме transaction pooling
+    pgbouncer: bool = False
+    # за PgBouncer 1.21+ (max_prepared_statements): подготовленные запросы с уникальными именами
+    pgbouncer_prepared: bool = False
+
+
+def pool_config(settings: Settings, default_profile: str = "default") -> PoolConfig:
+    """Профиль из DB_POOL_PROFILE (иначе — профиль процесса) и переопределения из окружения."""
+
+    name = settings.db_pool_profile or default_profile
+    if name not in POOL_PROFILES:
+        raise ValueError(f"Unknown DB_POOL_PROFILE {name!r}, expected one of {', '.join(POOL_PROFILES)}")
+
+    profile = POOL_PROFILES[name]
+    profile = PoolProfile(
+        size=settings.db_pool_size or profile.size,
+        max_overflow=profile.max_overflow if settings.db_max_overflow < 0 else settings.db_max_overflow,
+        timeout=profile.timeout,
+        recycle=profile.recycle,
+    )
+    return PoolConfig(profile, settings.db_pgbouncer, settings.db_pgbouncer_prepared)
+
+
+def _connect_args(pool: PoolConfig) -> dict[str, Any]:
+    connect_args: dict[str, Any] = {"ssl": None}
+    if not pool.pgbouncer:
+        return connect_args
+
+    # диалект asyncpg готовит запросы и без кэша; имена вида __asyncpg_stmt_N__
+    # совпали бы у клиентских соединений за одним серверным
+    connect_args["prepared_statement_name_func"] = _statement_name
+    if not pool.pgbouncer_prepared:
+        # серверное соединение меняется между транзакциями — кэшировать нечего
+        connect_args["statement_cache_size"] = 0
+        connect_args["prepared_statement_cache_size"] = 0
+    return connect_args
+
+
+def _statement_name() -> str:
+    return f"__asyncpg_{uuid.uuid4()}__"
+
+
+def _caches_statements(pool: PoolConfig) -> bool:
+    return not pool.pgbouncer or pool.pgbouncer_prepared
+
+
+def _count(name: str):
+    def listener(*args: Any) -> None:
+        pool_events[name] += 1
+    return listener
+
+
+# Расширения Postgres, которые нужны индексам из app.models
+EXTENSIONS = (
+    "pg_trgm",
+)
+
+# Колонки, добавленные в модели уже существующих таблиц: create_all их не добавит
+ADDED_COLUMNS = (
+    ("managers", "routing_weight", "double precision NOT NULL DEFAULT 1"),
+    ("managers", "available_from", "time"),
+    ("managers", "available_to", "time"),
+    ("leads", "card_chat_id", "bigint"),
+    ("leads", "card_message_id", "bigint"),
+    ("leads_archive", "card_chat_id", "bigint"),
+    ("leads_archive", "card_message_id", "bigint"),
+)
 
 
-def init_database(database_url: str) -> None:
+def init_database(database_url: str, pool: Optional[PoolConfig] = None) -> None:
     global engine
     global SessionLocal
+    global pool_settings
+
+    pool = pool or PoolConfig(POOL_PROFILES["default"])
+    pool_settings = pool
 
     engine = create_async_engine(
-    database_url,
-    echo=False,
-    pool_pre_ping=True,
-    connect_args={"ssl": None}
-)
+        database_url,
+        echo=False,
+        pool_pre_ping=True,
+        pool_size=pool.profile.size,
+        max_overflow=pool.profile.max_overflow,
+        pool_timeout=pool.profile.timeout,
+        pool_recycle=pool.profile.recycle,
+        connect_args=_connect_args(pool),
+    )
+    for name in ("connect", "checkout", "invalidate"):
+        event.listen(engine.sync_engine, name, _count(name))
+
     SessionLocal = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
 
+# ================= WARM-UP =================
+
+def hot_queries() -> list[Any]:
+    """
+    Запросы горячего пути обработчиков (FSM, менеджеры, лид по id).
+    Кэш подготовленных запросов ключуется текстом SQL — параметры не важны.
+    """
+
+    nothing = uuid.UUID(int=0)
+    return [
+        select(FsmRecord.state, FsmRecord.data).where(FsmRecord.key == ""),
+        select(Manager).where(Manager.active.is_(True)),
+        select(Manager).where(Manager.id == nothing),
+        select(Manager.manager_sheet_id).where(Manager.id == nothing),
+        select(Lead).where(Lead.id == nothing),
+    ]
+
+
+async def warm_up_pool(connections: Optional[int] = None) -> None:
+    """
+    Открывает connections соединений (по умолчанию — размер пула) и готовит
+    на каждом горячие запросы: первый апдейт не платит за TCP/TLS/auth и PREPARE.
+    За PgBouncer без кэша подготовленных запросов готовить нечего — только соединения.
+    """
+
+    if engine is None:
+        raise RuntimeError("Database is not initialized. Call init_database() first.")
+
+    count = connections or engine.pool.size()
+    statements = hot_queries() if pool_settings is None or _caches_statements(pool_settings) else []
+    opened = 0
+    all_open = asyncio.Event()
+
+    async def prepare() -> None:
+        nonlocal opened
+        try:
+            async with engine.connect() as connection:
+                # держим соединение, пока не откроются все — иначе пул отдаст одно и то же
+                opened += 1
+                if opened == count:
+                    all_open.set()
+                for stmt in statements:
+                    await connection.execute(stmt)
+                await all_open.wait()
+        except BaseException:
+            # одно упавшее соединение не должно держать остальные
+            all_open.set()
+            raise
+
+    await asyncio.gather(*(prepare() for _ in range(count)))
+    logger.info("Database pool warmed up: %s connections", count)
+
+
+def _create_missing_indexes(sync_connection) -> None:
+    # create_all создаёт индексы только вместе с новой таблицей,
+    # поэтому индексы, добавленные позже, досоздаём отдельно.
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(sync_connection, checkfirst=True)
+
+
+def _schema_objects() -> list[str]:
+    names = []
+    for table in Base.metadata.sorted_tables:
+        names.append(table.name)
+        names.extend(index.name for index in table.indexes)
+    return names
+
+
+async def _schema_is_current(connection) -> bool:
+    """Все таблицы, индексы и добавленные колонки уже есть — DDL на старте не нужен."""
+
+    names = _schema_objects()
+    result = await connection.execute(
+        text("SELECT count(DISTINCT relname) FROM pg_class WHERE relname = ANY(:names)"),
+        {"names": names},
+    )
+    if result.scalar_one() != len(set(names)):
+        return False
+
+    # несекционированная leads из старой версии — полный путь объяснит, что делать
+    result = await connection.execute(
+        text("SELECT count(*) FROM pg_class WHERE relkind = 'p' AND relname = ANY(:tables)"),
+        {"tables": list(PARTITIONED_TABLES)},
+    )
+    if result.scalar_one() != len(PARTITIONED_TABLES):
+        return False
+
+    columns = [f"{table}.{column}" for table, column, _ in ADDED_COLUMNS]
+    result = await connection.execute(
+        text(
+            "SELECT count(*) FROM information_schema.columns "
+            "WHERE table_schema = current_schema() AND table_name || '.' || column_name = ANY(:columns)"
+        ),
+        {"columns": columns},
+    )
+    return result.scalar_one() == len(columns)
+
+
 async def create_tables() -> None:
     if engine is None:
         raise RuntimeError("Database is not initialized. Call init_database() first.")
     async with engine.begin() as connection:
+        # обычный рестарт: один запрос к каталогу вместо create_all и проверки
+        # каждого индекса; секции досоздаёт фоновое обслуживание
+        if await _schema_is_current(connection):
+            return
+
+        for extension in EXTENSIONS:
+            await connection.execute(text(f"CREATE EXTENSION IF NOT EXISTS {extension}"))
         await connection.run_sync(Base.metadata.create_all)
+        for table, column, definition in ADDED_COLUMNS:
+            await connection.execute(text(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column} {definition}"))
+        await connection.run_sync(_create_missing_indexes)
+        for table in PARTITIONED_TABLES:
+            await ensure_partitions(connection, table)
 
 
 async def get_session() -> AsyncGenerator[AsyncSession, None]:
@@ -0,0 +1,288 @@
+import asyncio
+import csv
+import gzip
+import logging
+import os
+import uuid
+from collections.abc import AsyncIterator
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, timedelta
+from typing import Any, Optional
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import ArchivedLead, Lead, LeadStatus, Manager
+
+
+logger = logging.getLogger(__name__)
+
+
+# Бот может отправить документ до 50 МБ — режем на части с запасом
+MAX_PART_BYTES = 45 * 1024 * 1024
+# Размер XLSX нельзя проверить до save(), поэтому режем по строкам:
+# ~300 тыс. строк дают файл заметно меньше 50 МБ
+MAX_XLSX_ROWS = 300_000
+
+STREAM_BATCH_SIZE = 2000
+SIZE_CHECK_EVERY = 5000
+
+EXPORT_COLUMNS = [
+    "id",
+    "created_at",
+    "name",
+    "phone",
+    "telegram_username",
+    "whatsapp",
+    "messenger_max",
+    "email",
+    "weight_kg",
+    "height_cm",
+    "bmi",
+    "lead_type",
+    "manager_name",
+    "manager_status",
+    "comment_from_admin",
+    "updated_at",
+]
+
+
+@dataclass(slots=True)
+class ExportFilter:
+    manager_id: Optional[uuid.UUID] = None
+    statuses: list[LeadStatus] = field(default_factory=list)
+    date_from: Optional[date] = None
+    # включительно
+    date_to: Optional[date] = None
+    include_archive: bool = False
+    # границы дней from/to — по этому поясу (вызывающий ставит settings.stats_timezone)
+    timezone: str = "UTC"
+
+    def day_start(self, day: date) -> datetime:
+        return datetime.combine(day, time.min, tzinfo=ZoneInfo(self.timezone))
+
+
+def parse_export_args(args: list[str]) -> tuple[str, ExportFilter, Optional[str]]:
+    """
+    Разбирает аргументы вида:
+    xlsx status=rejected,operated manager=Марина from=2026-01-01 to=2026-01-31 archive
+    Возвращает формат, фильтр и имя менеджера (id подставляет вызывающий).
+    """
+
+    file_format = "csv"
+    filters = ExportFilter()
+    manager_name: Optional[str] = None
+
+    for arg in args:
+        key, _, value = arg.partition("=")
+        key = key.lower()
+
+        if not value:
+            if key in ("csv", "xlsx"):
+                file_format = key
+            elif key == "archive":
+                filters.include_archive = True
+            else:
+                raise ValueError(f"Неизвестный параметр: {arg}")
+        elif key == "status":
+            filters.statuses = [LeadStatus(item) for item in value.split(",") if item]
+        elif key == "manager":
+            manager_name = value
+        elif key == "from":
+            filters.date_from = date.fromisoformat(value)
+        elif key == "to":
+            filters.date_to = date.fromisoformat(value)
+        else:
+            raise ValueError(f"Неизвестный параметр: {arg}")
+
+    return file_format, filters, manager_name
+
+
+async def find_manager_id(session: AsyncSession, name: str) -> Optional[uuid.UUID]:
+    result = await session.execute(select(Manager.id).where(Manager.name == name))
+    return result.scalars().first()
+
+
+def _row(lead: Lead | ArchivedLead, manager_name: Optional[str]) -> list[Any]:
+    return [
+        str(lead.id),
+        lead.created_at.isoformat(),
+        lead.name,
+        lead.phone,
+        lead.telegram_username,
+        lead.whatsapp,
+        lead.messenger_max,
+        lead.email,
+        lead.weight_kg,
+        lead.height_cm,
+        lead.bmi,
+        lead.lead_type,
+        manager_name,
+        lead.manager_status.value,
+        lead.comment_from_admin,
+        lead.updated_at.isoformat(),
+    ]
+
+
+async def stream_rows(session: AsyncSession, filters: ExportFilter) -> AsyncIterator[list[Any]]:
+    """
+    Отдаёт строки выгрузки по одной, читая серверным курсором пачками
+    по STREAM_BATCH_SIZE — в памяти никогда не вся таблица.
+    """
+
+    models = (Lead, ArchivedLead) if filters.include_archive else (Lead,)
+
+    for model in models:
+        stmt = select(model, Manager.name).outerjoin(Manager, Manager.id == model.manager_id)
+
+        if filters.manager_id is not None:
+            stmt = stmt.where(model.manager_id == filters.manager_id)
+        if filters.statuses:
+            stmt = stmt.where(model.manager_status.in_(filters.statuses))
+        if filters.date_from is not None:
+            stmt = stmt.where(model.created_at >= filters.day_start(filters.date_from))
+        if filters.date_to is not None:
+            stmt = stmt.where(model.created_at < filters.day_start(filters.date_to + timedelta(days=1)))
+
+        stmt = stmt.order_by(model.created_at).execution_options(yield_per=STREAM_BATCH_SIZE)
+
+        result = await session.stream(stmt)
+        async for lead, manager_name in result:
+            yield _row(lead, manager_name)
+            # не копим ORM-объекты в identity map сессии
+            session.expunge(lead)
+
+
+class _CsvGzipParts:
+    """gzip CSV, который начинает новый файл, когда текущий подходит к лимиту."""
+
+    def __init__(self, directory: str, basename: str) -> None:
+        self.directory = directory
+        self.basename = basename
+        self.paths: list[str] = []
+        self._raw = None
+        self._text = None
+        self._writer = None
+        self._rows_in_part = 0
+
+    def _open_part(self) -> None:
+        self.close()
+        path = os.path.join(self.directory, f"{self.basename}_part{len(self.paths) + 1}.csv.gz")
+        self._raw = open(path, "wb")
+        self._text = gzip.open(self._raw, "wt", encoding="utf-8-sig", newline="")
+        self._writer = csv.writer(self._text)
+        self._writer.writerow(EXPORT_COLUMNS)
+        self._rows_in_part = 0
+        self.paths.append(path)
+
+    def write(self, row: list[Any]) -> None:
+        if self._writer is None:
+            self._open_part()
+
+        self._writer.writerow(row)
+        self._rows_in_part += 1
+
+        if self._rows_in_part % SIZE_CHECK_EVERY == 0 and self._raw.tell() >= MAX_PART_BYTES:
+            self._open_part()
+
+    def finish(self) -> None:
+        # пустая выгрузка — всё равно отдаём файл с заголовком
+        if not self.paths:
+            self._open_part()
+        self.close()
+
+    def close(self) -> None:
+        if self._text is not None:
+            self._text.close()
+            self._raw.close()
+            self._text = None
+            self._raw = None
+            self._writer = None
+
+
+class _XlsxParts:
+    """XLSX в режиме write_only: openpyxl сбрасывает строки на диск по мере записи."""
+
+    def __init__(self, directory: str, basename: str) -> None:
+        self.directory = directory
+        self.basename = basename
+        self.paths: list[str] = []
+        self._workbook = None
+        self._sheet = None
+        self._rows_in_part = 0
+
+    def _open_part(self) -> None:
+        # openpyxl нужен только для XLSX-выгрузки — не тянем его при старте бота
+        from openpyxl import Workbook
+
+        self.close()
+        self._workbook = Workbook(write_only=True)
+        self._sheet = self._workbook.create_sheet("leads")
+        self._sheet.append(EXPORT_COLUMNS)
+        self._rows_in_part = 0
+        self.paths.append(
+            os.path.join(self.directory, f"{self.basename}_part{len(self.paths) + 1}.xlsx")
+        )
+
+    def write(self, row: list[Any]) -> None:
+        if self._sheet is None or self._rows_in_part >= MAX_XLSX_ROWS:
+            self._open_part()
+
+        self._sheet.append(row)
+        self._rows_in_part += 1
+
+    def finish(self) -> None:
+        # пустая выгрузка — всё равно отдаём файл с заголовком
+        if not self.paths:
+            self._open_part()
+        self.close()
+
+    def close(self) -> None:
+        if self._workbook is not None:
+            self._workbook.save(self.paths[-1])
+            self._workbook = None
+            self._sheet = None
+
+
+def _write_batch(writer: _CsvGzipParts | _XlsxParts, batch: list[list[Any]]) -> None:
+    for row in batch:
+        writer.write(row)
+
+
+async def export_leads(
+    session: AsyncSession,
+    filters: ExportFilter,
+    directory: str,
+    file_format: str = "csv",
+) -> tuple[list[str], int]:
+    """
+    Пишет выгрузку в directory. Возвращает пути к файлам (частям) и число строк.
+    Сжатие gzip и сборка XLSX — в потоке пачками, чтобы не держать event loop.
+    """
+
+    basename = f"leads_{datetime.now():%Y%m%d_%H%M%S}"
+    if file_format == "xlsx":
+        writer = _XlsxParts(directory, basename)
+    elif file_format == "csv":
+        writer = _CsvGzipParts(directory, basename)
+    else:
+        raise ValueError(f"Unknown export format: {file_format}")
+
+    rows = 0
+    batch: list[list[Any]] = []
+    try:
+        async for row in stream_rows(session, filters):
+            batch.append(row)
+            if len(batch) >= STREAM_BATCH_SIZE:
+                await asyncio.to_thread(_write_batch, writer, batch)
+                rows += len(batch)
+                batch = []
+        await asyncio.to_thread(_write_batch, writer, batch)
+        rows += len(batch)
+    finally:
+        await asyncio.to_thread(writer.finish)
+
+    logger.info("Exported %s leads into %s file(s)", rows, len(writer.paths))
+
+    return writer.paths, rows
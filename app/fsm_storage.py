@@ -0,0 +1,266 @@
+import asyncio
+import json
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import Mapping
+from collections.abc import Callable
+from datetime import timedelta
+from typing import Any, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from sqlalchemy import delete, func, select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.config import Settings
+from app.metrics import stage
+from app.models import FsmRecord
+
+
+logger = logging.getLogger(__name__)
+
+
+NOTIFY_CHANNEL = "fsm_states"
+EMPTY_DATA = b"{}"
+
+
+def _dump(data: Mapping[str, Any]) -> bytes:
+    # без пробелов и \\u-экранирования кириллицы — черновик лида занимает ~200 байт
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def _load(raw: Optional[bytes]) -> dict[str, Any]:
+    return json.loads(raw) if raw else {}
+
+
+def _serialize_key(key: StorageKey) -> str:
+    return ":".join(
+        str(part or "")
+        for part in (
+            key.bot_id,
+            key.chat_id,
+            key.user_id,
+            key.thread_id,
+            getattr(key, "business_connection_id", None),
+            key.destiny,
+        )
+    )
+
+
+class _CacheEntry:
+    __slots__ = ("state", "data", "expires_at")
+
+    def __init__(self, state: Optional[str], data: dict[str, Any], expires_at: float) -> None:
+        self.state = state
+        self.data = data
+        self.expires_at = expires_at
+
+
+class PostgresStorage(BaseStorage):
+    """
+    FSM-хранилище aiogram в Postgres, чтобы черновики лидов переживали
+    рестарты и были видны всем процессам бота и воркерам очереди.
+
+    Чтение идёт через локальный LRU-кэш. Каждая запись шлёт NOTIFY,
+    и остальные процессы выбрасывают ключ из своих кэшей; если LISTEN
+    не запущен, устаревание ограничено cache_ttl.
+    """
+
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        cache_ttl: float = 30.0,
+        cache_size: int = 10_000,
+    ) -> None:
+        self.engine = engine
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self._cache: OrderedDict[str, _CacheEntry] = OrderedDict()
+        self._instance_id = uuid.uuid4().hex[:12]
+        self._listener = None
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    # =========================================================
+    # CACHE
+    # =========================================================
+
+    def _cache_get(self, key: str) -> Optional[_CacheEntry]:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at < time.monotonic():
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return entry
+
+    def _cache_put(self, key: str, state: Optional[str], data: dict[str, Any]) -> None:
+        if self.cache_ttl <= 0:
+            return
+        self._cache[key] = _CacheEntry(state, data, time.monotonic() + self.cache_ttl)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _on_notify(self, connection: Any, pid: int, channel: str, payload: str) -> None:
+        origin, _, key = payload.partition("|")
+        if origin != self._instance_id:
+            self._cache.pop(key, None)
+
+    def _on_listener_lost(self, connection: Any) -> None:
+        # без LISTEN чужие записи не видны — сбрасываем кэш и читаем из базы
+        logger.warning("FSM storage LISTEN connection lost, cache disabled")
+        self._cache.clear()
+        self.cache_ttl = 0
+        self._listener = None
+
+    async def start_listener(self, dsn: str) -> None:
+        import asyncpg
+
+        self._listener = await asyncpg.connect(dsn)
+        await self._listener.add_listener(NOTIFY_CHANNEL, self._on_notify)
+        self._listener.add_termination_listener(self._on_listener_lost)
+
+    # =========================================================
+    # DB
+    # =========================================================
+
+    async def _read(self, key: str) -> _CacheEntry:
+        entry = self._cache_get(key)
+        if entry is not None:
+            self.cache_hits += 1
+            return entry
+
+        self.cache_misses += 1
+        with stage("fsm_read", cache="miss"):
+            async with self.engine.connect() as connection:
+                result = await connection.execute(
+                    select(FsmRecord.state, FsmRecord.data).where(FsmRecord.key == key)
+                )
+                row = result.one_or_none()
+
+        state, data = (row[0], _load(row[1])) if row else (None, {})
+        self._cache_put(key, state, data)
+        return self._cache.get(key) or _CacheEntry(state, data, 0)
+
+    async def _write(self, key: str, values: dict[str, Any]) -> None:
+        stmt = insert(FsmRecord).values(
+            key=key,
+            state=values.get("state"),
+            data=values.get("data", EMPTY_DATA),
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[FsmRecord.key],
+            set_={**values, "updated_at": func.now()},
+        )
+
+        with stage("fsm_write"):
+            async with self.engine.begin() as connection:
+                await connection.execute(stmt)
+                await connection.execute(
+                    text("SELECT pg_notify(:channel, :payload)"),
+                    {"channel": NOTIFY_CHANNEL, "payload": f"{self._instance_id}|{key}"},
+                )
+
+    # =========================================================
+    # BaseStorage
+    # =========================================================
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        value = state.state if isinstance(state, State) else state
+        storage_key = _serialize_key(key)
+
+        await self._write(storage_key, {"state": value})
+
+        entry = self._cache.get(storage_key)
+        if entry is not None:
+            entry.state = value
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return (await self._read(_serialize_key(key))).state
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        storage_key = _serialize_key(key)
+        data = dict(data)
+
+        await self._write(storage_key, {"data": _dump(data)})
+
+        entry = self._cache.get(storage_key)
+        if entry is not None:
+            entry.data = data
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        return dict((await self._read(_serialize_key(key))).data)
+
+    async def close(self) -> None:
+        if self._listener is not None:
+            listener, self._listener = self._listener, None
+            await listener.close()
+
+    # =========================================================
+    # TTL SWEEPER
+    # =========================================================
+
+    async def sweep(
+        self,
+        ttl: timedelta,
+        on_expired: Optional[Callable[[dict[str, Any]], None]] = None,
+    ) -> int:
+        """
+        Удаляет брошенные черновики и состояния старше ttl.
+        on_expired получает данные каждого удалённого (резерв автоназначения и т.п.).
+        """
+
+        async with self.engine.begin() as connection:
+            result = await connection.execute(
+                delete(FsmRecord)
+                .where(FsmRecord.updated_at < func.now() - ttl)
+                .returning(FsmRecord.key, FsmRecord.data)
+            )
+            rows = result.all()
+
+        for key, raw in rows:
+            self._cache.pop(key, None)
+            if on_expired is not None:
+                try:
+                    on_expired(_load(raw))
+                except Exception:
+                    logger.exception("FSM sweeper callback failed for %s", key)
+        return len(rows)
+
+    async def run_sweeper(
+        self,
+        ttl: timedelta,
+        interval_seconds: int,
+        on_expired: Optional[Callable[[dict[str, Any]], None]] = None,
+    ) -> None:
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                removed = await self.sweep(ttl, on_expired)
+                if removed:
+                    logger.info("FSM sweeper removed %s abandoned states", removed)
+            except Exception:
+                logger.exception("FSM sweeper failed")
+
+
+def asyncpg_dsn(database_url: str) -> str:
+    return database_url.replace("postgresql+asyncpg://", "postgresql://", 1)
+
+
+async def build_fsm_storage(settings: Settings, engine: AsyncEngine) -> BaseStorage:
+    if settings.fsm_storage == "memory":
+        return MemoryStorage()
+
+    storage = PostgresStorage(engine, cache_ttl=settings.fsm_cache_ttl)
+    try:
+        await storage.start_listener(asyncpg_dsn(settings.database_direct_url))
+    except Exception:
+        logger.exception("FSM storage LISTEN failed, running without cache")
+        storage.cache_ttl = 0
+    return storage
@@ -1,53 +1,75 @@
+import io
+import tempfile
 import uuid
-from dataclasses import dataclass, asdict
+from datetime import datetime, time, timedelta, timezone
 from typing import Any, Optional
 
 from aiogram import F, Router
-from aiogram.filters import Command
+from aiogram.filters import Command, CommandObject
 from aiogram.fsm.context import FSMContext
-from aiogram.fsm.state import State, StatesGroup
-from aiogram.types import CallbackQuery, Message
-from sqlalchemy import select
+from aiogram.types import CallbackQuery, FSInputFile, Message
+from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.ai_parser import AIParserService
-from app.keyboards import managers_keyboard, lead_status_keyboard
+from app.archive import LeadArchiver, get_lead
+from app.bulk_import import BulkImportService
+from app.bulk_status import BulkFSM, change_statuses, find_bulk_manager, lead_label, open_leads
+from app.config import Settings
+from app.export_service import export_leads, find_manager_id, parse_export_args
+from app.keyboards import (
+    bulk_select_keyboard,
+    bulk_status_keyboard,
+    lead_status_keyboard,
+    managers_keyboard,
+    reminder_keyboard,
+    search_more_keyboard,
+)
+from app.job_queue import JobQueue
+from app.lead_fields import contact_columns
+from app.lead_pipeline import COMMENT_PROMPT, PHOTO_JOB, LeadFSM, PhotoPipeline, photo_job_payload
+from app.lead_search import MIN_QUERY_LENGTH, SearchCursor, normalize_query, search_leads
+from app.metrics import stage
 from app.models import Lead, Manager, LeadStatus
-from app.ocr_service import OCRService
-from app.sheets_service import SheetsService
+from app.outbound import OutboundQueue
+from app.profiling import UpdateProfiler
+from app.reminders import REMINDER_PRESETS, REMINDER_STATUSES, REMINDER_TITLES, ReminderScheduler, preset_due
+from app.resilience import CLOSED, HALF_OPEN, OPEN, Breakers
+from app.routing import ManagerRouter
+from app.sinks import LeadSinks, card_link
+from app.stats_service import PERIODS, StatsService
+from app.status_history import StatusHistoryService
 
 
 router = Router(name="lead_handlers")
 
 
-# ================= FSM =================
-
-class LeadFSM(StatesGroup):
-    waiting_manager = State()
-    waiting_comment = State()
-
-
-# ================= Draft =================
-
-@dataclass(slots=True)
-class LeadDraft:
-    id: str
-    name: Optional[str]
-    contact: Optional[str]
-    contact_type: Optional[str]
-    weight_kg: Optional[float]
-    height_cm: Optional[float]
-    bmi: Optional[float]
-
-
-def calculate_bmi(weight: float | None, height: float | None) -> float | None:
-    if not weight or not height:
-        return None
-    try:
-        height_m = height / 100
-        return round(weight / (height_m ** 2), 2)
-    except Exception:
-        return None
+def is_admin(user_id: int | None, settings: Settings) -> bool:
+    return user_id is not None and user_id in settings.admin_ids
+
+
+def lead_card_text(lead: Lead, title: str = "📥 Новый лид") -> str:
+    contacts = []
+    if lead.phone:
+        contacts.append(f"📞 Телефон: {lead.phone}")
+    if lead.telegram_username:
+        contacts.append(f"💬 Telegram: {lead.telegram_username}")
+    if lead.whatsapp:
+        contacts.append(f"🟢 WhatsApp: {lead.whatsapp}")
+    if lead.messenger_max:
+        contacts.append(f"🔵 MAX: {lead.messenger_max}")
+    if lead.email:
+        contacts.append(f"✉️ Email: {lead.email}")
+
+    return (
+        f"{title}\n\n"
+        f"Имя: {lead.name}\n\n"
+        f"{chr(10).join(contacts) if contacts else 'Нет контактов'}\n\n"
+        f"Вес: {lead.weight_kg or '-'}\n"
+        f"Рост: {lead.height_cm or '-'}\n"
+        f"BMI: {lead.bmi or '-'}\n\n"
+        f"Комментарий: {lead.comment_from_admin or 'нет'}\n\n"
+        f"🔄 Статус: {lead.manager_status.value}"
+    )
 
 
 # ================= START =================
@@ -66,81 +88,491 @@ async def get_chat_id(message: Message):
     await message.answer(f"Chat ID: {message.chat.id}")
 
 
-# ================= PHOTO =================
+# ================= SEARCH =================
 
-@router.message(F.photo)
-async def process_lead_photo(
+async def _search_scope(
+    session: AsyncSession,
+    settings: Settings,
+    user_id: int | None,
+) -> tuple[bool, Optional[uuid.UUID]]:
+    """Админ ищет по всем лидам, менеджер — только по своим."""
+
+    if is_admin(user_id, settings):
+        return True, None
+
+    if user_id is None:
+        return False, None
+
+    result = await session.execute(
+        select(Manager.id).where(Manager.telegram_id == user_id, Manager.active.is_(True))
+    )
+    manager_id = result.scalar_one_or_none()
+    return manager_id is not None, manager_id
+
+
+async def _send_search_page(
     message: Message,
     state: FSMContext,
     session: AsyncSession,
-    ocr_service: OCRService,
-    ai_parser: AIParserService,
+    query: str,
+    manager_id: Optional[uuid.UUID],
+    after: Optional[SearchCursor],
 ) -> None:
-    photo = message.photo[-1]
-    file = await message.bot.get_file(photo.file_id)
-    file_bytes = await message.bot.download_file(file.file_path)
-    image_bytes = file_bytes.read()
-
-    raw_text = await ocr_service.extract_text(image_bytes)
-
-    if not raw_text.strip():
-        await message.answer("Не удалось извлечь текст из изображения.")
-        return
-
-    parsed = await ai_parser.parse_lead_text(raw_text)
-
-    weight = float(parsed["weight_kg"]) if parsed.get("weight_kg") else None
-    height = float(parsed["height_cm"]) if parsed.get("height_cm") else None
-    bmi = calculate_bmi(weight, height)
-
-    contact = None
-    contact_type = None
-
-    if parsed.get("phone"):
-        contact = parsed["phone"]
-        contact_type = "Телефон"
-    elif parsed.get("telegram"):
-        contact = parsed["telegram"]
-        contact_type = "Telegram"
-    elif parsed.get("whatsapp"):
-        contact = parsed["whatsapp"]
-        contact_type = "WhatsApp"
-    elif parsed.get("max"):
-        contact = parsed["max"]
-        contact_type = "MAX"
-
-    draft = LeadDraft(
-        id=str(uuid.uuid4()),
-        name=parsed.get("name"),
-        contact=contact,
-        contact_type=contact_type,
-        weight_kg=weight,
-        height_cm=height,
-        bmi=bmi,
+    leads, next_cursor = await search_leads(
+        session,
+        query,
+        manager_id=manager_id,
+        after=after,
     )
 
-    await state.update_data(lead_draft=asdict(draft))
+    if not leads:
+        await message.answer("Ничего не найдено." if after is None else "Больше результатов нет.")
+        return
 
-    result = await session.execute(select(Manager).where(Manager.active.is_(True)))
-    managers = list(result.scalars().all())
-
-    card_text = (
-        f"Имя: {draft.name or '-'}\n"
-        f"Контакт ({draft.contact_type or '-'}): {draft.contact or '-'}\n"
-        f"Вес: {draft.weight_kg or '-'}\n"
-        f"Рост: {draft.height_cm or '-'}\n"
-        f"BMI: {draft.bmi or '-'}"
-    )
+    for lead in leads:
+        await message.answer(
+            lead_card_text(lead, title="🔎 Найден лид"),
+            reply_markup=lead_status_keyboard(str(lead.id)),
+        )
 
-    await message.answer(card_text, reply_markup=managers_keyboard(managers))
-    await state.set_state(LeadFSM.waiting_manager)
+    await state.update_data(find_cursor=next_cursor.dump() if next_cursor else None)
+
+    if next_cursor:
+        await message.answer("Показать ещё?", reply_markup=search_more_keyboard())
+
+
+@router.message(Command("find"))
+async def cmd_find(
+    message: Message,
+    command: CommandObject,
+    state: FSMContext,
+    session: AsyncSession,
+    settings: Settings,
+):
+    user_id = message.from_user.id if message.from_user else None
+    allowed, manager_id = await _search_scope(session, settings, user_id)
+
+    if not allowed:
+        await message.answer("Поиск доступен только администраторам и менеджерам.")
+        return
+
+    query = normalize_query(command.args or "")
+    if len(query) < MIN_QUERY_LENGTH:
+        await message.answer("Использование: /find <имя, телефон, @username или email>")
+        return
+
+    await state.update_data(find_query=query, find_cursor=None)
+    await _send_search_page(message, state, session, query, manager_id, after=None)
+
+
+@router.callback_query(F.data == "find:more")
+async def find_more(
+    callback: CallbackQuery,
+    state: FSMContext,
+    session: AsyncSession,
+    settings: Settings,
+):
+    data = await state.get_data()
+    query = data.get("find_query")
+    cursor = SearchCursor.load(data.get("find_cursor"))
+
+    if not query or cursor is None:
+        await callback.answer("Поиск устарел, повторите /find", show_alert=True)
+        return
+
+    allowed, manager_id = await _search_scope(session, settings, callback.from_user.id)
+    if not allowed:
+        await callback.answer("Нет доступа", show_alert=True)
+        return
+
+    await callback.answer()
+    await _send_search_page(callback.message, state, session, query, manager_id, after=cursor)
+
+
+# ================= STATS =================
+
+@router.message(Command("stats"))
+async def cmd_stats(
+    message: Message,
+    command: CommandObject,
+    session: AsyncSession,
+    settings: Settings,
+    stats_service: StatsService,
+):
+    if not is_admin(message.from_user.id if message.from_user else None, settings):
+        await message.answer("Статистика доступна только администраторам.")
+        return
+
+    period = (command.args or "week").strip().lower()
+    if period not in PERIODS:
+        await message.answer("Использование: /stats [day|week|month]")
+        return
+
+    stats = await stats_service.get_funnel(session, period)
+    await message.answer(stats_service.format_funnel(stats, period))
+
+
+def _format_duration(seconds: float) -> str:
+    minutes = int(seconds // 60)
+    days, minutes = divmod(minutes, 24 * 60)
+    hours, minutes = divmod(minutes, 60)
+    if days:
+        return f"{days} д {hours} ч"
+    if hours:
+        return f"{hours} ч {minutes} мин"
+    return f"{minutes} мин"
+
+
+@router.message(Command("dwell"))
+async def cmd_dwell(
+    message: Message,
+    command: CommandObject,
+    session: AsyncSession,
+    settings: Settings,
+    status_history: StatusHistoryService,
+):
+    if not is_admin(message.from_user.id if message.from_user else None, settings):
+        await message.answer("Статистика доступна только администраторам.")
+        return
+
+    period = (command.args or "week").strip().lower()
+    if period not in PERIODS:
+        await message.answer("Использование: /dwell [day|week|month]")
+        return
+
+    title, days_back = PERIODS[period]
+    since = datetime.now(timezone.utc) - timedelta(days=days_back + 1)
+    stages = {stage.status: stage for stage in await status_history.stage_dwell(session, since)}
+
+    if not stages:
+        await message.answer("За период нет смен статусов.")
+        return
+
+    lines = [f"⏱ Время в статусах за {title}", ""]
+    for status in LeadStatus:
+        stage = stages.get(status)
+        if not stage:
+            continue
+        lines.append(
+            f"{status.value}: медиана {_format_duration(stage.p50_seconds)}, "
+            f"p90 {_format_duration(stage.p90_seconds)} "
+            f"({stage.transitions} шт., сейчас {stage.still_open})"
+        )
+
+    await message.answer("\n".join(lines))
+
+
+# ================= PROFILING =================
+
+@router.message(Command("slow"))
+async def cmd_slow(
+    message: Message,
+    command: CommandObject,
+    settings: Settings,
+    profiler: Optional[UpdateProfiler],
+):
+    if not is_admin(message.from_user.id if message.from_user else None, settings):
+        await message.answer("Профили доступны только администраторам.")
+        return
+
+    if profiler is None:
+        await message.answer("Профилирование выключено (PROFILE_SAMPLE_RATE / PROFILE_SLOW_THRESHOLD).")
+        return
+
+    args = (command.args or "").strip()
+    limit = int(args) if args.isdigit() else 10
+    records = profiler.slowest(min(limit, 50))
+
+    if not records:
+        await message.answer("Медленных апдейтов пока нет.")
+        return
+
+    lines = ["🐢 Самые медленные апдейты", ""]
+    for record in records:
+        slowest_stage = max(record["stages"], key=lambda item: item["seconds"], default=None)
+        stage_note = f", {slowest_stage['stage']} {slowest_stage['seconds']:.2f}с" if slowest_stage else ""
+        profile_note = " 📎" if record.get("profile") else ""
+        lines.append(
+            f"{record['duration_seconds']:.2f}с — {record['kind']}{stage_note}{profile_note}\n"
+            f"  /profile {record['id']}"
+        )
+
+    await message.answer("\n".join(lines))
+
+
+@router.message(Command("profile"))
+async def cmd_profile(
+    message: Message,
+    command: CommandObject,
+    settings: Settings,
+    profiler: Optional[UpdateProfiler],
+):
+    if not is_admin(message.from_user.id if message.from_user else None, settings):
+        await message.answer("Профили доступны только администраторам.")
+        return
+
+    if profiler is None:
+        await message.answer("Профилирование выключено.")
+        return
+
+    record_id = (command.args or "").strip()
+    record = profiler.load(record_id) if record_id else None
+    if record is None:
+        await message.answer("Использование: /profile <id из /slow>")
+        return
+
+    await message.answer_document(FSInputFile(f"{profiler.directory}/{record_id}.json"))
+
+    profile_path = profiler.profile_path(record_id)
+    if profile_path:
+        await message.answer_document(FSInputFile(profile_path))
+
+
+# ================= BREAKERS =================
+
+@router.message(Command("breakers"))
+async def cmd_breakers(
+    message: Message,
+    settings: Settings,
+    breakers: Breakers,
+    lead_sinks: LeadSinks,
+):
+    if not is_admin(message.from_user.id if message.from_user else None, settings):
+        await message.answer("Состояние интеграций доступно только администраторам.")
+        return
+
+    snapshot = breakers.snapshot()
+    if not snapshot:
+        await message.answer("Внешних вызовов ещё не было.")
+        return
+
+    icons = {CLOSED: "🟢", HALF_OPEN: "🟡", OPEN: "🔴"}
+    lines = ["🔌 Интеграции", ""]
+    for breaker in snapshot:
+        line = f"{icons[breaker.state]} {breaker.name}: срабатываний {breaker.trips}"
+        if breaker.state != CLOSED:
+            line += f", повтор через {breaker.retry_after:.0f}с"
+        if breaker.last_error and breaker.state != CLOSED:
+            line += f"\n  {breaker.last_error[:200]}"
+        lines.append(line)
+
+    lines += ["", f"Отложено доставок с запуска: {lead_sinks.deferred}"]
+    await message.answer("\n".join(lines))
+
+
+# ================= ROUTING =================
+
+def _parse_hours(value: str) -> tuple[Optional[time], Optional[time]]:
+    if value == "off":
+        return None, None
+    start, end = value.split("-")
+    return time.fromisoformat(start), time.fromisoformat(end)
+
+
+@router.message(Command("routing"))
+async def cmd_routing(
+    message: Message,
+    command: CommandObject,
+    session: AsyncSession,
+    settings: Settings,
+    manager_router: ManagerRouter,
+):
+    """
+    /routing — нагрузка и настройки автораспределения.
+    /routing Имя weight=2 hours=09:00-18:00 — изменить вес и часы (hours=off — круглосуточно).
+    """
+
+    if not is_admin(message.from_user.id if message.from_user else None, settings):
+        await message.answer("Настройки распределения доступны только администраторам.")
+        return
+
+    args = (command.args or "").split()
+    options = dict(arg.split("=", 1) for arg in args if "=" in arg)
+    name = " ".join(arg for arg in args if "=" not in arg)
+
+    if name:
+        manager_id = await find_manager_id(session, name)
+        if manager_id is None:
+            await message.answer(f"Менеджер {name} не найден.")
+            return
+
+        values: dict[str, Any] = {}
+        try:
+            if "weight" in options:
+                values["routing_weight"] = float(options["weight"])
+                if values["routing_weight"] < 0:
+                    raise ValueError
+            if "hours" in options:
+                values["available_from"], values["available_to"] = _parse_hours(options["hours"])
+        except ValueError:
+            await message.answer("Использование: /routing Имя weight=2 hours=09:00-18:00")
+            return
+
+        if values:
+            await session.execute(update(Manager).where(Manager.id == manager_id).values(**values))
+            await session.commit()
+
+    await manager_router.reconcile(session)
+    now = datetime.now(manager_router.timezone)
+    available = {manager.id for manager in manager_router.candidates(now)}
+
+    lines = [f"🔁 Распределение ({'авто' if settings.auto_assign else 'вручную'})", ""]
+    for manager in sorted(manager_router.managers, key=lambda slot: slot.name):
+        hours = "круглосуточно"
+        if manager.available_from and manager.available_to:
+            hours = f"{manager.available_from:%H:%M}–{manager.available_to:%H:%M}"
+        icon = "🟢" if manager.id in available else "⚪️"
+        lines.append(
+            f"{icon} {manager.name}: открытых {manager_router.load[manager.id]}, "
+            f"вес {manager.weight:g}, {hours}"
+        )
+    if not manager_router.managers:
+        lines.append("Нет активных менеджеров.")
+
+    await message.answer("\n".join(lines))
+
+
+# ================= EXPORT =================
+
+@router.message(Command("export"))
+async def cmd_export(
+    message: Message,
+    command: CommandObject,
+    session: AsyncSession,
+    settings: Settings,
+):
+    if not is_admin(message.from_user.id if message.from_user else None, settings):
+        await message.answer("Выгрузка доступна только администраторам.")
+        return
+
+    try:
+        file_format, filters, manager_name = parse_export_args((command.args or "").split())
+    except ValueError as e:
+        await message.answer(
+            f"{e}\n\n"
+            "Использование: /export [csv|xlsx] [status=new,in_work] [manager=Имя] "
+            "[from=2026-01-01] [to=2026-01-31] [archive]"
+        )
+        return
+
+    filters.timezone = settings.stats_timezone
+    if manager_name:
+        filters.manager_id = await find_manager_id(session, manager_name)
+        if filters.manager_id is None:
+            await message.answer(f"Менеджер «{manager_name}» не найден.")
+            return
+
+    await message.answer("Готовлю выгрузку…")
+
+    with tempfile.TemporaryDirectory(prefix="leads_export_") as directory:
+        paths, rows = await export_leads(session, filters, directory, file_format)
+
+        for path in paths:
+            await message.answer_document(FSInputFile(path))
+
+    await message.answer(f"Выгружено лидов: {rows}")
+
+
+# ================= BULK IMPORT =================
+
+# Bot API отдаёт ботам файлы не больше 20 МБ
+MAX_IMPORT_FILE_SIZE = 20 * 1024 * 1024
+
+
+@router.message(Command("import"), F.document)
+async def cmd_import(
+    message: Message,
+    command: CommandObject,
+    session: AsyncSession,
+    settings: Settings,
+    bulk_import: BulkImportService,
+):
+    if not is_admin(message.from_user.id if message.from_user else None, settings):
+        await message.answer("Импорт доступен только администраторам.")
+        return
+
+    document = message.document
+    if document.file_size and document.file_size > MAX_IMPORT_FILE_SIZE:
+        await message.answer("Файл больше 20 МБ — разбейте архив на части.")
+        return
+
+    manager: Manager | None = None
+    manager_name = (command.args or "").strip()
+    if manager_name:
+        result = await session.execute(select(Manager).where(Manager.name == manager_name))
+        manager = result.scalars().first()
+        if manager is None:
+            await message.answer(f"Менеджер «{manager_name}» не найден.")
+            return
+
+    progress_message = await message.answer("⏳ Импорт: скачиваю файл…")
+
+    async def progress(text: str) -> None:
+        try:
+            await progress_message.edit_text(text)
+        except Exception:
+            # «message is not modified» и т.п. не должны ронять импорт
+            pass
+
+    buffer = io.BytesIO()
+    await message.bot.download(document, destination=buffer)
+
+    try:
+        import_result = await bulk_import.import_document(
+            session,
+            document.file_name or "import",
+            buffer.getvalue(),
+            manager,
+            message.from_user.id if message.from_user else None,
+            progress,
+        )
+    except ValueError as e:
+        await progress_message.edit_text(str(e))
+        return
+
+    await progress_message.edit_text(f"✅ Импорт завершён\n{import_result.summary()}")
+
+
+# ================= PHOTO =================
+
+@router.message(F.photo)
+async def process_lead_photo(
+    message: Message,
+    session: AsyncSession,
+    settings: Settings,
+    job_queue: JobQueue,
+    photo_pipeline: PhotoPipeline,
+) -> None:
+    # отвечаем сразу, тяжёлую часть делает воркер очереди
+    progress_message = await message.answer("⏳ Обрабатываю скриншот…")
+    payload = photo_job_payload(message, progress_message)
+
+    if not settings.photo_queue_enabled:
+        await photo_pipeline.process(payload)
+        return
+
+    await job_queue.enqueue(session, PHOTO_JOB, payload)
+    await session.commit()
+    job_queue.notify()
 
 
 # ================= MANAGER CHOICE =================
 
+@router.message(Command("cancel"))
+async def cmd_cancel(message: Message, state: FSMContext, manager_router: ManagerRouter):
+    if await state.get_state() is None:
+        await message.answer("Нечего отменять.")
+        return
+
+    manager_router.release_draft(await state.get_data())
+    await state.clear()
+    await message.answer("Отменено.")
+
+
 @router.callback_query(LeadFSM.waiting_manager, F.data.startswith("manager:"))
-async def choose_manager(callback: CallbackQuery, state: FSMContext):
+async def choose_manager(callback: CallbackQuery, state: FSMContext, manager_router: ManagerRouter):
     if callback.data == "manager:cancel":
+        manager_router.release_draft(await state.get_data())
         await state.clear()
         await callback.message.answer("Создание лида отменено.")
         await callback.answer()
@@ -151,9 +583,32 @@ async def choose_manager(callback: CallbackQuery, state: FSMContext):
     await state.update_data(manager_id=manager_id)
     await state.set_state(LeadFSM.waiting_comment)
 
-    await callback.message.answer(
-        "Добавить комментарий? Напишите текст или отправьте '-' если без комментария."
-    )
+    await callback.message.answer(COMMENT_PROMPT)
+    await callback.answer()
+
+
+@router.callback_query(LeadFSM.waiting_comment, F.data.in_({"manager:override", "manager:cancel"}))
+async def override_manager(
+    callback: CallbackQuery,
+    state: FSMContext,
+    session: AsyncSession,
+    manager_router: ManagerRouter,
+):
+    """Менеджер назначен автоматически, администратор передумал."""
+
+    manager_router.release_draft(await state.get_data())
+
+    if callback.data == "manager:cancel":
+        await state.clear()
+        await callback.message.answer("Создание лида отменено.")
+        await callback.answer()
+        return
+
+    await state.update_data(manager_id=None, auto_manager_id=None)
+    await state.set_state(LeadFSM.waiting_manager)
+
+    result = await session.execute(select(Manager).where(Manager.active.is_(True)))
+    await callback.message.edit_reply_markup(reply_markup=managers_keyboard(list(result.scalars().all())))
     await callback.answer()
 
 
@@ -164,7 +619,11 @@ async def save_lead(
     message: Message,
     state: FSMContext,
     session: AsyncSession,
-    sheets_service: SheetsService,
+    lead_sinks: LeadSinks,
+    stats_service: StatsService,
+    status_history: StatusHistoryService,
+    outbound: OutboundQueue,
+    manager_router: ManagerRouter,
 ):
     data = await state.get_data()
     lead_draft: dict[str, Any] = data.get("lead_draft", {})
@@ -172,36 +631,14 @@ async def save_lead(
 
     comment = None if message.text == "-" else message.text
 
-    phone = None
-    telegram_username = None
-    whatsapp = None
-    messenger_max = None
-    email = None
-
-    contact = lead_draft.get("contact")
-    contact_type = lead_draft.get("contact_type")
-
-    if contact:
-        if contact_type == "Телефон":
-            phone = contact
-        elif contact_type == "Telegram":
-            telegram_username = contact
-        elif contact_type == "WhatsApp":
-            whatsapp = contact
-        elif contact_type == "MAX":
-            messenger_max = contact
-
-    has_contact = any([phone, telegram_username, whatsapp, messenger_max, email])
+    contacts = contact_columns(lead_draft.get("contact"), lead_draft.get("contact_type"))
+    has_contact = any(contacts.values())
 
     lead = Lead(
         id=uuid.UUID(lead_draft["id"]),
         source="telegram",
         name=lead_draft.get("name") or "-",
-        phone=phone,
-        telegram_username=telegram_username,
-        whatsapp=whatsapp,
-        messenger_max=messenger_max,
-        email=email,
+        **contacts,
         weight_kg=lead_draft.get("weight_kg"),
         height_cm=lead_draft.get("height_cm"),
         bmi=lead_draft.get("bmi"),
@@ -212,9 +649,18 @@ async def save_lead(
         created_by=message.from_user.id if message.from_user else 0,
     )
 
-    session.add(lead)
-    await session.commit()
-    await session.refresh(lead)
+    with stage("db"):
+        session.add(lead)
+        await stats_service.record_lead_created(session, lead)
+        await status_history.record_transition(session, lead, None, changed_by=lead.created_by)
+        await session.commit()
+        await session.refresh(lead)
+
+    # автоназначенный лид уже учтён в нагрузке при выборе менеджера
+    if data.get("auto_manager_id"):
+        manager_router.confirm_draft(data)
+    else:
+        manager_router.assign(lead.manager_id)
 
     # -------- получаем менеджера --------
     manager: Manager | None = None
@@ -230,35 +676,20 @@ async def save_lead(
     tg_message_link: Optional[str] = None
 
     if manager and manager.manager_group_chat_id:
-        contacts = []
-        if lead.phone:
-            contacts.append(f"📞 Телефон: {lead.phone}")
-        if lead.telegram_username:
-            contacts.append(f"💬 Telegram: {lead.telegram_username}")
-        if lead.whatsapp:
-            contacts.append(f"🟢 WhatsApp: {lead.whatsapp}")
-        if lead.messenger_max:
-            contacts.append(f"🔵 MAX: {lead.messenger_max}")
-
-        sent_message = await message.bot.send_message(
-            chat_id=manager.manager_group_chat_id,
-            text=(
-                "📥 Новый лид\n\n"
-                f"Имя: {lead.name}\n\n"
-                f"{chr(10).join(contacts) if contacts else 'Нет контактов'}\n\n"
-                f"Вес: {lead.weight_kg or '-'}\n"
-                f"Рост: {lead.height_cm or '-'}\n"
-                f"BMI: {lead.bmi or '-'}\n\n"
-                f"Комментарий: {lead.comment_from_admin or 'нет'}\n\n"
-                f"🔄 Статус: {lead.manager_status.value}"
-            ),
-            reply_markup=lead_status_keyboard(str(lead.id)),
+        # ждём отправки (с дедлайном): нужен message_id для ссылки в таблице
+        sent_message = await lead_sinks.send_card(
+            manager.manager_group_chat_id,
+            str(lead.id),
+            lead_card_text(lead),
         )
 
-        chat_id_str = str(manager.manager_group_chat_id)
-        if chat_id_str.startswith("-100"):
-            internal_id = chat_id_str[4:]
-            tg_message_link = f"https://t.me/c/{internal_id}/{sent_message.message_id}"
+        if sent_message:
+            # для /bulk: карточку потом правит массовая смена статуса
+            lead.card_chat_id = sent_message.chat.id
+            lead.card_message_id = sent_message.message_id
+            with stage("db"):
+                await session.commit()
+            tg_message_link = card_link(sent_message.chat.id, sent_message.message_id)
 
     # -------- Google Sheets payload --------
     lead_payload = {
@@ -280,18 +711,14 @@ async def save_lead(
         "tg_link": tg_message_link,
     }
 
-    await sheets_service.append_to_master(lead_payload)
+    # недоступная таблица не держит обработчик: строка уйдёт отложенно
+    await lead_sinks.append_lead(lead_payload, manager.manager_sheet_id if manager else None)
 
     if manager and manager.manager_sheet_id:
-        await sheets_service.append_to_manager_sheet(
-            manager.manager_sheet_id,
-            lead_payload,
-        )
-
         # 📊 Ссылка на индивидуальную таблицу менеджера (в ту же группу)
         if manager.manager_group_chat_id:
             manager_sheet_link = f"https://docs.google.com/spreadsheets/d/{manager.manager_sheet_id}"
-            await message.bot.send_message(
+            outbound.send_message(
                 chat_id=manager.manager_group_chat_id,
                 text=(
                     "📊 Ваша таблица:\n"
@@ -309,7 +736,13 @@ async def save_lead(
 async def update_lead_status(
     callback: CallbackQuery,
     session: AsyncSession,
-    sheets_service: SheetsService,
+    lead_sinks: LeadSinks,
+    stats_service: StatsService,
+    status_history: StatusHistoryService,
+    lead_archiver: LeadArchiver,
+    outbound: OutboundQueue,
+    manager_router: ManagerRouter,
+    reminders: ReminderScheduler,
 ):
     try:
         _, lead_id, new_status = callback.data.split(":")
@@ -317,51 +750,273 @@ async def update_lead_status(
         await callback.answer("Ошибка данных", show_alert=True)
         return
 
-    result = await session.execute(select(Lead).where(Lead.id == uuid.UUID(lead_id)))
-    lead = result.scalar_one_or_none()
+    # закрытый лид мог уже уехать в архив — get_lead вернёт его обратно
+    lead = await get_lead(session, uuid.UUID(lead_id), lead_archiver)
 
     if not lead:
         await callback.answer("Лид не найден", show_alert=True)
         return
 
+    old_status = lead.manager_status
+
     try:
         lead.manager_status = LeadStatus(new_status)
     except Exception:
         await callback.answer("Некорректный статус", show_alert=True)
         return
 
-    await session.commit()
-    await session.refresh(lead)
+    if lead.card_message_id is None and callback.message:
+        # лиды до появления card_*: запоминаем карточку при первом клике
+        lead.card_chat_id = callback.message.chat.id
+        lead.card_message_id = callback.message.message_id
+
+    with stage("db"):
+        await stats_service.record_status_change(session, lead, old_status)
+        await status_history.record_transition(
+            session,
+            lead,
+            old_status,
+            changed_by=callback.from_user.id,
+        )
+        if old_status in REMINDER_STATUSES and old_status != lead.manager_status:
+            await reminders.cancel(session, [lead.id])
+        await session.commit()
+        await session.refresh(lead)
+
+    manager_router.on_status_change(lead.manager_id, old_status, lead.manager_status)
 
     await callback.answer("Статус обновлён")
 
     base_text = (callback.message.text or "").split("🔄 Статус:")[0]
 
-    await callback.message.edit_text(
-        base_text + f"\n\n🔄 Статус: {lead.manager_status.value}",
+    # частые клики по статусам одной карточки схлопываются в одну правку
+    outbound.edit_message_text(
+        chat_id=callback.message.chat.id,
+        message_id=callback.message.message_id,
+        text=base_text + f"\n\n🔄 Статус: {lead.manager_status.value}",
         reply_markup=lead_status_keyboard(str(lead.id)),
     )
 
+    if lead.manager_status in REMINDER_STATUSES and old_status != lead.manager_status:
+        outbound.send_message(
+            chat_id=callback.message.chat.id,
+            text=f"⏰ Когда напомнить ({REMINDER_TITLES[lead.manager_status]}): {lead.name}?",
+            reply_markup=reminder_keyboard(str(lead.id)),
+        )
+
     # ------------------- GOOGLE SHEETS -------------------
+    manager_sheet_id: Optional[str] = None
+    if lead.manager_id:
+        result = await session.execute(select(Manager.manager_sheet_id).where(Manager.id == lead.manager_id))
+        manager_sheet_id = result.scalar_one_or_none()
+
+    await lead_sinks.update_status(str(lead.id), lead.manager_status.value, manager_sheet_id)
+
+
+# ================= BULK STATUS =================
+
+@router.message(Command("bulk"))
+async def cmd_bulk(
+    message: Message,
+    command: CommandObject,
+    state: FSMContext,
+    session: AsyncSession,
+    settings: Settings,
+):
+    """
+    /bulk — в группе менеджера: выбрать несколько его открытых лидов и
+    поставить им один статус. Администратор: /bulk Имя.
+    """
+
+    user_id = message.from_user.id if message.from_user else None
+    name = (command.args or "").strip() if is_admin(user_id, settings) else None
+
+    manager = await find_bulk_manager(session, message.chat.id, user_id, name)
+    if manager is None:
+        await message.answer(
+            "Менеджер не найден. /bulk работает в группе менеджера, администратор — /bulk Имя."
+        )
+        return
+
+    leads = await open_leads(session, manager.id)
+    if not leads:
+        await message.answer(f"У менеджера {manager.name} нет открытых лидов.")
+        return
+
+    labels = [lead_label(lead) for lead in leads]
+    await state.set_state(BulkFSM.selecting)
+    await state.update_data(
+        bulk_leads=[str(lead.id) for lead in leads],
+        bulk_labels=labels,
+        bulk_selected=[],
+    )
+
+    await message.answer(
+        f"{manager.name}: последние {len(leads)} открытых лидов. Отметьте нужные:",
+        reply_markup=bulk_select_keyboard(labels, set()),
+    )
+
+
+@router.callback_query(BulkFSM.selecting, F.data.startswith("bulk:"))
+async def bulk_select(callback: CallbackQuery, state: FSMContext):
+    data = await state.get_data()
+    labels: list[str] = data.get("bulk_labels", [])
+    selected = set(data.get("bulk_selected", []))
+
+    if callback.data == "bulk:cancel":
+        await state.clear()
+        await callback.message.edit_text("Массовая смена статуса отменена.")
+        await callback.answer()
+        return
+
+    if callback.data == "bulk:next":
+        if not selected:
+            await callback.answer("Не выбрано ни одного лида", show_alert=True)
+            return
+        await state.set_state(BulkFSM.choosing_status)
+        await callback.message.edit_text(
+            f"Выбрано лидов: {len(selected)}. Новый статус:",
+            reply_markup=bulk_status_keyboard(),
+        )
+        await callback.answer()
+        return
+
+    if callback.data == "bulk:all":
+        selected = set() if len(selected) == len(labels) else set(range(len(labels)))
+    elif callback.data.startswith("bulk:pick:"):
+        index = int(callback.data.rsplit(":", 1)[1])
+        selected ^= {index}
+
+    await state.update_data(bulk_selected=sorted(selected))
+    await callback.message.edit_reply_markup(reply_markup=bulk_select_keyboard(labels, selected))
+    await callback.answer()
+
+
+@router.callback_query(BulkFSM.choosing_status, F.data.startswith("bulk:"))
+async def bulk_apply(
+    callback: CallbackQuery,
+    state: FSMContext,
+    session: AsyncSession,
+    lead_sinks: LeadSinks,
+    stats_service: StatsService,
+    status_history: StatusHistoryService,
+    outbound: OutboundQueue,
+    manager_router: ManagerRouter,
+    reminders: ReminderScheduler,
+):
+    data = await state.get_data()
+
+    if callback.data == "bulk:back":
+        labels: list[str] = data.get("bulk_labels", [])
+        await state.set_state(BulkFSM.selecting)
+        await callback.message.edit_text(
+            "Отметьте нужные лиды:",
+            reply_markup=bulk_select_keyboard(labels, set(data.get("bulk_selected", []))),
+        )
+        await callback.answer()
+        return
+
     try:
-        # master
-        await sheets_service.update_status_in_sheet(
-            sheets_service.master_sheet_id,
-            str(lead.id),
-            lead.manager_status.value,
+        new_status = LeadStatus(callback.data.rsplit(":", 1)[1])
+    except ValueError:
+        await callback.answer("Некорректный статус", show_alert=True)
+        return
+
+    lead_ids = [uuid.UUID(data["bulk_leads"][index]) for index in data.get("bulk_selected", [])]
+
+    # один UPDATE, одна вставка счётчиков и одна — событий, один commit
+    with stage("db"):
+        changes = await change_statuses(session, lead_ids, new_status)
+        await stats_service.record_status_changes(session, changes)
+        await status_history.record_transitions(session, changes, changed_by=callback.from_user.id)
+        stale_reminders = [lead.id for lead, old_status in changes if old_status in REMINDER_STATUSES]
+        if stale_reminders:
+            await reminders.cancel(session, stale_reminders)
+        await session.commit()
+
+    await state.clear()
+
+    for lead, old_status in changes:
+        manager_router.on_status_change(lead.manager_id, old_status, lead.manager_status)
+
+    await callback.message.edit_text(
+        f"🔄 Статус {new_status.value}: обновлено {len(changes)} из {len(lead_ids)} лидов."
+    )
+    await callback.answer("Статусы обновлены")
+
+    if not changes:
+        return
+
+    # карточки в группах правятся через очередь отправки — с её лимитами
+    for lead, _ in changes:
+        if lead.card_chat_id and lead.card_message_id:
+            outbound.edit_message_text(
+                chat_id=lead.card_chat_id,
+                message_id=lead.card_message_id,
+                text=lead_card_text(lead),
+                reply_markup=lead_status_keyboard(str(lead.id)),
+            )
+
+    # ------------------- GOOGLE SHEETS -------------------
+    manager_ids = {lead.manager_id for lead, _ in changes if lead.manager_id}
+    manager_sheets: dict[uuid.UUID, Optional[str]] = {}
+    if manager_ids:
+        result = await session.execute(
+            select(Manager.id, Manager.manager_sheet_id).where(Manager.id.in_(manager_ids))
         )
+        manager_sheets = dict(result.all())
+
+    await lead_sinks.update_statuses(
+        [
+            (str(lead.id), lead.manager_status.value, manager_sheets.get(lead.manager_id))
+            for lead, _ in changes
+        ]
+    )
+
 
-        # manager sheet
-        if lead.manager_id:
-            result = await session.execute(select(Manager).where(Manager.id == lead.manager_id))
-            manager = result.scalar_one_or_none()
+# ================= REMINDERS =================
 
-            if manager and manager.manager_sheet_id:
-                await sheets_service.update_status_in_sheet(
-                    manager.manager_sheet_id,
-                    str(lead.id),
-                    lead.manager_status.value,
-                )
+@router.callback_query(F.data.startswith("remind:"))
+async def set_reminder(
+    callback: CallbackQuery,
+    session: AsyncSession,
+    reminders: ReminderScheduler,
+):
+    try:
+        _, lead_id, preset = callback.data.split(":")
+    except ValueError:
+        await callback.answer("Ошибка данных", show_alert=True)
+        return
+
+    if preset == "none":
+        await callback.message.edit_text("Без напоминания.")
+        await callback.answer()
+        return
 
-    except Exception as e:
-        print("Ошибка обновления статуса в Google Sheets:", e)
\ No newline at end of file
+    if preset not in REMINDER_PRESETS:
+        await callback.answer("Ошибка данных", show_alert=True)
+        return
+
+    result = await session.execute(select(Lead.manager_status).where(Lead.id == uuid.UUID(lead_id)))
+    status = result.scalar_one_or_none()
+    if status not in REMINDER_STATUSES:
+        await callback.answer("Статус лида уже сменился", show_alert=True)
+        return
+
+    due_at = preset_due(preset, reminders.timezone)
+
+    # у лида одно ждущее напоминание — повторный выбор его заменяет
+    with stage("db"):
+        await reminders.cancel(session, [uuid.UUID(lead_id)])
+        await reminders.add(
+            session,
+            uuid.UUID(lead_id),
+            callback.message.chat.id,
+            status,
+            due_at,
+            created_by=callback.from_user.id,
+        )
+        await session.commit()
+
+    await callback.message.edit_text(f"⏰ Напомню {due_at:%d.%m %H:%M}.")
+    await callback.answer()
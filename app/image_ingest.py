@@ -0,0 +1,259 @@
+import asyncio
+import io
+import logging
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from typing import Any, Optional, Union
+
+from aiogram import Bot
+
+
+logger = logging.getLogger(__name__)
+
+
+# скриншот заявки — 1080×2400 (2.6 Мп); длинные склейки бывают до ~10 Мп
+DEFAULT_MAX_PIXELS = 12_000_000
+# больше max_pixels × REJECT_FACTOR не декодируем вовсе — почти наверняка не скриншот
+REJECT_FACTOR = 16
+# Bot API отдаёт ботам файлы не больше 20 МБ
+MAX_FILE_SIZE = 20 * 1024 * 1024
+# худший случай на пиксель после декодирования (RGBA) — для оценки памяти
+BYTES_PER_PIXEL = 4
+# буферы такого размера возвращаются в пул, большие отдаются сборщику
+POOLED_BUFFER_SIZE = 4 * 1024 * 1024
+POOL_SIZE = 8
+
+ImageData = Union[bytes, bytearray, memoryview]
+
+
+class ImageRejected(Exception):
+    """Изображение не будем обрабатывать; текст — для пользователя."""
+
+
+# ================= DECODE =================
+
+class _ViewReader(io.RawIOBase):
+    """Файл поверх memoryview: PIL читает кусками, без копии всего файла."""
+
+    def __init__(self, view: memoryview) -> None:
+        self._view = view
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, buffer: Any) -> int:
+        size = min(len(buffer), len(self._view) - self._position)
+        if size <= 0:
+            return 0
+        buffer[:size] = self._view[self._position:self._position + size]
+        self._position += size
+        return size
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        self._position = max(0, offset)
+        return self._position
+
+    def tell(self) -> int:
+        return self._position
+
+
+def image_size(data: ImageData) -> tuple[Optional[int], Optional[int]]:
+    """Размеры по заголовку, без декодирования; (None, None) — не прочитать."""
+
+    from PIL import Image
+
+    view = data if isinstance(data, memoryview) else memoryview(data)
+    try:
+        with Image.open(_ViewReader(view)) as image:
+            return image.size
+    except Exception:
+        return None, None
+
+
+def decode_for_ocr(data: ImageData, max_pixels: int = DEFAULT_MAX_PIXELS):
+    """
+    Декодирует изображение не больше чем в max_pixels пикселей.
+    Размеры проверяются по заголовку до декодирования; JPEG сразу
+    декодируется в уменьшенном масштабе (draft) и в оттенках серого,
+    остальные форматы — в полном размере и потом уменьшаются.
+    """
+
+    from PIL import Image
+
+    view = data if isinstance(data, memoryview) else memoryview(data)
+    try:
+        image = Image.open(_ViewReader(view))
+    except Exception as e:
+        raise ImageRejected("Не удалось прочитать изображение.") from e
+
+    width, height = image.size
+    pixels = width * height
+    if pixels > max_pixels * REJECT_FACTOR:
+        raise ImageRejected(f"Слишком большое изображение: {width}×{height}.")
+
+    target = (width, height)
+    if pixels > max_pixels:
+        scale = (max_pixels / pixels) ** 0.5
+        target = (max(1, int(width * scale)), max(1, int(height * scale)))
+
+    if image.format == "JPEG":
+        # libjpeg масштабирует при декодировании (1/2, 1/4, 1/8) — полный кадр в памяти не нужен
+        image.draft("L", target)
+
+    image.load()
+    if image.width * image.height > max_pixels:
+        image.thumbnail(target)
+
+    return image
+
+
+# ================= MEMORY =================
+
+class MemoryBudget:
+    """
+    Общий лимит памяти на изображения в обработке в этом процессе.
+    Изображение больше всего лимита ждёт, пока остальные не закончат.
+    """
+
+    def __init__(self, limit: int) -> None:
+        self.limit = limit
+        self.in_use = 0
+        self._changed = asyncio.Condition()
+
+    @asynccontextmanager
+    async def reserve(self, amount: int) -> AsyncIterator[None]:
+        amount = min(amount, self.limit)
+
+        async with self._changed:
+            await self._changed.wait_for(lambda: self.in_use + amount <= self.limit)
+            self.in_use += amount
+
+        try:
+            yield
+        finally:
+            async with self._changed:
+                self.in_use -= amount
+                self._changed.notify_all()
+
+
+class ImageBuffer:
+    """
+    Переиспользуемый буфер под скачивание: aiogram пишет в него куски
+    (write/flush/seek), а декодер получает memoryview на скачанное.
+    """
+
+    def __init__(self, capacity: int = 512 * 1024) -> None:
+        self._data = bytearray(capacity)
+        self.size = 0
+        self._view: Optional[memoryview] = None
+
+    @property
+    def capacity(self) -> int:
+        return len(self._data)
+
+    def write(self, chunk: bytes) -> int:
+        end = self.size + len(chunk)
+        if end > MAX_FILE_SIZE:
+            raise ImageRejected("Файл больше 20 МБ.")
+        if end > len(self._data):
+            self._data.extend(bytes(max(end, len(self._data) * 2) - len(self._data)))
+        self._data[self.size:end] = chunk
+        self.size = end
+        return len(chunk)
+
+    def flush(self) -> None:
+        pass
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        # aiogram перематывает буфер после скачивания; читаем через view()
+        return 0
+
+    def view(self) -> memoryview:
+        self._view = memoryview(self._data)[:self.size]
+        return self._view
+
+    def reset(self) -> bool:
+        """False — на буфер ещё кто-то ссылается, переиспользовать нельзя."""
+
+        self.size = 0
+        if self._view is not None:
+            try:
+                self._view.release()
+            except BufferError:
+                return False
+            self._view = None
+        return True
+
+
+class ImageIngest:
+    """
+    Скачивание фото из Telegram для OCR: буферы из пула, без лишних копий,
+    с резервированием памяти под файл и декодированное изображение.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        max_pixels: int = DEFAULT_MAX_PIXELS,
+        memory_limit: int = 256 * 1024 * 1024,
+    ) -> None:
+        self.bot = bot
+        self.max_pixels = max_pixels
+        self.budget = MemoryBudget(memory_limit)
+        self._pool: list[ImageBuffer] = []
+
+    def estimate(self, file_size: Optional[int], width: Optional[int], height: Optional[int]) -> int:
+        # PNG/WebP декодируются в полном размере — считаем по настоящим размерам,
+        # ограничивает только порог отказа
+        pixels = width * height if width and height else self.max_pixels
+        return (file_size or MAX_FILE_SIZE) + min(pixels, self.max_pixels * REJECT_FACTOR) * BYTES_PER_PIXEL
+
+    @asynccontextmanager
+    async def reserve_memory(
+        self,
+        file_size: Optional[int] = None,
+        width: Optional[int] = None,
+        height: Optional[int] = None,
+    ) -> AsyncIterator[None]:
+        """Память под одно изображение из общего бюджета (и для импорта из ZIP)."""
+
+        if file_size and file_size > MAX_FILE_SIZE:
+            raise ImageRejected("Файл больше 20 МБ.")
+        if width and height and width * height > self.max_pixels * REJECT_FACTOR:
+            raise ImageRejected(f"Слишком большое изображение: {width}×{height}.")
+
+        async with self.budget.reserve(self.estimate(file_size, width, height)):
+            yield
+
+    @asynccontextmanager
+    async def reserve(
+        self,
+        file_size: Optional[int] = None,
+        width: Optional[int] = None,
+        height: Optional[int] = None,
+    ) -> AsyncIterator[ImageBuffer]:
+        """Буфер под одно изображение; память держится до выхода из блока."""
+
+        async with self.reserve_memory(file_size, width, height):
+            buffer = self._pool.pop() if self._pool else ImageBuffer(min(file_size or MAX_FILE_SIZE, POOLED_BUFFER_SIZE))
+            try:
+                yield buffer
+            finally:
+                reusable = buffer.reset()
+                if reusable and buffer.capacity <= POOLED_BUFFER_SIZE and len(self._pool) < POOL_SIZE:
+                    self._pool.append(buffer)
+
+    async def download(self, file_id: str, buffer: ImageBuffer) -> memoryview:
+        file = await self.bot.get_file(file_id)
+        if file.file_size and file.file_size > MAX_FILE_SIZE:
+            raise ImageRejected("Файл больше 20 МБ.")
+        await self.bot.download_file(file.file_path, destination=buffer)
+        return buffer.view()
@@ -0,0 +1,231 @@
+import asyncio
+import logging
+import time
+from collections.abc import Awaitable, Callable
+from datetime import timedelta
+from typing import Any, Optional
+
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.metrics import JOB_SECONDS
+from app.models import Job, JobStatus
+from app.profiling import UpdateProfiler
+
+
+logger = logging.getLogger(__name__)
+
+
+JobHandler = Callable[[Job], Awaitable[None]]
+
+MAX_ATTEMPTS = 5
+# задача в running дольше этого считается брошенной (воркер упал/перезапустился)
+VISIBILITY_TIMEOUT = timedelta(minutes=5)
+# выполненные задачи храним сутки — для разбора инцидентов
+DONE_RETENTION = timedelta(days=1)
+IDLE_POLL_INTERVAL = 1.0
+MAINTENANCE_INTERVAL = 60.0
+
+
+class JobQueue:
+    """
+    Очередь задач в Postgres. Переживает рестарты: задача удаляется из очереди
+    только после успешного выполнения, а брошенные running возвращаются в pending.
+    """
+
+    def __init__(self, session_factory: Callable[[], AsyncSession]) -> None:
+        self.session_factory = session_factory
+        self.handlers: dict[str, JobHandler] = {}
+        # kind -> сколько таких задач процесс выполняет одновременно (тяжёлые: OCR)
+        self._limits: dict[str, asyncio.Semaphore] = {}
+        # задаётся при включённом профилировании — задачи пишутся рядом с апдейтами
+        self.profiler: Optional[UpdateProfiler] = None
+        # будит воркеры этого процесса сразу после enqueue + commit
+        self._wakeup = asyncio.Event()
+
+    def register(self, kind: str, handler: JobHandler, limit: Optional[int] = None) -> None:
+        self.handlers[kind] = handler
+        if limit:
+            self._limits[kind] = asyncio.Semaphore(limit)
+
+    # =========================================================
+    # PRODUCER
+    # =========================================================
+
+    async def enqueue(
+        self,
+        session: AsyncSession,
+        kind: str,
+        payload: dict[str, Any],
+        delay: Optional[timedelta] = None,
+    ) -> None:
+        """
+        Добавляет задачу в транзакции вызывающего — коммитит он же,
+        а после commit() зовёт notify(), чтобы не ждать опроса.
+        """
+
+        values: dict[str, Any] = {"kind": kind, "payload": payload}
+        if delay:
+            values["run_after"] = func.now() + delay
+
+        await session.execute(insert(Job).values(**values))
+
+    def notify(self) -> None:
+        self._wakeup.set()
+
+    async def depth(self, session: AsyncSession) -> int:
+        result = await session.execute(
+            select(func.count()).select_from(Job).where(Job.status == JobStatus.pending)
+        )
+        return int(result.scalar_one())
+
+    # =========================================================
+    # CONSUMER
+    # =========================================================
+
+    async def _claim(self, session: AsyncSession) -> Optional[Job]:
+        next_job = select(Job.id).where(Job.status == JobStatus.pending, Job.run_after <= func.now())
+
+        # бюджет вида исчерпан — такие задачи не берём, их заберёт свободный воркер
+        saturated = [kind for kind, semaphore in self._limits.items() if semaphore.locked()]
+        if saturated:
+            next_job = next_job.where(Job.kind.not_in(saturated))
+
+        next_job = (
+            next_job
+            .order_by(Job.run_after, Job.id)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        result = await session.execute(
+            update(Job)
+            .where(Job.id == next_job)
+            .values(
+                status=JobStatus.running,
+                locked_at=func.now(),
+                attempts=Job.attempts + 1,
+            )
+            .returning(Job)
+            .execution_options(synchronize_session=False)
+        )
+        job = result.scalar_one_or_none()
+        await session.commit()
+        return job
+
+    async def _finish(self, session: AsyncSession, job: Job, error: Optional[str]) -> None:
+        if error is None:
+            values: dict[str, Any] = {"status": JobStatus.done, "last_error": None}
+        elif job.attempts >= MAX_ATTEMPTS:
+            values = {"status": JobStatus.failed, "last_error": error}
+        else:
+            # экспоненциальная пауза между попытками: 2, 4, 8, 16 с
+            values = {
+                "status": JobStatus.pending,
+                "last_error": error,
+                "run_after": func.now() + timedelta(seconds=2 ** job.attempts),
+            }
+
+        await session.execute(update(Job).where(Job.id == job.id).values(**values))
+        await session.commit()
+
+    async def recover(self, session: AsyncSession) -> int:
+        """Возвращает в очередь задачи упавших воркеров и чистит старые выполненные."""
+
+        result = await session.execute(
+            update(Job)
+            .where(
+                Job.status == JobStatus.running,
+                Job.locked_at < func.now() - VISIBILITY_TIMEOUT,
+            )
+            .values(status=JobStatus.pending)
+            .returning(Job.id)
+        )
+        recovered = len(result.all())
+
+        await session.execute(
+            delete(Job).where(
+                Job.status == JobStatus.done,
+                Job.created_at < func.now() - DONE_RETENTION,
+            )
+        )
+        await session.commit()
+
+        if recovered:
+            logger.warning("Recovered %s stale jobs", recovered)
+        return recovered
+
+    async def _execute(self, job: Job, handler: JobHandler) -> None:
+        if self.profiler is None:
+            await handler(job)
+        else:
+            await self.profiler.run_job(job, handler)
+
+    async def run_once(self) -> bool:
+        """Берёт и выполняет одну задачу. False — очередь пуста."""
+
+        async with self.session_factory() as session:
+            job = await self._claim(session)
+
+        if job is None:
+            return False
+
+        handler = self.handlers.get(job.kind)
+        error: Optional[str] = None
+        started = time.perf_counter()
+
+        try:
+            if handler is None:
+                raise RuntimeError(f"No handler registered for job kind {job.kind!r}")
+            limit = self._limits.get(job.kind)
+            if limit is None:
+                await self._execute(job, handler)
+            else:
+                # два воркера могли взять задачу одновременно — лишняя подождёт здесь
+                async with limit:
+                    await self._execute(job, handler)
+        except Exception as e:
+            logger.exception("Job %s (%s) failed, attempt %s", job.id, job.kind, job.attempts)
+            error = f"{type(e).__name__}: {e}"
+
+        if error is None:
+            outcome = "done"
+        else:
+            outcome = "failed" if job.attempts >= MAX_ATTEMPTS else "retry"
+        JOB_SECONDS.observe(time.perf_counter() - started, job.kind, outcome)
+
+        async with self.session_factory() as session:
+            await self._finish(session, job, error)
+
+        return True
+
+    async def run_worker(self, name: str) -> None:
+        logger.info("Job worker %s started", name)
+        loop = asyncio.get_running_loop()
+        last_maintenance = 0.0
+
+        while True:
+            try:
+                if loop.time() - last_maintenance >= MAINTENANCE_INTERVAL:
+                    last_maintenance = loop.time()
+                    async with self.session_factory() as session:
+                        await self.recover(session)
+
+                if await self.run_once():
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Job worker %s loop error", name)
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=IDLE_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    def start_workers(self, count: int) -> list[asyncio.Task]:
+        return [
+            asyncio.create_task(self.run_worker(f"worker-{index}"))
+            for index in range(count)
+        ]
@@ -0,0 +1,151 @@
+"""
+Отдельный процесс-воркер очереди задач: python -m app.job_worker
+
+Забирает задачи из той же таблицы jobs, что и воркеры внутри бота,
+поэтому таких процессов можно запускать сколько угодно.
+"""
+
+import asyncio
+import logging
+import os
+
+from aiogram import Bot
+
+from app.ai_parser import AIParserService
+from app.config import get_settings
+import app.database as db
+from app.fsm_storage import build_fsm_storage
+from app.image_ingest import ImageIngest
+from app.job_queue import JobQueue
+from app.lead_pipeline import PHOTO_JOB, PhotoPipeline
+from app.metrics import REGISTRY, serve_metrics
+from app.ocr_service import OCRService
+from app.outbound import OutboundQueue
+from app.profiling import UpdateProfiler
+from app.resilience import OPEN, Breakers
+from app.routing import ManagerRouter
+from app.sheets_service import SheetsService
+from app.sinks import SINK_JOB, LeadSinks
+
+
+logger = logging.getLogger(__name__)
+
+
+def register_gauges(job_queue: JobQueue, outbound: OutboundQueue, breakers: Breakers) -> None:
+    async def job_queue_depth() -> dict[tuple[str, ...], float]:
+        async with db.SessionLocal() as session:
+            return {(): await job_queue.depth(session)}
+
+    REGISTRY.gauge("job_queue_pending", "Pending jobs in the Postgres queue", job_queue_depth)
+    REGISTRY.gauge("outbound_queue_depth", "Telegram messages waiting for rate limits", lambda: {(): outbound.depth})
+    REGISTRY.gauge(
+        "db_pool_events_total",
+        "SQLAlchemy pool connects, checkouts and invalidations",
+        lambda: {(name,): count for name, count in db.pool_events.items()},
+        labelnames=("event",),
+        kind="counter",
+    )
+    REGISTRY.gauge(
+        "circuit_breaker_open",
+        "External sinks failing fast (1 = open)",
+        lambda: {(name,): float(breaker.state == OPEN) for name, breaker in breakers.breakers.items()},
+        labelnames=("circuit",),
+    )
+
+
+async def main() -> None:
+    settings = get_settings()
+
+    logging.basicConfig(
+        level=getattr(logging, settings.log_level.upper(), logging.INFO),
+        format="%(asctime)s %(levelname)s %(name)s %(message)s",
+    )
+
+    db.init_database(settings.database_url, db.pool_config(settings, "worker"))
+
+    bot = Bot(token=settings.bot_token)
+
+    # Черновик лида воркер кладёт в FSM пользователя — в то же хранилище, что и бот
+    storage = await build_fsm_storage(settings, db.engine)
+    if settings.fsm_storage == "memory":
+        logger.warning(
+            "FSM_STORAGE=memory: drafts written by this worker are not visible to the bot process"
+        )
+
+    job_queue = JobQueue(db.SessionLocal)
+    if settings.profile_sample_rate > 0 or settings.profile_slow_threshold > 0:
+        job_queue.profiler = UpdateProfiler(
+            # каталоги процессов бота — номера шардов/воркеров, у этого свой
+            directory=os.path.join(settings.profile_dir, "job_worker"),
+            sample_rate=settings.profile_sample_rate,
+            slow_threshold=settings.profile_slow_threshold,
+            keep=settings.profile_keep,
+        )
+    manager_router = ManagerRouter(settings.stats_timezone) if settings.auto_assign else None
+    photo_pipeline = PhotoPipeline(
+        bot,
+        storage,
+        db.SessionLocal,
+        OCRService(max_pixels=settings.image_max_pixels),
+        AIParserService(api_key=settings.openai_api_key, model=settings.openai_model),
+        ImageIngest(
+            bot,
+            max_pixels=settings.image_max_pixels,
+            memory_limit=settings.image_memory_limit_mb * 1024 * 1024,
+        ),
+        manager_router,
+    )
+    # OCR в воркерах — тот же бюджет тяжёлой работы, что и у апдейтов
+    job_queue.register(PHOTO_JOB, photo_pipeline.handle_job, limit=settings.heavy_concurrency)
+
+    # отложенные доставки в Google Sheets и группы менеджеров
+    outbound = OutboundQueue(
+        bot,
+        global_rate=settings.outbound_global_rate,
+        chat_rate=settings.outbound_chat_rate,
+        group_per_minute=settings.outbound_group_per_minute,
+    )
+    breakers = Breakers(settings.breaker_failures, settings.breaker_reset_seconds)
+    lead_sinks = LeadSinks(
+        SheetsService(
+            service_account_json=settings.google_service_account_json,
+            master_sheet_id=settings.master_sheet_id,
+            timeout=settings.sheets_timeout,
+        ),
+        outbound,
+        breakers,
+        job_queue,
+        db.SessionLocal,
+        sheets_timeout=settings.sheets_timeout,
+        telegram_timeout=settings.telegram_timeout,
+    )
+    job_queue.register(SINK_JOB, lead_sinks.handle_job)
+
+    workers = job_queue.start_workers(max(settings.job_workers, 1))
+
+    # свой порт: бот на том же хосте уже слушает METRICS_PORT
+    if settings.job_worker_metrics_port:
+        register_gauges(job_queue, outbound, breakers)
+        workers.append(
+            asyncio.create_task(serve_metrics(settings.metrics_host, settings.job_worker_metrics_port))
+        )
+    if manager_router is not None:
+        workers.append(
+            asyncio.create_task(
+                manager_router.run_reconciliation(db.SessionLocal, settings.routing_reconcile_interval)
+            )
+        )
+
+    try:
+        await asyncio.gather(*workers)
+    finally:
+        for worker in workers:
+            worker.cancel()
+        await outbound.close()
+        await storage.close()
+        await bot.session.close()
+        await db.engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -2,6 +2,7 @@ from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
 from app.models import Manager
+from app.reminders import REMINDER_PRESETS
 
 
 # ================= Выбор менеджера (для администратора) =================
@@ -27,19 +28,86 @@ def managers_keyboard(managers: list[Manager]) -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
+def auto_manager_keyboard() -> InlineKeyboardMarkup:
+    """Менеджер назначен автоматически — администратор может переназначить."""
+
+    builder = InlineKeyboardBuilder()
+    builder.button(text="🔁 Другой менеджер", callback_data="manager:override")
+    builder.button(text="Отмена", callback_data="manager:cancel")
+    builder.adjust(1)
+    return builder.as_markup()
+
+
 # ================= Статусы лида (только для менеджеров) =================
 
+STATUS_BUTTONS = (
+    ("🔵 В работе", "in_work"),
+    ("📅 Перезвонить", "callback_later"),
+    ("📞 Нет ответа", "no_answer"),
+    ("❌ Отказ", "rejected"),
+    ("🩺 Консультация", "consult_scheduled"),
+    ("🏥 Операция", "surgery_scheduled"),
+    ("✅ Прооперирован", "operated"),
+)
+
+
 def lead_status_keyboard(lead_id: str) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
 
-    builder.button(text="🔵 В работе", callback_data=f"status:{lead_id}:in_work")
-    builder.button(text="📅 Перезвонить", callback_data=f"status:{lead_id}:callback_later")
-    builder.button(text="📞 Нет ответа", callback_data=f"status:{lead_id}:no_answer")
-    builder.button(text="❌ Отказ", callback_data=f"status:{lead_id}:rejected")
-    builder.button(text="🩺 Консультация", callback_data=f"status:{lead_id}:consult_scheduled")
-    builder.button(text="🏥 Операция", callback_data=f"status:{lead_id}:surgery_scheduled")
-    builder.button(text="✅ Прооперирован", callback_data=f"status:{lead_id}:operated")
+    for text, status in STATUS_BUTTONS:
+        builder.button(text=text, callback_data=f"status:{lead_id}:{status}")
 
     builder.adjust(2)  # по 2 кнопки в строке
 
-    return builder.as_markup()
\ No newline at end of file
+    return builder.as_markup()
+
+
+def reminder_keyboard(lead_id: str) -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+
+    for preset, (text, _) in REMINDER_PRESETS.items():
+        builder.button(text=text, callback_data=f"remind:{lead_id}:{preset}")
+    builder.button(text="Без напоминания", callback_data=f"remind:{lead_id}:none")
+
+    builder.adjust(2)
+
+    return builder.as_markup()
+
+
+# ================= Массовая смена статуса =================
+
+def bulk_select_keyboard(labels: list[str], selected: set[int]) -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+
+    for index, label in enumerate(labels):
+        mark = "✅" if index in selected else "▫️"
+        builder.row(
+            InlineKeyboardButton(text=f"{mark} {label}", callback_data=f"bulk:pick:{index}")
+        )
+
+    builder.row(
+        InlineKeyboardButton(text="Выбрать все", callback_data="bulk:all"),
+        InlineKeyboardButton(text=f"Статус ({len(selected)}) →", callback_data="bulk:next"),
+    )
+    builder.row(InlineKeyboardButton(text="Отмена", callback_data="bulk:cancel"))
+
+    return builder.as_markup()
+
+
+def bulk_status_keyboard() -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+
+    for text, status in STATUS_BUTTONS:
+        builder.button(text=text, callback_data=f"bulk:status:{status}")
+    builder.button(text="← Назад", callback_data="bulk:back")
+
+    builder.adjust(2)
+
+    return builder.as_markup()
+
+# ================= Поиск лидов =================
+
+def search_more_keyboard() -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    builder.button(text="⬇️ Ещё", callback_data="find:more")
+    return builder.as_markup()
@@ -0,0 +1,61 @@
+import re
+from typing import Any, Optional
+
+
+# Порядок важен: первый найденный контакт становится основным
+CONTACT_TYPES = (
+    ("phone", "Телефон"),
+    ("telegram", "Telegram"),
+    ("whatsapp", "WhatsApp"),
+    ("max", "MAX"),
+)
+
+# contact_type -> колонка Lead
+CONTACT_COLUMNS = {
+    "Телефон": "phone",
+    "Telegram": "telegram_username",
+    "WhatsApp": "whatsapp",
+    "MAX": "messenger_max",
+}
+
+
+def calculate_bmi(weight: float | None, height: float | None) -> float | None:
+    if not weight or not height:
+        return None
+    try:
+        height_m = height / 100
+        return round(weight / (height_m ** 2), 2)
+    except Exception:
+        return None
+
+
+def normalize_phone(phone: str) -> str:
+    digits = re.sub(r"\D", "", phone)
+
+    if digits.startswith("8") and len(digits) == 11:
+        return "+7" + digits[1:]
+    if digits.startswith("7") and len(digits) == 11:
+        return "+7" + digits[1:]
+
+    return phone
+
+
+def pick_contact(parsed: dict[str, Any]) -> tuple[Optional[str], Optional[str]]:
+    """Основной контакт из результата AIParserService: (значение, тип)."""
+
+    for key, contact_type in CONTACT_TYPES:
+        if parsed.get(key):
+            return parsed[key], contact_type
+    return None, None
+
+
+def contact_columns(contact: Optional[str], contact_type: Optional[str]) -> dict[str, Optional[str]]:
+    """Раскладывает основной контакт по колонкам Lead."""
+
+    columns: dict[str, Optional[str]] = {column: None for column in CONTACT_COLUMNS.values()}
+    columns["email"] = None
+
+    if contact and contact_type in CONTACT_COLUMNS:
+        columns[CONTACT_COLUMNS[contact_type]] = contact
+
+    return columns
@@ -0,0 +1,206 @@
+import logging
+import uuid
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Optional
+
+from aiogram import Bot
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State, StatesGroup
+from aiogram.fsm.storage.base import BaseStorage, StorageKey
+from aiogram.types import Message
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.ai_parser import AIParserService
+from app.image_ingest import ImageIngest, ImageRejected
+from app.job_queue import MAX_ATTEMPTS
+from app.keyboards import auto_manager_keyboard, managers_keyboard
+from app.lead_fields import calculate_bmi, pick_contact
+from app.metrics import stage
+from app.models import Job, Manager
+from app.ocr_service import OCRService
+from app.routing import ManagerRouter
+
+
+logger = logging.getLogger(__name__)
+
+
+PHOTO_JOB = "photo"
+
+COMMENT_PROMPT = "Добавить комментарий? Напишите текст или отправьте '-' если без комментария."
+
+
+# ================= FSM =================
+
+class LeadFSM(StatesGroup):
+    waiting_manager = State()
+    waiting_comment = State()
+
+
+# ================= Draft =================
+
+@dataclass(slots=True)
+class LeadDraft:
+    id: str
+    name: Optional[str]
+    contact: Optional[str]
+    contact_type: Optional[str]
+    weight_kg: Optional[float]
+    height_cm: Optional[float]
+    bmi: Optional[float]
+
+
+def photo_job_payload(message: Message, progress_message: Message) -> dict[str, Any]:
+    """Всё, что нужно воркеру, чтобы обработать фото без исходного апдейта."""
+
+    photo = message.photo[-1]
+    return {
+        "file_id": photo.file_id,
+        # размеры из апдейта — память под фото резервируется до скачивания
+        "file_size": photo.file_size,
+        "width": photo.width,
+        "height": photo.height,
+        "chat_id": message.chat.id,
+        "user_id": message.from_user.id if message.from_user else message.chat.id,
+        "progress_message_id": progress_message.message_id,
+    }
+
+
+class PhotoPipeline:
+    """
+    Скачивание → OCR → разбор → черновик в FSM → карточка с выбором менеджера.
+    Запускается воркером очереди (app.job_queue) или прямо из обработчика.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        storage: BaseStorage,
+        session_factory: Callable[[], AsyncSession],
+        ocr_service: OCRService,
+        ai_parser: AIParserService,
+        image_ingest: ImageIngest,
+        manager_router: Optional[ManagerRouter] = None,
+    ) -> None:
+        self.bot = bot
+        self.storage = storage
+        self.session_factory = session_factory
+        self.ocr_service = ocr_service
+        self.ai_parser = ai_parser
+        self.image_ingest = image_ingest
+        # None — менеджера выбирает администратор (AUTO_ASSIGN выключен)
+        self.manager_router = manager_router
+
+    def _state(self, payload: dict[str, Any]) -> FSMContext:
+        key = StorageKey(
+            bot_id=self.bot.id,
+            chat_id=payload["chat_id"],
+            user_id=payload["user_id"],
+        )
+        return FSMContext(storage=self.storage, key=key)
+
+    async def _edit(self, payload: dict[str, Any], text: str, **kwargs: Any) -> None:
+        await self.bot.edit_message_text(
+            text=text,
+            chat_id=payload["chat_id"],
+            message_id=payload["progress_message_id"],
+            **kwargs,
+        )
+
+    async def _recognize(self, payload: dict[str, Any]) -> str:
+        # буфер и память под изображение держатся только на время OCR
+        async with self.image_ingest.reserve(
+            payload.get("file_size"),
+            payload.get("width"),
+            payload.get("height"),
+        ) as buffer:
+            with stage("download"):
+                image = await self.image_ingest.download(payload["file_id"], buffer)
+
+            with stage("ocr", engine="tesseract"):
+                return await self.ocr_service.extract_text(image)
+
+    async def process(self, payload: dict[str, Any]) -> None:
+        try:
+            raw_text = await self._recognize(payload)
+        except ImageRejected as e:
+            await self._edit(payload, f"{e} Пришлите обычный скриншот заявки.")
+            return
+
+        if not raw_text.strip():
+            await self._edit(payload, "Не удалось извлечь текст из изображения.")
+            return
+
+        with stage("parse"):
+            parsed = await self.ai_parser.parse_lead_text(raw_text)
+
+        weight = float(parsed["weight_kg"]) if parsed.get("weight_kg") else None
+        height = float(parsed["height_cm"]) if parsed.get("height_cm") else None
+        bmi = calculate_bmi(weight, height)
+
+        contact, contact_type = pick_contact(parsed)
+
+        draft = LeadDraft(
+            id=str(uuid.uuid4()),
+            name=parsed.get("name"),
+            contact=contact,
+            contact_type=contact_type,
+            weight_kg=weight,
+            height_cm=height,
+            bmi=bmi,
+        )
+
+        card_text = (
+            f"Имя: {draft.name or '-'}\n"
+            f"Контакт ({draft.contact_type or '-'}): {draft.contact or '-'}\n"
+            f"Вес: {draft.weight_kg or '-'}\n"
+            f"Рост: {draft.height_cm or '-'}\n"
+            f"BMI: {draft.bmi or '-'}"
+        )
+
+        state = self._state(payload)
+        if self.manager_router is not None:
+            # новое фото заменяет прежний черновик — его резерв больше не нужен
+            self.manager_router.release_draft(await state.get_data())
+
+        # горячий лид сразу уходит наименее загруженному менеджеру
+        manager = self.manager_router.pick() if self.manager_router and draft.contact else None
+        if manager is not None:
+            with stage("fsm"):
+                await state.update_data(
+                    lead_draft=asdict(draft),
+                    manager_id=str(manager.id),
+                    auto_manager_id=str(manager.id),
+                )
+            with stage("sink", sink="telegram_card"):
+                await self._edit(
+                    payload,
+                    f"{card_text}\n\n👤 Менеджер: {manager.name} (автоматически)\n\n{COMMENT_PROMPT}",
+                    reply_markup=auto_manager_keyboard(),
+                )
+            await state.set_state(LeadFSM.waiting_comment)
+            return
+
+        with stage("fsm"):
+            # резерв прежнего черновика уже снят — его менеджер здесь не нужен
+            await state.update_data(lead_draft=asdict(draft), manager_id=None, auto_manager_id=None)
+
+        with stage("db"):
+            async with self.session_factory() as session:
+                result = await session.execute(select(Manager).where(Manager.active.is_(True)))
+                managers = list(result.scalars().all())
+
+        with stage("sink", sink="telegram_card"):
+            await self._edit(payload, card_text, reply_markup=managers_keyboard(managers))
+        await state.set_state(LeadFSM.waiting_manager)
+
+    async def handle_job(self, job: Job) -> None:
+        try:
+            await self.process(job.payload)
+        except Exception:
+            if job.attempts >= MAX_ATTEMPTS:
+                try:
+                    await self._edit(job.payload, "Не удалось обработать скриншот. Пришлите его ещё раз.")
+                except Exception:
+                    logger.exception("Failed to report photo job %s failure", job.id)
+            raise
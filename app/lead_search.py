@@ -0,0 +1,126 @@
+import re
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import or_, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Lead
+
+
+MIN_QUERY_LENGTH = 2
+# телефон ищем только по %цифрам%: короче триграммы такой LIKE совпадёт почти со всем
+MIN_PHONE_DIGITS = 3
+PAGE_SIZE = 5
+
+
+@dataclass(slots=True)
+class SearchCursor:
+    """Позиция keyset-пагинации: последний показанный (created_at, id)."""
+
+    created_at: datetime
+    id: uuid.UUID
+
+    def dump(self) -> dict[str, str]:
+        return {"created_at": self.created_at.isoformat(), "id": str(self.id)}
+
+    @classmethod
+    def load(cls, raw: dict[str, str] | None) -> Optional["SearchCursor"]:
+        if not raw:
+            return None
+        return cls(
+            created_at=datetime.fromisoformat(raw["created_at"]),
+            id=uuid.UUID(raw["id"]),
+        )
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _phone_digits(query: str) -> Optional[str]:
+    # "8 999 123-45" → "7999123", чтобы совпадать с нормализованным +7XXXXXXXXXX
+    if re.search(r"[^\d\s()+\-]", query):
+        return None
+    digits = re.sub(r"\D", "", query)
+    if len(digits) < MIN_PHONE_DIGITS:
+        return None
+    if digits.startswith("8") and len(digits) > 1:
+        digits = "7" + digits[1:]
+    return digits
+
+
+def _pattern(value: str) -> str:
+    # pg_trgm не строит триграммы для строк короче 3 символов внутри слова,
+    # поэтому короткие запросы ищем по префиксу — это тот же GIN-индекс.
+    escaped = _escape_like(value)
+    if len(value) < 3:
+        return f"{escaped}%"
+    return f"%{escaped}%"
+
+
+def normalize_query(query: str) -> str:
+    """Один нормализованный запрос для всех полей: без пробелов по краям и ведущего @."""
+
+    return query.strip().lstrip("@").strip()
+
+
+def _conditions(query: str) -> list:
+    pattern = _pattern(query)
+    conditions = [
+        Lead.name.ilike(pattern, escape="\\"),
+        Lead.telegram_username.ilike(pattern, escape="\\"),
+        Lead.email.ilike(pattern, escape="\\"),
+    ]
+    if not pattern.startswith("%"):
+        # username бывает сохранён с @ — префикс ищем и после него
+        conditions.append(Lead.telegram_username.ilike(f"@{pattern}", escape="\\"))
+
+    digits = _phone_digits(query)
+    if digits:
+        conditions.append(Lead.phone.like(f"%{digits}%"))
+    return conditions
+
+
+async def search_leads(
+    session: AsyncSession,
+    query: str,
+    *,
+    manager_id: uuid.UUID | None = None,
+    after: SearchCursor | None = None,
+    limit: int = PAGE_SIZE,
+) -> tuple[list[Lead], Optional[SearchCursor]]:
+    """
+    Ищет лиды по имени, телефону, Telegram и email.
+    Возвращает страницу (новые сверху) и курсор следующей страницы.
+    """
+
+    query = normalize_query(query)
+    if len(query) < MIN_QUERY_LENGTH:
+        return [], None
+
+    stmt = select(Lead).where(or_(*_conditions(query)))
+
+    if manager_id is not None:
+        stmt = stmt.where(Lead.manager_id == manager_id)
+
+    if after is not None:
+        stmt = stmt.where(
+            tuple_(Lead.created_at, Lead.id) < tuple_(after.created_at, after.id)
+        )
+
+    # берём на одну строку больше, чтобы понять, есть ли следующая страница
+    stmt = stmt.order_by(Lead.created_at.desc(), Lead.id.desc()).limit(limit + 1)
+
+    result = await session.execute(stmt)
+    leads = list(result.scalars().all())
+
+    next_cursor: Optional[SearchCursor] = None
+    if len(leads) > limit:
+        leads = leads[:limit]
+        last = leads[-1]
+        next_cursor = SearchCursor(created_at=last.created_at, id=last.id)
+
+    return leads, next_cursor
@@ -1,22 +1,53 @@
 import asyncio
 import sys
+import time
+
+# до остальных импортов: отсюда считаем время старта
+PROCESS_STARTED = time.monotonic()
 
 if sys.platform.startswith("win"):
     asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
 
 import logging
-from typing import Any, Awaitable, Callable, Dict
+import multiprocessing
+import os
+import signal
+from datetime import timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional
 
 from aiogram import Bot, Dispatcher
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from aiogram.dispatcher.middlewares.base import BaseMiddleware
+from aiogram.fsm.storage.base import BaseStorage
 from aiogram.types import TelegramObject
 
 from app.ai_parser import AIParserService
-from app.config import get_settings
+from app.archive import LeadArchiver
+from app.bulk_import import BulkImportService
+from app.config import Settings, get_settings
 import app.database as db
+from app.fsm_storage import PostgresStorage, build_fsm_storage
 from app.handlers import router
+from app.image_ingest import ImageIngest
+from app.job_queue import JobQueue
+from app.lead_pipeline import PHOTO_JOB, PhotoPipeline
+from app.metrics import REGISTRY, HandlerMetricsMiddleware, serve_metrics
 from app.ocr_service import OCRService
+from app.outbound import OutboundQueue
+from app.partitions import run_partition_maintenance
+from app.profiling import UpdateProfiler
+from app.reminders import ReminderScheduler
+from app.resilience import OPEN, Breakers
+from app.routing import ManagerRouter
+from app.scheduling import AdmissionMiddleware
+from app.startup import Readiness, ReadinessMiddleware
 from app.sheets_service import SheetsService
+from app.sinks import SINK_JOB, LeadSinks
+from app.stats_service import StatsService
+from app.status_history import StatusHistoryService
+from app.supervisor import Supervisor
+from app.webhook import register_webhook, serve_webhook
 
 
 class DatabaseSessionMiddleware(BaseMiddleware):
@@ -34,37 +65,400 @@ class DatabaseSessionMiddleware(BaseMiddleware):
             return await handler(event, data)
 
 
-async def main() -> None:
-    settings = get_settings()
+def register_gauges(
+    job_queue: JobQueue,
+    outbound: OutboundQueue,
+    admission: AdmissionMiddleware,
+    storage: Any,
+    breakers: Breakers,
+) -> None:
+    async def job_queue_depth() -> dict[tuple[str, ...], float]:
+        async with db.SessionLocal() as session:
+            return {(): await job_queue.depth(session)}
 
+    def pool_usage() -> dict[tuple[str, ...], float]:
+        pool = db.engine.pool
+        return {
+            ("size",): pool.size(),
+            ("checked_out",): pool.checkedout(),
+            ("overflow",): pool.overflow(),
+            ("max",): db.pool_settings.profile.size + db.pool_settings.profile.max_overflow,
+        }
+
+    REGISTRY.gauge("job_queue_pending", "Pending jobs in the Postgres queue", job_queue_depth)
+    REGISTRY.gauge("outbound_queue_depth", "Telegram messages waiting for rate limits", lambda: {(): outbound.depth})
+    REGISTRY.gauge(
+        "admission_heavy",
+        "Heavy updates running and waiting for the budget",
+        lambda: {("running",): admission.heavy_running, ("waiting",): admission.heavy_waiting},
+        labelnames=("state",),
+    )
+    REGISTRY.gauge("db_pool_connections", "SQLAlchemy pool usage", pool_usage, labelnames=("state",))
+    REGISTRY.gauge(
+        "db_pool_events_total",
+        "SQLAlchemy pool connects, checkouts and invalidations",
+        lambda: {(name,): count for name, count in db.pool_events.items()},
+        labelnames=("event",),
+        kind="counter",
+    )
+
+    REGISTRY.gauge(
+        "circuit_breaker_open",
+        "External sinks failing fast (1 = open)",
+        lambda: {(name,): float(breaker.state == OPEN) for name, breaker in breakers.breakers.items()},
+        labelnames=("circuit",),
+    )
+    REGISTRY.gauge(
+        "circuit_breaker_trips_total",
+        "Times each circuit opened",
+        lambda: {(name,): breaker.trips for name, breaker in breakers.breakers.items()},
+        labelnames=("circuit",),
+        kind="counter",
+    )
+
+    if isinstance(storage, PostgresStorage):
+        REGISTRY.gauge(
+            "fsm_cache_lookups_total",
+            "FSM storage reads by cache result",
+            lambda: {("hit",): storage.cache_hits, ("miss",): storage.cache_misses},
+            labelnames=("cache",),
+            kind="counter",
+        )
+
+
+def setup_logging(settings: Settings) -> None:
     logging.basicConfig(
         level=getattr(logging, settings.log_level.upper(), logging.INFO),
         format="%(asctime)s %(levelname)s %(name)s %(message)s",
     )
 
-    # Init DB + create tables
-    db.init_database(settings.database_url)
-    await db.create_tables()
 
-    bot = Bot(token=settings.bot_token)
-    dp = Dispatcher()
+def create_bot(settings: Settings) -> Bot:
+    if settings.telegram_api_url:
+        session = AiohttpSession(api=TelegramAPIServer.from_base(settings.telegram_api_url))
+        return Bot(token=settings.bot_token, session=session)
+    return Bot(token=settings.bot_token)
+
+
+def build_dispatcher(
+    settings: Settings,
+    bot: Bot,
+    storage: BaseStorage,
+    worker_index: Optional[int] = None,
+    sheets_service: Optional[SheetsService] = None,
+) -> Dispatcher:
+    """
+    Dispatcher с middleware и сервисами — без фоновых задач и сети.
+    Его же собирает loadtest.py (туда передаётся заглушка SheetsService).
+    """
+
+    dp = Dispatcher(storage=storage)
 
+    readiness = Readiness(PROCESS_STARTED)
+    dp.update.outer_middleware(ReadinessMiddleware(readiness))
+    admission = AdmissionMiddleware(
+        heavy_limit=settings.heavy_concurrency,
+        queue_limit=settings.heavy_queue_limit,
+    )
+    dp.update.outer_middleware(admission)
+    profiler = None
+    if settings.profile_sample_rate > 0 or settings.profile_slow_threshold > 0:
+        profiler = UpdateProfiler(
+            # у каждого процесса свой каталог — без гонок при ротации
+            directory=os.path.join(settings.profile_dir, str(worker_index or 0)),
+            sample_rate=settings.profile_sample_rate,
+            slow_threshold=settings.profile_slow_threshold,
+            keep=settings.profile_keep,
+        )
+        dp.update.middleware(profiler)
     dp.update.middleware(DatabaseSessionMiddleware())
+    router.message.middleware(HandlerMetricsMiddleware())
+    router.callback_query.middleware(HandlerMetricsMiddleware())
     dp.include_router(router)
 
     # Services
-    dp["ocr_service"] = OCRService()
-    dp["ai_parser"] = AIParserService(
+    dp["settings"] = settings
+    dp["readiness"] = readiness
+    dp["admission"] = admission
+    dp["profiler"] = profiler
+    ocr_service = OCRService(max_pixels=settings.image_max_pixels)
+    dp["ocr_service"] = ocr_service
+    ai_parser = AIParserService(
         api_key=settings.openai_api_key,
         model=settings.openai_model,
     )
-    dp["sheets_service"] = SheetsService(
+    dp["ai_parser"] = ai_parser
+    sheets_service = sheets_service or SheetsService(
         service_account_json=settings.google_service_account_json,
         master_sheet_id=settings.master_sheet_id,
+        timeout=settings.sheets_timeout,
+    )
+    dp["sheets_service"] = sheets_service
+    stats_service = StatsService(timezone=settings.stats_timezone)
+    dp["stats_service"] = stats_service
+    # один бюджет памяти на фото из Telegram и скриншоты из ZIP-импорта
+    image_ingest = ImageIngest(
+        bot,
+        max_pixels=settings.image_max_pixels,
+        memory_limit=settings.image_memory_limit_mb * 1024 * 1024,
+    )
+    bulk_import = BulkImportService(
+        sheets_service,
+        stats_service,
+        workers=settings.import_workers,
+        image_ingest=image_ingest,
+    )
+    dp["bulk_import"] = bulk_import
+    dp["status_history"] = StatusHistoryService()
+    lead_archiver = LeadArchiver(
+        archive_after_days=settings.archive_after_days,
+        batch_size=settings.archive_batch_size,
+    )
+    dp["lead_archiver"] = lead_archiver
+    outbound = OutboundQueue(
+        bot,
+        global_rate=settings.outbound_global_rate,
+        chat_rate=settings.outbound_chat_rate,
+        group_per_minute=settings.outbound_group_per_minute,
+    )
+    dp["outbound"] = outbound
+
+    # напоминания о лидах «перезвонить» / «консультация»
+    dp["reminders"] = ReminderScheduler(
+        db.SessionLocal,
+        outbound,
+        settings.stats_timezone,
+        window_seconds=settings.reminder_window_seconds,
+        send_timeout=settings.telegram_timeout,
+    )
+
+    # Photo processing queue
+    job_queue = JobQueue(db.SessionLocal)
+    job_queue.profiler = profiler
+    # нагрузка менеджеров для автораспределения и /routing
+    manager_router = ManagerRouter(settings.stats_timezone)
+    dp["manager_router"] = manager_router
+    photo_pipeline = PhotoPipeline(
+        bot,
+        dp.storage,
+        db.SessionLocal,
+        ocr_service,
+        ai_parser,
+        image_ingest,
+        manager_router if settings.auto_assign else None,
+    )
+    # OCR в воркерах — тот же бюджет тяжёлой работы, что и у апдейтов
+    job_queue.register(PHOTO_JOB, photo_pipeline.handle_job, limit=settings.heavy_concurrency)
+    dp["job_queue"] = job_queue
+    dp["photo_pipeline"] = photo_pipeline
+
+    # Google Sheets и группы менеджеров: дедлайны, размыкатели, отложенная доставка
+    breakers = Breakers(settings.breaker_failures, settings.breaker_reset_seconds)
+    lead_sinks = LeadSinks(
+        sheets_service,
+        outbound,
+        breakers,
+        job_queue,
+        db.SessionLocal,
+        sheets_timeout=settings.sheets_timeout,
+        telegram_timeout=settings.telegram_timeout,
+    )
+    job_queue.register(SINK_JOB, lead_sinks.handle_job)
+    dp["breakers"] = breakers
+    dp["lead_sinks"] = lead_sinks
+
+    return dp
+
+
+async def run_bot(
+    settings: Settings,
+    worker_index: Optional[int] = None,
+    shard_port: Optional[int] = None,
+) -> None:
+    """
+    Один процесс бота. worker_index задан у дочерних процессов (webhook-воркеры,
+    шарды супервизора): таблицы и webhook к этому моменту уже подготовил
+    родитель, а фоновое обслуживание базы крутит только воркер 0.
+    shard_port — шард слушает апдейты от супервизора на 127.0.0.1.
+    """
+
+    db.init_database(settings.database_url, db.pool_config(settings, "bot"))
+    if worker_index is None:
+        await db.create_tables()
+
+    bot = create_bot(settings)
+    # FSM в Postgres: черновики лидов переживают рестарт и видны воркерам очереди
+    storage = await build_fsm_storage(settings, db.engine)
+    dp = build_dispatcher(settings, bot, storage, worker_index)
+
+    readiness: Readiness = dp["readiness"]
+    admission: AdmissionMiddleware = dp["admission"]
+    ocr_service: OCRService = dp["ocr_service"]
+    sheets_service: SheetsService = dp["sheets_service"]
+    stats_service: StatsService = dp["stats_service"]
+    bulk_import: BulkImportService = dp["bulk_import"]
+    lead_archiver: LeadArchiver = dp["lead_archiver"]
+    outbound: OutboundQueue = dp["outbound"]
+    job_queue: JobQueue = dp["job_queue"]
+
+    # Background jobs
+    background_tasks = job_queue.start_workers(settings.job_workers)
+
+    if settings.metrics_port:
+        register_gauges(job_queue, outbound, admission, storage, dp["breakers"])
+        background_tasks.append(
+            asyncio.create_task(
+                serve_metrics(settings.metrics_host, settings.metrics_port + (worker_index or 0))
+            )
+        )
+
+    # Google Sheets и OCR прогреваются, пока бот уже принимает апдейты
+    background_tasks.append(
+        asyncio.create_task(
+            readiness.warm_up(
+                {
+                    "db": db.warm_up_pool,
+                    "ocr": ocr_service.warm_up,
+                    "sheets": sheets_service.warm_up,
+                }
+            )
+        )
     )
 
-    await dp.start_polling(bot)
+    # куча напоминаний у каждого процесса; отправку делят advisory-локи
+    background_tasks.append(asyncio.create_task(dp["reminders"].run()))
+
+    if settings.auto_assign:
+        # счётчики нагрузки свои в каждом процессе — сверяет каждый
+        background_tasks.append(
+            asyncio.create_task(
+                dp["manager_router"].run_reconciliation(db.SessionLocal, settings.routing_reconcile_interval)
+            )
+        )
+
+    if worker_index in (None, 0):
+        background_tasks += [
+            asyncio.create_task(
+                stats_service.run_reconciliation(db.SessionLocal, settings.stats_reconcile_interval)
+            ),
+            asyncio.create_task(
+                run_partition_maintenance(
+                    db.engine,
+                    settings.partition_maintenance_interval,
+                    {"lead_status_events": settings.status_events_retention_months},
+                )
+            ),
+            asyncio.create_task(
+                lead_archiver.run(db.engine, db.SessionLocal, settings.archive_interval)
+            ),
+        ]
+        if isinstance(storage, PostgresStorage):
+            background_tasks.append(
+                asyncio.create_task(
+                    storage.run_sweeper(
+                        timedelta(hours=settings.fsm_state_ttl_hours),
+                        settings.fsm_sweep_interval,
+                        on_expired=dp["manager_router"].release_draft,
+                    )
+                )
+            )
+
+    try:
+        if shard_port is not None:
+            await serve_webhook(
+                bot,
+                dp,
+                settings,
+                host="127.0.0.1",
+                port=shard_port,
+                handle_in_background=False,
+            )
+        elif settings.run_mode == "webhook":
+            if worker_index is None:
+                await register_webhook(bot, dp, settings)
+            await serve_webhook(bot, dp, settings, reuse_port=worker_index is not None)
+        else:
+            # после webhook-режима getUpdates вернёт конфликт, пока webhook не снят
+            await bot.delete_webhook()
+            await dp.start_polling(bot)
+    finally:
+        for task in background_tasks:
+            task.cancel()
+        await asyncio.gather(*background_tasks, return_exceptions=True)
+        await outbound.close()
+        bulk_import.close()
+
+
+# ================= WEBHOOK WORKERS =================
+
+async def prepare_webhook(settings: Settings) -> None:
+    """Один раз перед запуском воркеров: таблицы и регистрация webhook."""
+
+    db.init_database(settings.database_url, db.pool_config(settings))
+    await db.create_tables()
+    await db.engine.dispose()
+
+    bot = create_bot(settings)
+    dp = Dispatcher()
+    dp.include_router(router)
+    try:
+        await register_webhook(bot, dp, settings)
+    finally:
+        await bot.session.close()
+
+
+def _webhook_worker(index: int) -> None:
+    settings = get_settings()
+    setup_logging(settings)
+    asyncio.run(run_bot(settings, worker_index=index))
+
+
+def _shard_worker(index: int, port: int) -> None:
+    settings = get_settings()
+    setup_logging(settings)
+    asyncio.run(run_bot(settings, worker_index=index, shard_port=port))
+
+
+def run_webhook_workers(settings: Settings) -> None:
+    """
+    N процессов на одном порту (SO_REUSEPORT). FSM общий (Postgres),
+    поэтому апдейты одного пользователя могут попадать в разные процессы.
+    """
+
+    asyncio.run(prepare_webhook(settings))
+
+    context = multiprocessing.get_context("spawn")
+    workers = [
+        context.Process(target=_webhook_worker, args=(index,), name=f"webhook-{index}")
+        for index in range(settings.webhook_workers)
+    ]
+    for worker in workers:
+        worker.start()
+
+    def _stop(signum: int, frame: Any) -> None:
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+
+    for worker in workers:
+        worker.join()
+
+
+def main() -> None:
+    settings = get_settings()
+    setup_logging(settings)
+
+    if settings.shard_workers > 0:
+        supervisor = Supervisor(settings, _shard_worker)
+        asyncio.run(supervisor.run(create_bot(settings), router.resolve_used_update_types()))
+    elif settings.run_mode == "webhook" and settings.webhook_workers > 1:
+        run_webhook_workers(settings)
+    else:
+        asyncio.run(run_bot(settings))
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    main()
\ No newline at end of file
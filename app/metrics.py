@@ -0,0 +1,276 @@
+import asyncio
+import inspect
+import logging
+import time
+from bisect import bisect_left
+from collections.abc import Awaitable, Callable
+from contextvars import ContextVar
+from typing import Any, Optional, Union
+
+from aiogram.dispatcher.middlewares.base import BaseMiddleware
+from aiogram.types import TelegramObject
+from aiohttp import web
+
+
+logger = logging.getLogger(__name__)
+
+
+# от 5 мс (запрос в Postgres) до 60 с (медленный OCR большого скриншота)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelValues = tuple[str, ...]
+GaugeCallback = Callable[[], Union[dict[LabelValues, float], Awaitable[dict[LabelValues, float]]]]
+
+
+def _format_labels(names: tuple[str, ...], values: LabelValues, extra: str = "") -> str:
+    pairs = [
+        f'{name}="{value}"'
+        for name, value in zip(names, values)
+        if value != ""
+    ]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: dict[LabelValues, float] = {}
+
+    def inc(self, *labelvalues: str, amount: float = 1) -> None:
+        self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for labels, value in self._values.items():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """
+    Гистограмма в формате Prometheus. На горячем пути — bisect и два
+    сложения в словаре; без блокировок: всё пишется из одного event loop.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # labels -> [counts по бакетам..., count, sum]
+        self._series: dict[LabelValues, list[float]] = {}
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        series = self._series.get(labelvalues)
+        if series is None:
+            series = self._series[labelvalues] = [0] * (len(self.buckets) + 2)
+        index = bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            series[index] += 1
+        series[-2] += 1
+        series[-1] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, series in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                bucket_labels = _format_labels(self.labelnames, labels, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            inf_labels = _format_labels(self.labelnames, labels, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{inf_labels} {series[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {series[-2]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(series[-1])}")
+        return lines
+
+
+class Gauge:
+    """Значение снимается в момент запроса /metrics через callback."""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...],
+        callback: GaugeCallback,
+        kind: str = "gauge",
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.callback = callback
+        self.kind = kind
+
+    async def render(self) -> list[str]:
+        values = self.callback()
+        if inspect.isawaitable(values):
+            values = await values
+
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for labels, value in values.items():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Registry:
+    def __init__(self) -> None:
+        self.metrics: list[Union[Counter, Histogram]] = []
+        self.gauges: dict[str, Gauge] = {}
+
+    def counter(self, *args: Any, **kwargs: Any) -> Counter:
+        metric = Counter(*args, **kwargs)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, *args: Any, **kwargs: Any) -> Histogram:
+        metric = Histogram(*args, **kwargs)
+        self.metrics.append(metric)
+        return metric
+
+    def gauge(
+        self,
+        name: str,
+        documentation: str,
+        callback: GaugeCallback,
+        labelnames: tuple[str, ...] = (),
+        kind: str = "gauge",
+    ) -> None:
+        self.gauges[name] = Gauge(name, documentation, labelnames, callback, kind)
+
+    async def render(self) -> str:
+        lines: list[str] = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        for gauge in self.gauges.values():
+            try:
+                lines.extend(await gauge.render())
+            except Exception:
+                logger.exception("Failed to collect %s", gauge.name)
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "lead_stage_seconds",
+    "Duration of lead pipeline stages",
+    ("stage", "engine", "cache", "sink"),
+)
+STAGE_ERRORS = REGISTRY.counter(
+    "lead_stage_errors_total",
+    "Failed lead pipeline stages",
+    ("stage", "engine", "cache", "sink"),
+)
+HANDLER_SECONDS = REGISTRY.histogram(
+    "bot_handler_seconds",
+    "Duration of aiogram handlers",
+    ("handler",),
+)
+HANDLER_ERRORS = REGISTRY.counter(
+    "bot_handler_errors_total",
+    "Handlers that raised",
+    ("handler",),
+)
+JOB_SECONDS = REGISTRY.histogram(
+    "job_seconds",
+    "Duration of queue jobs by kind and outcome (done, retry, failed)",
+    ("kind", "outcome"),
+)
+
+
+# этапы текущего апдейта — собирает app.profiling для медленных апдейтов
+STAGE_TRACE: ContextVar[Optional[list[tuple[str, str, float]]]] = ContextVar("stage_trace", default=None)
+
+
+class stage:
+    """
+    Замер этапа конвейера лида:
+
+        with stage("ocr", engine="tesseract"):
+            text = await ocr_service.extract_text(image)
+    """
+
+    __slots__ = ("labels", "started")
+
+    def __init__(self, name: str, engine: str = "", cache: str = "", sink: str = "") -> None:
+        self.labels = (name, engine, cache, sink)
+        self.started = 0.0
+
+    def __enter__(self) -> "stage":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, traceback: Any) -> None:
+        elapsed = time.perf_counter() - self.started
+        STAGE_SECONDS.observe(elapsed, *self.labels)
+        if exc_type is not None:
+            STAGE_ERRORS.inc(*self.labels)
+
+        trace = STAGE_TRACE.get()
+        if trace is not None:
+            name, engine, cache, sink = self.labels
+            trace.append((name, engine or cache or sink, elapsed))
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Inner-middleware роутера: время и ошибки каждого обработчика по имени."""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        handler_object = data.get("handler")
+        name = getattr(getattr(handler_object, "callback", None), "__name__", "unknown")
+
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            HANDLER_ERRORS.inc(name)
+            raise
+        finally:
+            HANDLER_SECONDS.observe(time.perf_counter() - started, name)
+
+
+# ================= HTTP =================
+
+async def serve_metrics(host: str, port: int, registry: Optional[Registry] = None) -> None:
+    registry = registry or REGISTRY
+
+    async def metrics(request: web.Request) -> web.Response:
+        return web.Response(
+            body=(await registry.render()).encode(),
+            headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+        )
+
+    app = web.Application()
+    app.router.add_get("/metrics", metrics)
+
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info("Metrics on http://%s:%s/metrics", host, port)
+
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
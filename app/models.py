@@ -1,6 +1,6 @@
 import uuid
 import enum
-from datetime import datetime
+from datetime import date, datetime, time
 from typing import Optional
 
 from sqlalchemy import (
@@ -8,13 +8,20 @@ from sqlalchemy import (
     DateTime,
     Float,
     ForeignKey,
+    Integer,
+    LargeBinary,
     String,
     Text,
+    Time,
     func,
     BigInteger,
+    Date,
     Enum,
+    Identity,
+    Index,
+    text,
 )
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import JSONB, UUID
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
 
@@ -73,6 +80,25 @@ class Manager(Base):
         nullable=False,
     )
 
+    # автораспределение (app.routing): доля потока лидов и рабочие часы
+    # в STATS_TIMEZONE; без часов — доступен всегда
+    routing_weight: Mapped[float] = mapped_column(
+        Float,
+        default=1.0,
+        server_default=text("1"),
+        nullable=False,
+    )
+
+    available_from: Mapped[Optional[time]] = mapped_column(
+        Time,
+        nullable=True,
+    )
+
+    available_to: Mapped[Optional[time]] = mapped_column(
+        Time,
+        nullable=True,
+    )
+
     leads: Mapped[list["Lead"]] = relationship(
         back_populates="manager"
     )
@@ -80,8 +106,8 @@ class Manager(Base):
 
 # ================= LEAD =================
 
-class Lead(Base):
-    __tablename__ = "leads"
+class LeadColumns:
+    """Колонки лида — общие для рабочей таблицы leads и архива leads_archive."""
 
     id: Mapped[uuid.UUID] = mapped_column(
         UUID(as_uuid=True),
@@ -89,10 +115,11 @@ class Lead(Base):
         default=uuid.uuid4,
     )
 
+    # created_at входит в ключ: leads и leads_archive секционированы по нему
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
+        primary_key=True,
         server_default=func.now(),
-        nullable=False,
     )
 
     source: Mapped[Optional[str]] = mapped_column(
@@ -173,6 +200,17 @@ class Lead(Base):
         nullable=True,
     )
 
+    # карточка лида в группе менеджера — для правок при массовой смене статуса
+    card_chat_id: Mapped[Optional[int]] = mapped_column(
+        BigInteger,
+        nullable=True,
+    )
+
+    card_message_id: Mapped[Optional[int]] = mapped_column(
+        BigInteger,
+        nullable=True,
+    )
+
     updated_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
         server_default=func.now(),
@@ -180,6 +218,329 @@ class Lead(Base):
         nullable=False,
     )
 
+
+class Lead(LeadColumns, Base):
+    __tablename__ = "leads"
+    __table_args__ = (
+        # 🔎 Поиск /find: триграммные GIN-индексы (подстрока и префикс)
+        Index(
+            "ix_leads_name_trgm",
+            "name",
+            postgresql_using="gin",
+            postgresql_ops={"name": "gin_trgm_ops"},
+        ),
+        Index(
+            "ix_leads_phone_trgm",
+            "phone",
+            postgresql_using="gin",
+            postgresql_ops={"phone": "gin_trgm_ops"},
+        ),
+        Index(
+            "ix_leads_telegram_username_trgm",
+            "telegram_username",
+            postgresql_using="gin",
+            postgresql_ops={"telegram_username": "gin_trgm_ops"},
+        ),
+        Index(
+            "ix_leads_email_trgm",
+            "email",
+            postgresql_using="gin",
+            postgresql_ops={"email": "gin_trgm_ops"},
+        ),
+        # keyset-пагинация по (created_at, id)
+        Index("ix_leads_created_at_id", "created_at", "id"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+
     manager: Mapped[Optional["Manager"]] = relationship(
         back_populates="leads"
-    )
\ No newline at end of file
+    )
+
+
+# ================= LEAD ARCHIVE =================
+
+class ArchivedLead(LeadColumns, Base):
+    """
+    Закрытые старые лиды (rejected/operated), перенесённые из leads
+    фоновым архиватором (app.archive). Секции — по годам.
+    """
+
+    __tablename__ = "leads_archive"
+    __table_args__ = {"postgresql_partition_by": "RANGE (created_at)"}
+
+
+# ================= FUNNEL COUNTERS =================
+
+# lead_stats_counters.manager_id входит в первичный ключ,
+# поэтому лиды без менеджера считаем под нулевым UUID.
+UNASSIGNED_MANAGER_ID = uuid.UUID(int=0)
+
+
+class LeadStatsCounter(Base):
+    """
+    Инкрементальные счётчики воронки для /stats.
+    Обновляются в одной транзакции с лидом, сверяются с leads периодически.
+    """
+
+    __tablename__ = "lead_stats_counters"
+
+    day: Mapped[date] = mapped_column(
+        Date,
+        primary_key=True,
+    )
+
+    manager_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        primary_key=True,
+    )
+
+    manager_status: Mapped[LeadStatus] = mapped_column(
+        Enum(LeadStatus),
+        primary_key=True,
+    )
+
+    lead_type: Mapped[str] = mapped_column(
+        String(20),
+        primary_key=True,
+    )
+
+    leads_count: Mapped[int] = mapped_column(
+        BigInteger,
+        default=0,
+        nullable=False,
+    )
+
+
+
+# ================= STATUS HISTORY =================
+
+class LeadStatusEvent(Base):
+    """
+    Журнал переходов статусов (только вставки).
+    Секционирован по месяцам created_at — секции создаёт app.partitions.
+    lead_id без внешнего ключа: журнал не должен мешать обслуживанию leads.
+    """
+
+    __tablename__ = "lead_status_events"
+    __table_args__ = (
+        Index("ix_lead_status_events_lead_id_created_at", "lead_id", "created_at"),
+        Index("ix_lead_status_events_manager_id_created_at", "manager_id", "created_at"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+
+    id: Mapped[int] = mapped_column(
+        BigInteger,
+        Identity(),
+        primary_key=True,
+    )
+
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        primary_key=True,
+        server_default=func.now(),
+    )
+
+    lead_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        nullable=False,
+    )
+
+    manager_id: Mapped[Optional[uuid.UUID]] = mapped_column(
+        UUID(as_uuid=True),
+        nullable=True,
+    )
+
+    # None — событие создания лида
+    from_status: Mapped[Optional[LeadStatus]] = mapped_column(
+        Enum(LeadStatus),
+        nullable=True,
+    )
+
+    to_status: Mapped[LeadStatus] = mapped_column(
+        Enum(LeadStatus),
+        nullable=False,
+    )
+
+    changed_by: Mapped[Optional[int]] = mapped_column(
+        BigInteger,
+        nullable=True,
+    )
+
+
+# ================= REMINDERS =================
+
+class LeadReminder(Base):
+    """
+    Напоминание менеджеру о лиде в статусе «перезвонить» / «консультация».
+    Ждущие напоминания ищутся по частичным индексам — см. app.reminders.
+    """
+
+    __tablename__ = "lead_reminders"
+    __table_args__ = (
+        # отправленные в индексы не попадают — планировщик читает только ждущие
+        Index(
+            "ix_lead_reminders_pending_due_at",
+            "due_at",
+            postgresql_where=text("sent_at IS NULL"),
+        ),
+        Index(
+            "ix_lead_reminders_pending_lead_id",
+            "lead_id",
+            postgresql_where=text("sent_at IS NULL"),
+        ),
+    )
+
+    id: Mapped[int] = mapped_column(
+        BigInteger,
+        Identity(),
+        primary_key=True,
+    )
+
+    lead_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        nullable=False,
+    )
+
+    # куда напомнить, если у менеджера лида нет группы
+    chat_id: Mapped[int] = mapped_column(
+        BigInteger,
+        nullable=False,
+    )
+
+    # статус, ради которого напоминание: сменился — напоминание не нужно
+    status: Mapped[LeadStatus] = mapped_column(
+        Enum(LeadStatus),
+        nullable=False,
+    )
+
+    due_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        nullable=False,
+    )
+
+    sent_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime(timezone=True),
+        nullable=True,
+    )
+
+    created_by: Mapped[Optional[int]] = mapped_column(
+        BigInteger,
+        nullable=True,
+    )
+
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        nullable=False,
+    )
+
+
+# ================= JOB QUEUE =================
+
+class JobStatus(enum.Enum):
+    pending = "pending"
+    running = "running"
+    done = "done"
+    failed = "failed"
+
+
+class Job(Base):
+    """
+    Фоновая задача (обработка фото и т.п.). Воркеры забирают задачи
+    через SELECT ... FOR UPDATE SKIP LOCKED — см. app.job_queue.
+    """
+
+    __tablename__ = "jobs"
+    __table_args__ = (
+        # воркеры ищут только ожидающие задачи — индекс по ним и маленький
+        Index(
+            "ix_jobs_pending_run_after",
+            "run_after",
+            "id",
+            postgresql_where=text("status = 'pending'"),
+        ),
+    )
+
+    id: Mapped[int] = mapped_column(
+        BigInteger,
+        Identity(),
+        primary_key=True,
+    )
+
+    kind: Mapped[str] = mapped_column(
+        String(50),
+        nullable=False,
+    )
+
+    payload: Mapped[dict] = mapped_column(
+        JSONB,
+        nullable=False,
+    )
+
+    status: Mapped[JobStatus] = mapped_column(
+        Enum(JobStatus),
+        default=JobStatus.pending,
+        nullable=False,
+    )
+
+    attempts: Mapped[int] = mapped_column(
+        Integer,
+        default=0,
+        nullable=False,
+    )
+
+    run_after: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        nullable=False,
+    )
+
+    locked_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime(timezone=True),
+        nullable=True,
+    )
+
+    last_error: Mapped[Optional[str]] = mapped_column(
+        Text,
+        nullable=True,
+    )
+
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        nullable=False,
+    )
+
+
+# ================= FSM STORAGE =================
+
+class FsmRecord(Base):
+    """
+    Состояние и данные aiogram FSM (черновики лидов), общие для всех процессов бота.
+    Ключ — сериализованный StorageKey, data — компактный JSON в bytea.
+    """
+
+    __tablename__ = "fsm_states"
+
+    key: Mapped[str] = mapped_column(
+        String(255),
+        primary_key=True,
+    )
+
+    state: Mapped[Optional[str]] = mapped_column(
+        String(255),
+        nullable=True,
+    )
+
+    data: Mapped[bytes] = mapped_column(
+        LargeBinary,
+        nullable=False,
+    )
+
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now(),
+        nullable=False,
+        index=True,
+    )
@@ -1,32 +1,60 @@
+import asyncio
 import logging
-import pytesseract
-from PIL import Image
-import io
+
+from app.image_ingest import DEFAULT_MAX_PIXELS, ImageData, ImageRejected, decode_for_ocr
 
 
 logger = logging.getLogger(__name__)
 
 
 
+def image_to_text(image_bytes: ImageData, max_pixels: int = DEFAULT_MAX_PIXELS) -> str:
+    """Синхронное распознавание — годится и для пула процессов (bulk import)."""
+
+    # PIL и pytesseract импортируются при первом распознавании, а не при старте бота
+    import pytesseract
+
+    image = decode_for_ocr(image_bytes, max_pixels)
+
+    return pytesseract.image_to_string(
+        image,
+        lang="rus+eng"
+    )
+
+
+def _load_engine() -> str:
+    import pytesseract
+    from PIL import Image  # noqa: F401
+
+    return str(pytesseract.get_tesseract_version())
+
+
 class OCRService:
-    async def extract_text(self, image_bytes: bytes) -> str:
+    def __init__(self, max_pixels: int = DEFAULT_MAX_PIXELS) -> None:
+        self.max_pixels = max_pixels
+
+    async def warm_up(self) -> None:
+        """Импорт PIL/pytesseract и проверка бинарника tesseract — в фоне после старта."""
+
+        version = await asyncio.to_thread(_load_engine)
+        logger.info("OCR engine ready: tesseract %s", version)
+
+    async def extract_text(self, image_bytes: ImageData) -> str:
         try:
             logger.info(
                 "OCRService.extract_text called, image size=%s bytes",
                 len(image_bytes),
             )
 
-            image = Image.open(io.BytesIO(image_bytes))
-
-            text = pytesseract.image_to_string(
-                image,
-                lang="rus+eng"
-            )
+            # tesseract — отдельный процесс, а декодирование отпускает GIL: не держим event loop
+            text = await asyncio.to_thread(image_to_text, image_bytes, self.max_pixels)
 
             logger.info("OCR extracted text length=%s", len(text))
 
             return text
 
+        except ImageRejected:
+            raise
         except Exception as e:
             logger.exception("OCR error: %s", e)
             return ""
\ No newline at end of file
@@ -0,0 +1,231 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Optional
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+from aiogram.types import Message
+
+
+logger = logging.getLogger(__name__)
+
+
+MAX_RETRIES = 5
+DRAIN_TIMEOUT = 30.0
+
+
+class TokenBucket:
+    """
+    Ведро токенов с резервированием: reserve() сразу списывает токен
+    и возвращает, сколько ждать. Кто раньше зарезервировал, тот раньше и отправит.
+    """
+
+    def __init__(self, rate: float, burst: float) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def reserve(self) -> float:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def block(self, seconds: float) -> None:
+        """Telegram попросил подождать: до конца паузы токенов нет."""
+
+        self.reserve()
+        self.tokens = min(self.tokens, -seconds * self.rate)
+
+
+class _Outgoing:
+    __slots__ = ("method", "kwargs", "future", "timeout", "started")
+
+    def __init__(
+        self,
+        method: str,
+        kwargs: dict[str, Any],
+        future: asyncio.Future,
+        timeout: Optional[float] = None,
+    ) -> None:
+        self.method = method
+        self.kwargs = kwargs
+        self.future = future
+        # дедлайн самого HTTP-запроса, без ожидания лимитов
+        self.timeout = timeout
+        self.started = False
+
+
+def _log_failure(future: asyncio.Future) -> None:
+    # при fire-and-forget результат никто не ждёт — ошибка видна только в логе
+    if not future.cancelled() and future.exception() is not None:
+        logger.error("Outbound message failed: %s", future.exception())
+
+
+class OutboundQueue:
+    """
+    Исходящие сообщения в Telegram с лимитами: ведро на каждый чат
+    (1 msg/s в личке, 20 msg/min в группе) и общее ведро на бота.
+
+    Сообщения одного чата уходят по порядку. TelegramRetryAfter
+    выдерживается и запрос повторяется. Несколько правок одного сообщения,
+    ещё не ушедших в Telegram, схлопываются в одну — с последним текстом.
+
+    Методы возвращают Future: await — дождаться Message, без await — fire-and-forget.
+    timeout у send_message ограничивает только запрос к Telegram, не очередь.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        global_rate: float = 25.0,
+        chat_rate: float = 1.0,
+        group_per_minute: float = 20.0,
+    ) -> None:
+        self.bot = bot
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.group_per_minute = group_per_minute
+        self._chat_buckets: dict[int, TokenBucket] = {}
+        self._queues: dict[int, deque[_Outgoing]] = {}
+        self._workers: dict[int, asyncio.Task] = {}
+        self._pending_edits: dict[tuple[int, int], _Outgoing] = {}
+        self.sent = 0
+        self.retries = 0
+        self.coalesced = 0
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if chat_id < 0:
+                bucket = TokenBucket(self.group_per_minute / 60, 3)
+            else:
+                bucket = TokenBucket(self.chat_rate, 1)
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+
+    @property
+    def depth(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    # =========================================================
+    # API
+    # =========================================================
+
+    def _submit(
+        self,
+        chat_id: int,
+        method: str,
+        kwargs: dict[str, Any],
+        timeout: Optional[float] = None,
+    ) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        future.add_done_callback(_log_failure)
+
+        item = _Outgoing(method, {"chat_id": chat_id, **kwargs}, future, timeout)
+        self._queues.setdefault(chat_id, deque()).append(item)
+
+        if chat_id not in self._workers:
+            self._workers[chat_id] = asyncio.create_task(self._run_chat(chat_id))
+        return future
+
+    def send_message(
+        self,
+        chat_id: int,
+        text: str,
+        timeout: Optional[float] = None,
+        **kwargs: Any,
+    ) -> asyncio.Future:
+        return self._submit(chat_id, "send_message", {"text": text, **kwargs}, timeout)
+
+    def edit_message_text(
+        self,
+        chat_id: int,
+        message_id: int,
+        text: str,
+        **kwargs: Any,
+    ) -> asyncio.Future:
+        key = (chat_id, message_id)
+        pending = self._pending_edits.get(key)
+        if pending is not None and not pending.started:
+            pending.kwargs.update(text=text, **kwargs)
+            self.coalesced += 1
+            return pending.future
+
+        future = self._submit(
+            chat_id,
+            "edit_message_text",
+            {"message_id": message_id, "text": text, **kwargs},
+        )
+        self._pending_edits[key] = self._queues[chat_id][-1]
+        return future
+
+    # =========================================================
+    # DELIVERY
+    # =========================================================
+
+    async def _call(self, chat_id: int, item: _Outgoing) -> Optional[Message]:
+        bucket = self._chat_bucket(chat_id)
+
+        for attempt in range(MAX_RETRIES + 1):
+            await asyncio.sleep(bucket.reserve())
+            await asyncio.sleep(self.global_bucket.reserve())
+
+            request = getattr(self.bot, item.method)(**item.kwargs)
+            try:
+                if item.timeout is None:
+                    return await request
+                return await asyncio.wait_for(request, item.timeout)
+            except TelegramRetryAfter as e:
+                if attempt == MAX_RETRIES:
+                    raise
+                self.retries += 1
+                logger.warning("Flood limit in chat %s, retry after %ss", chat_id, e.retry_after)
+                bucket.block(e.retry_after)
+            except TelegramBadRequest as e:
+                if item.method == "edit_message_text" and "not modified" in str(e):
+                    return None
+                raise
+        return None
+
+    async def _run_chat(self, chat_id: int) -> None:
+        queue = self._queues[chat_id]
+        try:
+            while queue:
+                item = queue[0]
+                item.started = True
+                try:
+                    result = await self._call(chat_id, item)
+                except Exception as e:
+                    if not item.future.done():
+                        item.future.set_exception(e)
+                else:
+                    self.sent += 1
+                    if not item.future.done():
+                        item.future.set_result(result)
+                finally:
+                    queue.popleft()
+                    if item.method == "edit_message_text":
+                        key = (chat_id, item.kwargs["message_id"])
+                        if self._pending_edits.get(key) is item:
+                            del self._pending_edits[key]
+        finally:
+            self._workers.pop(chat_id, None)
+            if not queue:
+                self._queues.pop(chat_id, None)
+
+    async def close(self) -> None:
+        """Дожидается отправки того, что уже в очереди."""
+
+        workers = list(self._workers.values())
+        if not workers:
+            return
+        _, pending = await asyncio.wait(workers, timeout=DRAIN_TIMEOUT)
+        for task in pending:
+            task.cancel()
+        if pending:
+            logger.warning("Outbound queue closed with %s undelivered chats", len(pending))
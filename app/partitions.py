@@ -0,0 +1,255 @@
+import asyncio
+import logging
+import re
+from datetime import date
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+
+logger = logging.getLogger(__name__)
+
+
+# Таблицы, секционированные RANGE по created_at: таблица -> шаг секций
+PARTITIONED_TABLES = {
+    "leads": "month",
+    "lead_status_events": "month",
+    "leads_archive": "year",
+}
+
+# Сколько секций создавать наперёд
+PERIODS_AHEAD = {
+    "month": 3,
+    "year": 1,
+}
+
+# Архивные секции: сжатие TOAST (lz4 есть в сборках Postgres 14+ из PGDG)
+PARTITION_COMPRESSION = {
+    "leads_archive": "lz4",
+}
+
+# Скрипты перевода уже существующей несекционированной таблицы
+MIGRATIONS = {
+    "leads": "migrate_partition_leads.py",
+}
+
+# Текстовые колонки, для которых включаем сжатие
+COMPRESSED_COLUMNS = ("name", "comment_from_admin", "email", "source")
+
+_PARTITION_SUFFIX = re.compile(r"_p(\d{4})(\d{2})?$")
+
+_RANGE = "created_at >= :start AND created_at < :end"
+
+
+def _add_months(day: date, months: int) -> date:
+    month_index = day.year * 12 + (day.month - 1) + months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def _period_start(day: date, unit: str) -> date:
+    return day.replace(month=1, day=1) if unit == "year" else day.replace(day=1)
+
+
+def _next_period(start: date, unit: str) -> date:
+    return _add_months(start, 12 if unit == "year" else 1)
+
+
+def partition_name(table: str, start: date, unit: str) -> str:
+    return f"{table}_p{start:%Y}" if unit == "year" else f"{table}_p{start:%Y%m}"
+
+
+async def _relation_exists(connection: AsyncConnection, name: str) -> bool:
+    result = await connection.execute(text("SELECT to_regclass(:name) IS NOT NULL"), {"name": name})
+    return bool(result.scalar_one())
+
+
+async def _create_partition(
+    connection: AsyncConnection,
+    table: str,
+    start: date,
+    unit: str,
+    compression: Optional[str],
+) -> None:
+    name = partition_name(table, start, unit)
+    end = _next_period(start, unit)
+
+    if await _relation_exists(connection, name):
+        return
+
+    # строки периода уже в DEFAULT (обслуживание отстало) — CREATE PARTITION
+    # на них упадёт; отсоединяем DEFAULT, создаём секцию, переносим строки
+    # и присоединяем обратно в той же транзакции
+    default = f"{table}_default"
+    bounds = {"start": start, "end": end}
+    moving = False
+    if await _relation_exists(connection, default):
+        result = await connection.execute(
+            text(f"SELECT EXISTS (SELECT 1 FROM {default} WHERE {_RANGE})"),
+            bounds,
+        )
+        moving = bool(result.scalar_one())
+    if moving:
+        await connection.execute(text(f"ALTER TABLE {table} DETACH PARTITION {default}"))
+
+    # архив пишется один раз и не обновляется — страницы можно заполнять целиком
+    storage = " WITH (fillfactor = 100)" if compression else ""
+    await connection.execute(
+        text(
+            f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table} "
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}'){storage}"
+        )
+    )
+
+    if compression:
+        for column in COMPRESSED_COLUMNS:
+            await connection.execute(
+                text(f"ALTER TABLE {name} ALTER COLUMN {column} SET COMPRESSION {compression}")
+            )
+
+    if moving:
+        result = await connection.execute(
+            text(
+                f"WITH moved AS (DELETE FROM {default} WHERE {_RANGE} RETURNING *) "
+                f"INSERT INTO {name} SELECT * FROM moved"
+            ),
+            bounds,
+        )
+        await connection.execute(text(f"ALTER TABLE {table} ATTACH PARTITION {default} DEFAULT"))
+        logger.warning("Moved %s rows from %s to new partition %s", result.rowcount, default, name)
+
+
+async def _check_partitioned(connection: AsyncConnection, table: str) -> None:
+    # таблица из версии до секционирования: create_all её не трогает,
+    # а CREATE TABLE ... PARTITION OF на ней падает с невнятной ошибкой
+    result = await connection.execute(
+        text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:name)"),
+        {"name": table},
+    )
+    relkind = result.scalar_one_or_none()
+    if relkind is None or relkind == "p":
+        return
+
+    message = f"Table {table} exists but is not partitioned"
+    if table in MIGRATIONS:
+        message += f": run `python {MIGRATIONS[table]}` first"
+    raise RuntimeError(message)
+
+
+async def ensure_partition_for(connection: AsyncConnection, table: str, day: date) -> None:
+    """Секция периода day — для строк, возвращаемых в таблицу задним числом."""
+
+    unit = PARTITIONED_TABLES[table]
+    await _create_partition(connection, table, _period_start(day, unit), unit, PARTITION_COMPRESSION.get(table))
+
+
+async def ensure_partitions(
+    connection: AsyncConnection,
+    table: str,
+    since: Optional[date] = None,
+) -> None:
+    """
+    Создаёт секции от since (по умолчанию — текущий период) и несколько вперёд,
+    плюс DEFAULT-секцию, чтобы вставка не падала, даже если обслуживание отстало.
+    Строки, успевшие лечь в DEFAULT, переносятся в создаваемую секцию; если
+    после этого DEFAULT не пуст — предупреждение в лог.
+    """
+
+    await _check_partitioned(connection, table)
+
+    unit = PARTITIONED_TABLES[table]
+    compression = PARTITION_COMPRESSION.get(table)
+    current = _period_start(date.today(), unit)
+    start = _period_start(since, unit) if since and since < current else current
+
+    last = current
+    for _ in range(PERIODS_AHEAD[unit]):
+        last = _next_period(last, unit)
+
+    while start <= last:
+        await _create_partition(connection, table, start, unit, compression)
+        start = _next_period(start, unit)
+
+    await connection.execute(
+        text(f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT")
+    )
+
+    # строки вне всех секций (даты в прошлом до since) сами не разъедутся
+    result = await connection.execute(text(f"SELECT EXISTS (SELECT 1 FROM {table}_default)"))
+    if result.scalar_one():
+        logger.warning("Default partition %s_default is not empty", table)
+
+
+async def list_partitions(
+    connection: AsyncConnection,
+    table: str,
+) -> list[tuple[str, date]]:
+    result = await connection.execute(
+        text(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE parent.relname = :table"
+        ),
+        {"table": table},
+    )
+
+    partitions = []
+    for (name,) in result.all():
+        match = _PARTITION_SUFFIX.search(name)
+        if match:
+            month = int(match.group(2)) if match.group(2) else 1
+            partitions.append((name, date(int(match.group(1)), month, 1)))
+
+    return sorted(partitions, key=lambda item: item[1])
+
+
+async def detach_partitions_older_than(
+    connection: AsyncConnection,
+    table: str,
+    keep_months: int,
+) -> list[str]:
+    """
+    Отсоединяет секции, целиком лежащие раньше чем keep_months назад.
+    Отсоединённые таблицы остаются в базе — их можно выгрузить и удалить вручную.
+    """
+
+    unit = PARTITIONED_TABLES[table]
+    cutoff = _add_months(date.today().replace(day=1), -keep_months)
+    detached = []
+
+    for name, start in await list_partitions(connection, table):
+        if _next_period(start, unit) > cutoff:
+            continue
+        await connection.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+        detached.append(name)
+
+    return detached
+
+
+async def run_partition_maintenance(
+    engine: AsyncEngine,
+    interval_seconds: int,
+    retention_months: dict[str, int],
+) -> None:
+    """Досоздаёт будущие секции и отсоединяет устаревшие — сразу и затем периодически."""
+
+    while True:
+        try:
+            async with engine.begin() as connection:
+                for table in PARTITIONED_TABLES:
+                    await ensure_partitions(connection, table)
+
+                    keep_months = retention_months.get(table, 0)
+                    if keep_months > 0:
+                        detached = await detach_partitions_older_than(
+                            connection,
+                            table,
+                            keep_months,
+                        )
+                        if detached:
+                            logger.info("Detached partitions of %s: %s", table, detached)
+        except Exception:
+            logger.exception("Partition maintenance failed")
+
+        await asyncio.sleep(interval_seconds)
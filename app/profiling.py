@@ -0,0 +1,259 @@
+import asyncio
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import random
+import time
+from collections.abc import Awaitable, Callable
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+from aiogram.dispatcher.middlewares.base import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+from app.metrics import STAGE_TRACE
+
+
+logger = logging.getLogger(__name__)
+
+
+SUMMARY_LINES = 25
+# поля payload задачи, которые попадают в запись как размеры входа
+JOB_INPUT_KEYS = ("file_size", "width", "height", "text_length")
+
+
+def _update_kind(update: Update) -> str:
+    if update.message is not None:
+        if update.message.photo:
+            return "photo"
+        if update.message.document:
+            return "document"
+        text = update.message.text or ""
+        return text.split(maxsplit=1)[0] if text.startswith("/") else "message"
+    if update.callback_query is not None:
+        return f"callback:{(update.callback_query.data or '').split(':', 1)[0]}"
+    return update.event_type
+
+
+def _input_sizes(update: Update) -> dict[str, Any]:
+    sizes: dict[str, Any] = {}
+    message = update.message
+    if message is not None:
+        if message.photo:
+            photo = message.photo[-1]
+            sizes.update(file_size=photo.file_size, width=photo.width, height=photo.height)
+        if message.document:
+            sizes.update(file_size=message.document.file_size, file_name=message.document.file_name)
+        if message.text:
+            sizes["text_length"] = len(message.text)
+    return sizes
+
+
+def _profile_summary(profile: cProfile.Profile) -> str:
+    stream = io.StringIO()
+    pstats.Stats(profile, stream=stream).sort_stats("cumulative").print_stats(SUMMARY_LINES)
+    return stream.getvalue()
+
+
+class UpdateProfiler(BaseMiddleware):
+    """
+    Профилирование апдейтов (inner-middleware на update) и задач очереди
+    (run_job — через JobQueue.profiler).
+
+    cProfile включается для доли sample_rate апдейтов, а если апдейт
+    идёт дольше slow_threshold — и для остатка его обработки. Всё, что
+    дольше порога, записывается в directory: JSON с этапами из
+    app.metrics.stage и размерами входа плюс .prof для snakeviz/pstats.
+    Хранятся последние keep записей.
+
+    cProfile видит весь поток, а event loop один — в профиль попадают
+    и соседние апдейты, обработанные в то же время.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        sample_rate: float,
+        slow_threshold: float,
+        keep: int = 200,
+    ) -> None:
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.slow_threshold = slow_threshold
+        self.keep = keep
+        # в потоке может работать только один профайлер
+        self._active: Optional[cProfile.Profile] = None
+        os.makedirs(directory, exist_ok=True)
+
+    # =========================================================
+    # PROFILE
+    # =========================================================
+
+    def _start(self) -> Optional[cProfile.Profile]:
+        if self._active is not None:
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # профайлер уже включён кем-то ещё (отладчик, coverage)
+            return None
+        self._active = profile
+        return profile
+
+    def _stop(self, profile: Optional[cProfile.Profile]) -> None:
+        if profile is not None and self._active is profile:
+            profile.disable()
+            self._active = None
+
+    # =========================================================
+    # STORAGE
+    # =========================================================
+
+    def _write(self, record: dict[str, Any], profile: Optional[cProfile.Profile]) -> None:
+        base = os.path.join(self.directory, record["id"])
+
+        if profile is not None:
+            profile.dump_stats(base + ".prof")
+            record["profile_summary"] = _profile_summary(profile)
+
+        with open(base + ".json", "w", encoding="utf-8") as file:
+            json.dump(record, file, ensure_ascii=False, indent=2)
+
+        self._rotate()
+
+    def _rotate(self) -> None:
+        records = sorted(name for name in os.listdir(self.directory) if name.endswith(".json"))
+        for name in records[: max(0, len(records) - self.keep)]:
+            record_id = name[: -len(".json")]
+            for extension in (".json", ".prof"):
+                try:
+                    os.remove(os.path.join(self.directory, record_id + extension))
+                except FileNotFoundError:
+                    pass
+
+    def load(self, record_id: str) -> Optional[dict[str, Any]]:
+        if os.path.basename(record_id) != record_id:
+            return None
+        path = os.path.join(self.directory, record_id + ".json")
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as file:
+            return json.load(file)
+
+    def profile_path(self, record_id: str) -> Optional[str]:
+        path = os.path.join(self.directory, os.path.basename(record_id) + ".prof")
+        return path if os.path.exists(path) else None
+
+    def slowest(self, limit: int = 10) -> list[dict[str, Any]]:
+        records = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            record = self.load(name[: -len(".json")])
+            if record:
+                records.append(record)
+        records.sort(key=lambda record: record["duration_seconds"], reverse=True)
+        return records[:limit]
+
+    # =========================================================
+    # OBSERVE
+    # =========================================================
+
+    async def _observe(
+        self,
+        run: Callable[[], Awaitable[Any]],
+        ref: str,
+        details: Callable[[], dict[str, Any]],
+    ) -> Any:
+        """Выполняет run() с замером этапов; медленное или попавшее в выборку — на диск."""
+
+        trace: list[tuple[str, str, float]] = []
+        token = STAGE_TRACE.set(trace)
+
+        sampled = random.random() < self.sample_rate
+        profile = self._start() if sampled else None
+        late: dict[str, Optional[cProfile.Profile]] = {"profile": None}
+
+        def _start_late() -> None:
+            # уже медленно — профилируем хотя бы хвост
+            late["profile"] = self._start()
+
+        timer = None
+        if profile is None and self.slow_threshold > 0:
+            timer = asyncio.get_running_loop().call_later(self.slow_threshold, _start_late)
+
+        started = time.perf_counter()
+        error: Optional[str] = None
+        try:
+            return await run()
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            duration = time.perf_counter() - started
+            if timer is not None:
+                timer.cancel()
+            captured = profile or late["profile"]
+            self._stop(captured)
+            STAGE_TRACE.reset(token)
+
+            slow = self.slow_threshold > 0 and duration >= self.slow_threshold
+            if slow or profile is not None:
+                now = datetime.now(timezone.utc)
+                record = {
+                    "id": f"{now:%Y%m%d%H%M%S%f}_{ref}",
+                    **details(),
+                    "at": now.isoformat(),
+                    "duration_seconds": round(duration, 4),
+                    "stages": [
+                        {"stage": name, "label": label, "seconds": round(seconds, 4)}
+                        for name, label, seconds in trace
+                    ],
+                    "profile": "sampled" if profile else ("tail" if late["profile"] else None),
+                    "error": error,
+                }
+                try:
+                    self._write(record, captured)
+                except Exception:
+                    logger.exception("Failed to save profile of %s", ref)
+
+    async def run_job(self, job: Any, handler: Callable[[Any], Awaitable[None]]) -> None:
+        """Задача очереди (app.job_queue) — те же выборка и порог, что у апдейтов."""
+
+        def details() -> dict[str, Any]:
+            return {
+                "job_id": str(job.id),
+                "kind": f"job:{job.kind}",
+                "attempt": job.attempts,
+                "input": {key: value for key, value in job.payload.items() if key in JOB_INPUT_KEYS},
+            }
+
+        await self._observe(lambda: handler(job), f"job{job.id}", details)
+
+    # =========================================================
+    # MIDDLEWARE
+    # =========================================================
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        if not isinstance(event, Update):
+            return await handler(event, data)
+
+        def details() -> dict[str, Any]:
+            user = data.get("event_from_user")
+            return {
+                "update_id": event.update_id,
+                "kind": _update_kind(event),
+                "user_id": user.id if user else None,
+                "input": _input_sizes(event),
+            }
+
+        return await self._observe(lambda: handler(event, data), str(event.update_id), details)
@@ -0,0 +1,229 @@
+import asyncio
+import heapq
+import logging
+import uuid
+from datetime import datetime, time, timedelta, timezone
+from typing import Callable, Optional
+from zoneinfo import ZoneInfo
+
+from aiogram.types import ReplyParameters
+from sqlalchemy import any_, bindparam, delete, func, insert, select, update
+from sqlalchemy.dialects.postgresql import ARRAY, UUID
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Lead, LeadReminder, LeadStatus, Manager
+from app.outbound import OutboundQueue
+
+
+logger = logging.getLogger(__name__)
+
+
+# статусы, для которых после клика спрашиваем время напоминания
+REMINDER_STATUSES = (LeadStatus.callback_later, LeadStatus.consult_scheduled)
+
+REMINDER_TITLES = {
+    LeadStatus.callback_later: "перезвонить",
+    LeadStatus.consult_scheduled: "консультация",
+}
+
+# пресет: (подпись кнопки, через сколько; для дней — в MORNING по часовому поясу)
+REMINDER_PRESETS: dict[str, tuple[str, timedelta]] = {
+    "1h": ("Через час", timedelta(hours=1)),
+    "3h": ("Через 3 часа", timedelta(hours=3)),
+    "1d": ("Завтра утром", timedelta(days=1)),
+    "3d": ("Через 3 дня", timedelta(days=3)),
+    "7d": ("Через неделю", timedelta(days=7)),
+}
+MORNING = time(10, 0)
+
+# ключи pg_try_advisory_xact_lock: старшие 32 бита — «пространство» напоминаний
+LOCK_NAMESPACE = 0x52454D49 << 32
+# сколько ближайших напоминаний держим в куче за одно чтение
+WINDOW_LIMIT = 1000
+
+
+def preset_due(preset: str, tz: ZoneInfo, now: Optional[datetime] = None) -> datetime:
+    _, delta = REMINDER_PRESETS[preset]
+    now = (now or datetime.now(tz)).astimezone(tz)
+    if delta < timedelta(days=1):
+        return now + delta
+    return datetime.combine((now + delta).date(), MORNING, tzinfo=tz)
+
+
+class ReminderScheduler:
+    """
+    Напоминания о лидах в группу менеджера.
+
+    Вместо опроса всей таблицы процесс раз в window читает по частичному
+    индексу напоминания, которые наступят до следующего чтения, и держит
+    их в min-куче по due_at: спит ровно до ближайшего. Самый ранний пресет —
+    через час, и окно не длиннее, поэтому новое напоминание всегда
+    успевает попасть в одно из следующих окон.
+
+    Кучу держит каждый процесс бота; напоминание отправляет тот, кто взял
+    pg_try_advisory_xact_lock по его id и увидел sent_at IS NULL. sent_at
+    коммитится до отправки: транзакция и блокировка не ждут очередь
+    исходящих, а сбой отправки даёт пропуск, а не дубль.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession],
+        outbound: OutboundQueue,
+        timezone_name: str,
+        window_seconds: float = 300.0,
+        send_timeout: float = 10.0,
+    ) -> None:
+        self.session_factory = session_factory
+        self.outbound = outbound
+        self.timezone = ZoneInfo(timezone_name)
+        # окно не длиннее самого раннего пресета — иначе новое напоминание опоздает
+        self.window = min(timedelta(seconds=window_seconds), min(delta for _, delta in REMINDER_PRESETS.values()))
+        self.send_timeout = send_timeout
+        self.sent = 0
+        self._heap: list[tuple[datetime, int]] = []
+
+    # =========================================================
+    # WRITE (в транзакции вызывающего)
+    # =========================================================
+
+    async def add(
+        self,
+        session: AsyncSession,
+        lead_id: uuid.UUID,
+        chat_id: int,
+        status: LeadStatus,
+        due_at: datetime,
+        created_by: Optional[int] = None,
+    ) -> int:
+        """В транзакции вызывающего; в кучу попадёт при следующем чтении окна."""
+
+        result = await session.execute(
+            insert(LeadReminder)
+            .values(lead_id=lead_id, chat_id=chat_id, status=status, due_at=due_at, created_by=created_by)
+            .returning(LeadReminder.id)
+        )
+        return result.scalar_one()
+
+    async def cancel(self, session: AsyncSession, lead_ids: list[uuid.UUID]) -> None:
+        """Лид ушёл из статуса напоминания — ждущие напоминания больше не нужны."""
+
+        ids = bindparam("lead_ids", lead_ids, type_=ARRAY(UUID(as_uuid=True)))
+        await session.execute(
+            delete(LeadReminder).where(LeadReminder.lead_id == any_(ids), LeadReminder.sent_at.is_(None))
+        )
+
+    # =========================================================
+    # WINDOW
+    # =========================================================
+
+    async def _load_window(self) -> datetime:
+        """Читает окно в кучу; возвращает, когда читать следующее."""
+
+        horizon = datetime.now(timezone.utc) + self.window
+
+        async with self.session_factory() as session:
+            result = await session.execute(
+                select(LeadReminder.due_at, LeadReminder.id)
+                .where(LeadReminder.sent_at.is_(None), LeadReminder.due_at <= horizon)
+                .order_by(LeadReminder.due_at)
+                .limit(WINDOW_LIMIT)
+            )
+            rows = [tuple(row) for row in result.all()]
+
+        self._heap = rows
+        heapq.heapify(self._heap)
+
+        if len(rows) == WINDOW_LIMIT:
+            # окно не влезло — дочитаем, когда дойдём до последнего прочитанного
+            return rows[-1][0]
+        return horizon
+
+    # =========================================================
+    # FIRE
+    # =========================================================
+
+    @staticmethod
+    def _text(reminder: LeadReminder, lead: Lead) -> str:
+        contact = lead.phone or lead.telegram_username or lead.whatsapp or lead.messenger_max or lead.email or "-"
+        return (
+            f"⏰ Напоминание: {REMINDER_TITLES.get(reminder.status, reminder.status.value)}\n\n"
+            f"Имя: {lead.name}\n"
+            f"Контакт: {contact}"
+        )
+
+    async def _fire(self, reminder_id: int) -> None:
+        async with self.session_factory() as session:
+            result = await session.execute(select(func.pg_try_advisory_xact_lock(LOCK_NAMESPACE + reminder_id)))
+            if not result.scalar_one():
+                # отправляет другой процесс
+                return
+
+            result = await session.execute(
+                select(LeadReminder, Lead, Manager.manager_group_chat_id)
+                .outerjoin(Lead, Lead.id == LeadReminder.lead_id)
+                .outerjoin(Manager, Manager.id == Lead.manager_id)
+                .where(LeadReminder.id == reminder_id, LeadReminder.sent_at.is_(None))
+            )
+            row = result.first()
+            if row is None:
+                # уже отправлено или отменено
+                return
+            reminder, lead, group_chat_id = row
+
+            await session.execute(
+                update(LeadReminder).where(LeadReminder.id == reminder_id).values(sent_at=func.now())
+            )
+            await session.commit()
+
+        # лид уехал в архив или сменил статус — напоминание просто гасим
+        if lead is None or lead.manager_status != reminder.status:
+            return
+
+        chat_id = group_chat_id or reminder.chat_id
+        reply = None
+        if lead.card_message_id and lead.card_chat_id == chat_id:
+            reply = ReplyParameters(message_id=lead.card_message_id, allow_sending_without_reply=True)
+
+        # ответом на карточку; shield — по дедлайну сообщение остаётся в очереди
+        try:
+            await asyncio.wait_for(
+                asyncio.shield(
+                    self.outbound.send_message(
+                        chat_id=chat_id,
+                        text=self._text(reminder, lead),
+                        reply_parameters=reply,
+                    )
+                ),
+                self.send_timeout,
+            )
+        except asyncio.TimeoutError:
+            logger.warning("Reminder %s is still queued after %ss", reminder_id, self.send_timeout)
+        self.sent += 1
+
+    # =========================================================
+    # LOOP
+    # =========================================================
+
+    async def run(self) -> None:
+        next_load = datetime.min.replace(tzinfo=timezone.utc)
+
+        while True:
+            now = datetime.now(timezone.utc)
+
+            if now >= next_load:
+                try:
+                    next_load = await self._load_window()
+                except Exception:
+                    logger.exception("Failed to load reminders")
+                    next_load = now + self.window
+
+            while self._heap and self._heap[0][0] <= now:
+                _, reminder_id = heapq.heappop(self._heap)
+                try:
+                    await self._fire(reminder_id)
+                except Exception:
+                    logger.exception("Failed to send reminder %s", reminder_id)
+
+            wake_at = min(self._heap[0][0], next_load) if self._heap else next_load
+            await asyncio.sleep(max(0.0, (wake_at - datetime.now(timezone.utc)).total_seconds()))
@@ -0,0 +1,167 @@
+import asyncio
+import logging
+import time
+from collections.abc import Awaitable, Callable
+from functools import partial
+from typing import Optional, TypeVar
+
+
+logger = logging.getLogger(__name__)
+
+
+T = TypeVar("T")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, name: str, retry_after: float) -> None:
+        super().__init__(f"circuit {name} is open, retry after {retry_after:.0f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Размыкатель для одного внешнего адресата (таблица, чат).
+
+    После failure_threshold ошибок подряд — OPEN: вызовы сразу падают
+    с CircuitOpenError, не дожидаясь таймаута. Через reset_timeout —
+    HALF_OPEN: пропускается один пробный вызов, по его итогу цепь
+    замыкается или снова размыкается.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float) -> None:
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.trips = 0
+        self.opened_at = 0.0
+        self.last_error: Optional[str] = None
+        self._probing = False
+
+    @property
+    def retry_after(self) -> float:
+        if self.state == CLOSED:
+            return 0.0
+        return max(0.0, self.opened_at + self.reset_timeout - time.monotonic())
+
+    def acquire(self) -> None:
+        if self.state == OPEN:
+            if self.retry_after > 0:
+                raise CircuitOpenError(self.name, self.retry_after)
+            self.state = HALF_OPEN
+
+        if self.state == HALF_OPEN:
+            if self._probing:
+                # пробный вызов уже идёт — остальные ждут его итога
+                raise CircuitOpenError(self.name, self.reset_timeout)
+            self._probing = True
+
+    def release(self) -> None:
+        """Пробный вызов отменён без результата."""
+
+        self._probing = False
+
+    def record_success(self) -> None:
+        if self.state != CLOSED:
+            logger.info("Circuit %s closed", self.name)
+        self.state = CLOSED
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self, error: BaseException) -> None:
+        self.failures += 1
+        self.last_error = f"{type(error).__name__}: {error}"
+        self._probing = False
+
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+            self.trips += 1
+            logger.warning(
+                "Circuit %s opened for %ss after %s failures: %s",
+                self.name,
+                self.reset_timeout,
+                self.failures,
+                self.last_error,
+            )
+
+
+def _record_outcome(breaker: CircuitBreaker, future: asyncio.Future) -> None:
+    if future.cancelled():
+        breaker.release()
+    elif future.exception() is not None:
+        breaker.record_failure(future.exception())
+    else:
+        breaker.record_success()
+
+
+class Breakers:
+    """Размыкатели по имени адресата: "sheets:<spreadsheet id>", "telegram:<chat id>"."""
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 60.0) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.breakers: dict[str, CircuitBreaker] = {}
+
+    def get(self, name: str) -> CircuitBreaker:
+        breaker = self.breakers.get(name)
+        if breaker is None:
+            breaker = self.breakers[name] = CircuitBreaker(
+                name,
+                self.failure_threshold,
+                self.reset_timeout,
+            )
+        return breaker
+
+    async def call(self, name: str, factory: Callable[[], Awaitable[T]], timeout: float) -> T:
+        """
+        Вызов с дедлайном через размыкатель name. factory вызывается,
+        только если цепь пропускает вызов.
+        """
+
+        breaker = self.get(name)
+        breaker.acquire()
+
+        try:
+            result = await asyncio.wait_for(factory(), timeout=timeout)
+        except asyncio.CancelledError:
+            breaker.release()
+            raise
+        except Exception as e:
+            breaker.record_failure(e)
+            raise
+
+        breaker.record_success()
+        return result
+
+    def watch(self, name: str, submit: Callable[[], asyncio.Future]) -> asyncio.Future:
+        """
+        Для вызовов, которые сами стоят в очереди (OutboundQueue): дедлайн
+        задаёт очередь на сам запрос, а размыкатель узнаёт исход из future —
+        ожидание лимитов отказом не считается, сколько бы ни длилось.
+        """
+
+        breaker = self.get(name)
+        breaker.acquire()
+
+        try:
+            future = submit()
+        except Exception as e:
+            breaker.record_failure(e)
+            raise
+
+        future.add_done_callback(partial(_record_outcome, breaker))
+        return future
+
+    def snapshot(self) -> list[CircuitBreaker]:
+        # сначала разомкнутые, потом по числу срабатываний
+        return sorted(
+            self.breakers.values(),
+            key=lambda breaker: (breaker.state == CLOSED, -breaker.trips, breaker.name),
+        )
@@ -0,0 +1,188 @@
+import asyncio
+import logging
+import uuid
+from collections import defaultdict
+from collections.abc import Mapping
+from dataclasses import dataclass
+from datetime import datetime, time
+from typing import Any, Callable, Optional
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.archive import CLOSED_STATUSES
+from app.models import Lead, LeadStatus, Manager
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class ManagerSlot:
+    id: uuid.UUID
+    name: str
+    weight: float
+    available_from: Optional[time]
+    available_to: Optional[time]
+
+    def available(self, moment: time) -> bool:
+        if self.available_from is None or self.available_to is None:
+            return True
+        if self.available_from <= self.available_to:
+            return self.available_from <= moment < self.available_to
+        # ночная смена: 22:00–06:00
+        return moment >= self.available_from or moment < self.available_to
+
+
+def is_open(status: LeadStatus) -> bool:
+    return status not in CLOSED_STATUSES
+
+
+class ManagerRouter:
+    """
+    Автораспределение горячих лидов: менеджер с наименьшей нагрузкой
+    (открытые лиды / routing_weight) среди активных и доступных сейчас.
+
+    Нагрузка — счётчики в памяти: pick() сразу резервирует лид за
+    менеджером, смены статуса двигают счётчики. Раз в interval счётчики
+    и список менеджеров сверяются с Postgres — это исправляет и расхождения
+    между процессами (у каждого процесса свои счётчики). Резервы ещё не
+    сохранённых черновиков в Postgres не видны, поэтому считаются отдельно
+    в reserved и прибавляются к нагрузке при сверке.
+    """
+
+    def __init__(self, timezone: str) -> None:
+        self.timezone = ZoneInfo(timezone)
+        self.load: dict[uuid.UUID, int] = defaultdict(int)
+        # автоназначенные черновики, которых ещё нет в leads
+        self.reserved: dict[uuid.UUID, int] = defaultdict(int)
+        self.managers: list[ManagerSlot] = []
+
+    # =========================================================
+    # COUNTERS
+    # =========================================================
+
+    def assign(self, manager_id: Optional[uuid.UUID]) -> None:
+        if manager_id is not None:
+            self.load[manager_id] += 1
+
+    def release(self, manager_id: Optional[uuid.UUID]) -> None:
+        if manager_id is not None and self.load[manager_id] > 0:
+            self.load[manager_id] -= 1
+
+    def release_draft(self, data: Mapping[str, Any]) -> None:
+        """Черновик лида брошен (отмена, новое фото, TTL) — снимаем резерв автоназначения."""
+
+        manager_id = self._unreserve(data)
+        if manager_id is not None:
+            self.release(manager_id)
+
+    def confirm_draft(self, data: Mapping[str, Any]) -> None:
+        """Автоназначенный черновик сохранён — резерв становится открытым лидом."""
+
+        auto_manager_id = data.get("auto_manager_id")
+        if auto_manager_id and self._unreserve(data) is None:
+            # резерв сделан до перезапуска — в нагрузке этого лида ещё нет
+            self.assign(uuid.UUID(auto_manager_id))
+
+    def _unreserve(self, data: Mapping[str, Any]) -> Optional[uuid.UUID]:
+        auto_manager_id = data.get("auto_manager_id")
+        if not auto_manager_id:
+            return None
+        manager_id = uuid.UUID(auto_manager_id)
+        if self.reserved[manager_id] <= 0:
+            return None
+        self.reserved[manager_id] -= 1
+        return manager_id
+
+    def on_status_change(
+        self,
+        manager_id: Optional[uuid.UUID],
+        old_status: LeadStatus,
+        new_status: LeadStatus,
+    ) -> None:
+        if is_open(old_status) and not is_open(new_status):
+            self.release(manager_id)
+        elif not is_open(old_status) and is_open(new_status):
+            self.assign(manager_id)
+
+    # =========================================================
+    # ROUTING
+    # =========================================================
+
+    def candidates(self, now: Optional[datetime] = None) -> list[ManagerSlot]:
+        moment = (now or datetime.now(self.timezone)).astimezone(self.timezone).time()
+        return [
+            manager for manager in self.managers
+            if manager.weight > 0 and manager.available(moment)
+        ]
+
+    def pick(self, now: Optional[datetime] = None) -> Optional[ManagerSlot]:
+        """Выбирает менеджера и резервирует за ним лид. None — никого нет на смене."""
+
+        candidates = self.candidates(now)
+        if not candidates:
+            return None
+
+        # (нагрузка + 1) / вес: при равной нагрузке лид уходит тому, у кого вес больше
+        manager = min(
+            candidates,
+            key=lambda slot: ((self.load[slot.id] + 1) / slot.weight, slot.name),
+        )
+        self.assign(manager.id)
+        self.reserved[manager.id] += 1
+        return manager
+
+    # =========================================================
+    # RECONCILIATION
+    # =========================================================
+
+    async def reconcile(self, session: AsyncSession) -> int:
+        """Перечитывает менеджеров и открытые лиды. Возвращает суммарное расхождение."""
+
+        result = await session.execute(select(Manager).where(Manager.active.is_(True)))
+        self.managers = [
+            ManagerSlot(
+                id=manager.id,
+                name=manager.name,
+                weight=manager.routing_weight,
+                available_from=manager.available_from,
+                available_to=manager.available_to,
+            )
+            for manager in result.scalars().all()
+        ]
+
+        # закрытые лиды уезжают в архив, открытые — всегда в leads
+        result = await session.execute(
+            select(Lead.manager_id, func.count())
+            .where(Lead.manager_id.is_not(None), Lead.manager_status.not_in(CLOSED_STATUSES))
+            .group_by(Lead.manager_id)
+        )
+        actual: dict[uuid.UUID, int] = defaultdict(int)
+        for manager_id, count in result.all():
+            actual[manager_id] = count
+        for manager_id, count in self.reserved.items():
+            actual[manager_id] += count
+
+        drift = sum(
+            abs(actual.get(manager_id, 0) - self.load.get(manager_id, 0))
+            for manager_id in set(actual) | set(self.load)
+        )
+        self.load = actual
+        return drift
+
+    async def run_reconciliation(
+        self,
+        session_factory: Callable[[], AsyncSession],
+        interval_seconds: int,
+    ) -> None:
+        while True:
+            try:
+                async with session_factory() as session:
+                    drift = await self.reconcile(session)
+                if drift:
+                    logger.info("Manager load reconciled, drift %s", drift)
+            except Exception:
+                logger.exception("Manager load reconciliation failed")
+            await asyncio.sleep(interval_seconds)
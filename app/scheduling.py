@@ -0,0 +1,147 @@
+import asyncio
+import logging
+from collections.abc import Awaitable, Callable
+from typing import Any, Optional
+
+from aiogram.dispatcher.middlewares.base import BaseMiddleware
+from aiogram.types import Message, TelegramObject, Update, User
+
+
+logger = logging.getLogger(__name__)
+
+
+HEAVY = "heavy"
+NORMAL = "normal"
+PRIORITY = "priority"
+
+# команды, которые сами по себе тяжёлые: читают большие файлы или всю таблицу лидов
+HEAVY_COMMANDS = {"import", "export"}
+
+
+def _command(message: Message) -> Optional[str]:
+    text = message.text or message.caption or ""
+    if not text.startswith("/"):
+        return None
+    return text[1:].split(maxsplit=1)[0].split("@", 1)[0].lower()
+
+
+def classify(update: Update) -> str:
+    """
+    heavy — фото и импорт/экспорт: OCR, большие файлы;
+    priority — команды и кнопки статусов: должны отвечать сразу;
+    normal — остальное (шаги мастера лида).
+    """
+
+    if update.callback_query is not None:
+        data = update.callback_query.data or ""
+        return PRIORITY if data.startswith("status:") else NORMAL
+
+    message = update.message
+    if message is None:
+        return NORMAL
+
+    command = _command(message)
+    if message.photo or command in HEAVY_COMMANDS:
+        return HEAVY
+    if command is not None:
+        return PRIORITY
+    return NORMAL
+
+
+class _UserLane:
+    """FIFO-очередь одного пользователя: asyncio.Lock будит ожидающих по порядку."""
+
+    __slots__ = ("lock", "users")
+
+    def __init__(self) -> None:
+        self.lock = asyncio.Lock()
+        self.users = 0
+
+
+class AdmissionMiddleware(BaseMiddleware):
+    """
+    Допуск апдейтов к обработчикам (outer-middleware на update).
+
+    Тяжёлые апдейты делят глобальный бюджет heavy_limit; ждать может
+    не больше queue_limit, остальным бот отвечает «занят». Апдейты одного
+    пользователя (кроме priority) выполняются строго по очереди, поэтому
+    пока ждёт его фото, следующий шаг мастера не обгонит его. Priority
+    идут в обход очередей — клики по статусам не ждут OCR.
+
+    Стоит до DatabaseSessionMiddleware: ожидающий апдейт не держит сессию.
+    Здесь ограничивается только приём; сам OCR фото идёт задачей очереди,
+    и его ограничивает limit при JobQueue.register.
+    """
+
+    def __init__(self, heavy_limit: int, queue_limit: int) -> None:
+        self.heavy_limit = heavy_limit
+        self.queue_limit = queue_limit
+        self._heavy = asyncio.Semaphore(heavy_limit)
+        self._heavy_running = 0
+        self._heavy_waiting = 0
+        self._lanes: dict[int, _UserLane] = {}
+
+    @property
+    def heavy_running(self) -> int:
+        return self._heavy_running
+
+    @property
+    def heavy_waiting(self) -> int:
+        return self._heavy_waiting
+
+    async def _run_heavy(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: dict[str, Any],
+    ) -> Any:
+        if self._heavy.locked():
+            if self._heavy_waiting >= self.queue_limit:
+                await event.message.answer("⏳ Бот сейчас перегружен. Пришлите это ещё раз через пару минут.")
+                return None
+
+            self._heavy_waiting += 1
+            position = self._heavy_waiting
+            try:
+                await event.message.answer(f"⏳ Много заявок в обработке, вы в очереди #{position}.")
+                await self._heavy.acquire()
+            finally:
+                self._heavy_waiting -= 1
+        else:
+            await self._heavy.acquire()
+
+        self._heavy_running += 1
+        try:
+            return await handler(event, data)
+        finally:
+            self._heavy_running -= 1
+            self._heavy.release()
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        if not isinstance(event, Update):
+            return await handler(event, data)
+
+        lane_name = classify(event)
+        if lane_name == PRIORITY:
+            return await handler(event, data)
+
+        user: Optional[User] = data.get("event_from_user")
+        if user is None:
+            return await handler(event, data)
+
+        lane = self._lanes.setdefault(user.id, _UserLane())
+        lane.users += 1
+        try:
+            async with lane.lock:
+                if lane_name == HEAVY:
+                    return await self._run_heavy(handler, event, data)
+                return await handler(event, data)
+        finally:
+            lane.users -= 1
+            if not lane.users:
+                self._lanes.pop(user.id, None)
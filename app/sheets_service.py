@@ -1,44 +1,82 @@
+import asyncio
 import logging
+import threading
 from typing import Any
 
-import gspread
-from google.oauth2.service_account import Credentials
-
 import json
 
 logger = logging.getLogger(__name__)
 
 
 class SheetsService:
-    def __init__(self, service_account_json: str, master_sheet_id: str) -> None:
+    """
+    Клиент Google Sheets. В конструкторе нет ни импорта gspread, ни сети:
+    авторизация и открытие master-таблицы — при первом обращении
+    или в warm_up() в фоне после старта бота.
+
+    gspread синхронный: запросы идут в потоках (asyncio.to_thread),
+    а timeout ограничивает каждый HTTP-запрос, чтобы поток не висел вечно.
+    """
+
+    def __init__(self, service_account_json: str, master_sheet_id: str, timeout: float = 15.0) -> None:
         self.master_sheet_id = master_sheet_id
+        self.service_account_json = service_account_json
+        self.timeout = timeout
 
-        scopes = [
-            "https://www.googleapis.com/auth/spreadsheets",
-            "https://www.googleapis.com/auth/drive",
-        ]
+        self._client = None
+        self._master_spreadsheet = None
+        self._connect_lock = threading.Lock()
 
-        credentials = Credentials.from_service_account_info(
-            json.loads(service_account_json),
-            scopes=scopes,
-        )
+    def _connect(self) -> None:
+        with self._connect_lock:
+            if self._master_spreadsheet is not None:
+                return
 
-        self.client = gspread.authorize(credentials)
-        self.master_spreadsheet = self.client.open_by_key(master_sheet_id)
+            import gspread
+            from google.oauth2.service_account import Credentials
 
-    # =========================================================
-    # MASTER TABLE
-    # =========================================================
+            scopes = [
+                "https://www.googleapis.com/auth/spreadsheets",
+                "https://www.googleapis.com/auth/drive",
+            ]
 
-    async def append_to_master(self, lead_data: dict[str, Any]) -> None:
-        logger.info(
-            "SheetsService.append_to_master called for lead_id=%s",
-            lead_data.get("id"),
-        )
+            credentials = Credentials.from_service_account_info(
+                json.loads(self.service_account_json),
+                scopes=scopes,
+            )
+
+            client = gspread.authorize(credentials)
+            client.set_timeout(self.timeout)
+            self._master_spreadsheet = client.open_by_key(self.master_sheet_id)
+            self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._connect()
+        return self._client
 
-        worksheet = self.master_spreadsheet.worksheet("leads")
+    @property
+    def master_spreadsheet(self):
+        if self._master_spreadsheet is None:
+            self._connect()
+        return self._master_spreadsheet
 
-        row = [
+    @property
+    def ready(self) -> bool:
+        return self._master_spreadsheet is not None
+
+    async def warm_up(self) -> None:
+        await asyncio.to_thread(self._connect)
+        logger.info("Google Sheets ready: master sheet %s", self.master_sheet_id)
+
+    # =========================================================
+    # ROWS
+    # =========================================================
+
+    @staticmethod
+    def _master_row(lead_data: dict[str, Any]) -> list[Any]:
+        return [
             lead_data.get("id"),
             lead_data.get("created_at"),
             lead_data.get("name"),
@@ -57,28 +95,9 @@ class SheetsService:
             lead_data.get("tg_link"),
         ]
 
-        worksheet.append_row(row, value_input_option="USER_ENTERED")
-
-    # =========================================================
-    # MANAGER TABLE
-    # =========================================================
-
-    async def append_to_manager_sheet(
-        self,
-        manager_sheet_id: str,
-        lead_data: dict[str, Any],
-    ) -> None:
-
-        logger.info(
-            "SheetsService.append_to_manager_sheet called for lead_id=%s manager_sheet_id=%s",
-            lead_data.get("id"),
-            manager_sheet_id,
-        )
-
-        spreadsheet = self.client.open_by_key(manager_sheet_id)
-        worksheet = spreadsheet.worksheet("leads")
-
-        row = [
+    @staticmethod
+    def _manager_row(lead_data: dict[str, Any]) -> list[Any]:
+        return [
             lead_data.get("id"),
             lead_data.get("created_at"),
             lead_data.get("name"),
@@ -96,30 +115,35 @@ class SheetsService:
             lead_data.get("tg_link"),
         ]
 
-        worksheet.append_row(row, value_input_option="USER_ENTERED")
-
     # =========================================================
-    # UPDATE STATUS (UNIVERSAL)
+    # BLOCKING CALLS (в потоке)
     # =========================================================
 
-    async def update_status_in_sheet(
-        self,
-        sheet_id: str,
-        lead_id: str,
-        new_status: str,
-    ) -> None:
-        """
-        Обновляет статус лида в таблице.
-        Работает и для master, и для таблиц менеджеров.
-        Не зависит от номера колонки — ищет по заголовку.
-        """
+    def _worksheet(self, sheet_id: str):
+        if sheet_id == self.master_sheet_id:
+            return self.master_spreadsheet.worksheet("leads")
+        return self.client.open_by_key(sheet_id).worksheet("leads")
+
+    def _append_rows(self, sheet_id: str, rows: list[list[Any]], skip_existing: bool) -> None:
+        worksheet = self._worksheet(sheet_id)
+
+        if skip_existing:
+            # повторная доставка после таймаута: строка могла записаться
+            existing = set(worksheet.col_values(1))
+            rows = [row for row in rows if row[0] not in existing]
+            if not rows:
+                return
 
-        spreadsheet = self.client.open_by_key(sheet_id)
-        worksheet = spreadsheet.worksheet("leads")
+        worksheet.append_rows(rows, value_input_option="USER_ENTERED")
+
+    def _update_status(self, sheet_id: str, lead_id: str, new_status: str) -> None:
+        worksheet = self._worksheet(sheet_id)
 
         try:
             cell = worksheet.find(lead_id)
         except Exception:
+            cell = None
+        if cell is None:
             logger.warning("Lead id %s not found in sheet %s", lead_id, sheet_id)
             return
 
@@ -140,4 +164,144 @@ class SheetsService:
             lead_id,
             sheet_id,
             new_status,
-        )
\ No newline at end of file
+        )
+
+    def _update_column(self, sheet_id: str, column: str, values: dict[str, str]) -> None:
+        worksheet = self._worksheet(sheet_id)
+
+        # колонка id и заголовки — одним запросом, все ячейки — одним batchUpdate
+        ids, headers = worksheet.batch_get(["A:A", "1:1"])
+        header_row = headers[0] if headers else []
+        if column not in header_row:
+            logger.warning("%s column not found in sheet %s", column, sheet_id)
+            return
+
+        from gspread.utils import rowcol_to_a1
+
+        col_index = header_row.index(column) + 1
+        updates = [
+            {"range": rowcol_to_a1(row_number, col_index), "values": [[values[row[0]]]]}
+            for row_number, row in enumerate(ids, start=1)
+            if row and row[0] in values
+        ]
+
+        missing = len(values) - len(updates)
+        if missing > 0:
+            logger.warning("%s of %s leads not found in sheet %s", missing, len(values), sheet_id)
+        if updates:
+            worksheet.batch_update(updates, value_input_option="USER_ENTERED")
+
+        logger.info("Updated %s %s cells in sheet=%s", len(updates), column, sheet_id)
+
+    # =========================================================
+    # MASTER TABLE
+    # =========================================================
+
+    async def append_to_master(self, lead_data: dict[str, Any], skip_existing: bool = False) -> None:
+        logger.info(
+            "SheetsService.append_to_master called for lead_id=%s",
+            lead_data.get("id"),
+        )
+
+        await asyncio.to_thread(
+            self._append_rows,
+            self.master_sheet_id,
+            [self._master_row(lead_data)],
+            skip_existing,
+        )
+
+    # =========================================================
+    # MANAGER TABLE
+    # =========================================================
+
+    async def append_to_manager_sheet(
+        self,
+        manager_sheet_id: str,
+        lead_data: dict[str, Any],
+        skip_existing: bool = False,
+    ) -> None:
+
+        logger.info(
+            "SheetsService.append_to_manager_sheet called for lead_id=%s manager_sheet_id=%s",
+            lead_data.get("id"),
+            manager_sheet_id,
+        )
+
+        await asyncio.to_thread(
+            self._append_rows,
+            manager_sheet_id,
+            [self._manager_row(lead_data)],
+            skip_existing,
+        )
+
+    # =========================================================
+    # BATCH APPEND (bulk import: один запрос на таблицу)
+    # =========================================================
+
+    async def append_many_to_master(self, leads_data: list[dict[str, Any]]) -> None:
+        if not leads_data:
+            return
+
+        logger.info("SheetsService.append_many_to_master called, rows=%s", len(leads_data))
+
+        await asyncio.to_thread(
+            self._append_rows,
+            self.master_sheet_id,
+            [self._master_row(lead_data) for lead_data in leads_data],
+            False,
+        )
+
+    async def append_many_to_manager_sheet(
+        self,
+        manager_sheet_id: str,
+        leads_data: list[dict[str, Any]],
+    ) -> None:
+        if not leads_data:
+            return
+
+        logger.info(
+            "SheetsService.append_many_to_manager_sheet called, rows=%s manager_sheet_id=%s",
+            len(leads_data),
+            manager_sheet_id,
+        )
+
+        await asyncio.to_thread(
+            self._append_rows,
+            manager_sheet_id,
+            [self._manager_row(lead_data) for lead_data in leads_data],
+            False,
+        )
+
+    # =========================================================
+    # UPDATE STATUS (UNIVERSAL)
+    # =========================================================
+
+    async def update_status_in_sheet(
+        self,
+        sheet_id: str,
+        lead_id: str,
+        new_status: str,
+    ) -> None:
+        """
+        Обновляет статус лида в таблице.
+        Работает и для master, и для таблиц менеджеров.
+        Не зависит от номера колонки — ищет по заголовку.
+        """
+
+        await asyncio.to_thread(self._update_status, sheet_id, lead_id, new_status)
+
+    async def update_statuses_in_sheet(self, sheet_id: str, statuses: dict[str, str]) -> None:
+        """Массовая смена статуса: statuses[lead_id] = статус, один batchUpdate на таблицу."""
+
+        if not statuses:
+            return
+
+        await asyncio.to_thread(self._update_column, sheet_id, "manager_status", statuses)
+
+    async def update_links_in_sheet(self, sheet_id: str, links: dict[str, str]) -> None:
+        """Ссылки на карточки, отправленные уже после записи строки: links[lead_id] = tg_link."""
+
+        if not links:
+            return
+
+        await asyncio.to_thread(self._update_column, sheet_id, "tg_link", links)
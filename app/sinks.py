@@ -0,0 +1,326 @@
+import asyncio
+import logging
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+from functools import partial
+from typing import Any, Callable, Optional
+
+from aiogram.types import Message
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.job_queue import JobQueue
+from app.keyboards import lead_status_keyboard
+from app.metrics import stage
+from app.models import Job, Lead, Manager
+from app.outbound import OutboundQueue
+from app.resilience import Breakers, CircuitOpenError
+from app.sheets_service import SheetsService
+
+
+logger = logging.getLogger(__name__)
+
+
+SINK_JOB = "sink"
+
+# отложенная доставка переносится, пока цепь разомкнута; потом — отказ
+MAX_DEFERRALS = 500
+DEFER_DELAY = 30.0
+
+
+class CardQueued(Exception):
+    """Дедлайн истёк, пока карточка ждала в очереди отправки: повтор дал бы дубль."""
+
+
+def card_link(chat_id: int, message_id: int) -> Optional[str]:
+    """Ссылка на сообщение — только для супергрупп (-100...)."""
+
+    chat_id_str = str(chat_id)
+    if not chat_id_str.startswith("-100"):
+        return None
+    return f"https://t.me/c/{chat_id_str[4:]}/{message_id}"
+
+
+class LeadSinks:
+    """
+    Доставка лида во внешние системы: Google Sheets (master и таблица
+    менеджера) и карточка в группу менеджера.
+
+    Каждый вызов — с дедлайном и через размыкатель своего адресата,
+    поэтому одна мёртвая таблица менеджера не тормозит остальных.
+    Не доставленное сразу уходит задачей SINK_JOB в очередь задач
+    и повторяется, когда цепь снова замкнётся.
+    """
+
+    def __init__(
+        self,
+        sheets_service: SheetsService,
+        outbound: OutboundQueue,
+        breakers: Breakers,
+        job_queue: JobQueue,
+        session_factory: Callable[[], AsyncSession],
+        sheets_timeout: float,
+        telegram_timeout: float,
+    ) -> None:
+        self.sheets_service = sheets_service
+        self.outbound = outbound
+        self.breakers = breakers
+        self.job_queue = job_queue
+        self.session_factory = session_factory
+        self.sheets_timeout = sheets_timeout
+        self.telegram_timeout = telegram_timeout
+        self.deferred = 0
+        # записи id карточек, ушедших после дедлайна ожидания
+        self._tasks: set[asyncio.Task] = set()
+
+    # =========================================================
+    # DELIVERY
+    # =========================================================
+
+    @staticmethod
+    def _breaker_name(payload: dict[str, Any]) -> str:
+        if payload["sink"] == "telegram_group":
+            return f"telegram:{payload['chat_id']}"
+        return f"sheets:{payload['sheet_id']}"
+
+    async def _deliver(self, payload: dict[str, Any], retry: bool = False) -> Any:
+        sheets = self.sheets_service
+        op = payload["op"]
+
+        if op == "card":
+            return await self._deliver_card(payload)
+
+        if op == "append" and payload["sink"] == "sheets_master":
+            def factory():
+                return sheets.append_to_master(payload["lead"], skip_existing=retry)
+            timeout = self.sheets_timeout
+        elif op == "append":
+            def factory():
+                return sheets.append_to_manager_sheet(payload["sheet_id"], payload["lead"], skip_existing=retry)
+            timeout = self.sheets_timeout
+        elif op == "status":
+            def factory():
+                return sheets.update_status_in_sheet(payload["sheet_id"], payload["lead_id"], payload["status"])
+            timeout = self.sheets_timeout
+        elif op == "statuses":
+            def factory():
+                return sheets.update_statuses_in_sheet(payload["sheet_id"], payload["statuses"])
+            timeout = self.sheets_timeout
+        elif op == "link":
+            def factory():
+                return sheets.update_links_in_sheet(payload["sheet_id"], {payload["lead_id"]: payload["tg_link"]})
+            timeout = self.sheets_timeout
+        else:
+            raise ValueError(f"Unknown sink operation {op!r}")
+
+        with stage("sink", sink=payload["sink"]):
+            return await self.breakers.call(self._breaker_name(payload), factory, timeout)
+
+    async def _deliver_card(self, payload: dict[str, Any]) -> Optional[Message]:
+        # дедлайн telegram_timeout у самого запроса: ожидание лимитов группы
+        # в очереди отправки не размыкает цепь
+        future = self.breakers.watch(
+            self._breaker_name(payload),
+            lambda: self.outbound.send_message(
+                chat_id=payload["chat_id"],
+                text=payload["text"],
+                reply_markup=lead_status_keyboard(payload["lead_id"]),
+                timeout=self.telegram_timeout,
+            ),
+        )
+
+        with stage("sink", sink=payload["sink"]):
+            try:
+                # shield: по дедлайну перестаём ждать, но сообщение остаётся в очереди
+                return await asyncio.wait_for(asyncio.shield(future), self.telegram_timeout)
+            except asyncio.TimeoutError:
+                if future.done():
+                    # по timeout упал сам запрос — сообщение из очереди уже ушло
+                    return future.result()
+                future.add_done_callback(partial(self._card_sent_late, payload))
+                raise CardQueued(f"card for chat {payload['chat_id']} is still queued") from None
+
+    def _card_sent_late(self, payload: dict[str, Any], future: asyncio.Future) -> None:
+        if future.cancelled() or future.exception() is not None or future.result() is None:
+            return
+        task = asyncio.create_task(self._save_card(payload, future.result()))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _save_card(self, payload: dict[str, Any], message: Message) -> None:
+        """Карточку отправили без ожидающего обработчика: id — в лид, ссылку — в таблицы."""
+
+        try:
+            async with self.session_factory() as session:
+                result = await session.execute(
+                    update(Lead)
+                    .where(Lead.id == uuid.UUID(payload["lead_id"]), Lead.card_message_id.is_(None))
+                    .values(card_chat_id=message.chat.id, card_message_id=message.message_id)
+                    .returning(Lead.manager_id)
+                    .execution_options(synchronize_session=False)
+                )
+                row = result.first()
+                sheet_id = None
+                if row is not None and row.manager_id is not None:
+                    result = await session.execute(
+                        select(Manager.manager_sheet_id).where(Manager.id == row.manager_id)
+                    )
+                    sheet_id = result.scalar_one_or_none()
+                await session.commit()
+        except Exception:
+            logger.exception("Failed to save card of lead %s", payload["lead_id"])
+            return
+
+        link = card_link(message.chat.id, message.message_id)
+        # row is None — id уже записал обработчик, ссылка ушла вместе со строкой
+        if row is None or link is None:
+            return
+
+        deliveries = [{"sink": "sheets_master", "sheet_id": self.sheets_service.master_sheet_id}]
+        if sheet_id:
+            deliveries.append({"sink": "sheets_manager", "sheet_id": sheet_id})
+        for delivery in deliveries:
+            # с паузой: строка лида могла ещё не дойти до таблицы
+            await self._enqueue(
+                {"op": "link", **delivery, "lead_id": payload["lead_id"], "tg_link": link},
+                DEFER_DELAY,
+            )
+
+    async def _enqueue(self, payload: dict[str, Any], delay: float) -> bool:
+        try:
+            async with self.session_factory() as session:
+                await self.job_queue.enqueue(session, SINK_JOB, payload, delay=timedelta(seconds=delay))
+                await session.commit()
+        except Exception:
+            logger.exception("Failed to defer %s %s", payload["op"], payload["sink"])
+            return False
+        return True
+
+    async def _defer(self, payload: dict[str, Any], error: BaseException) -> None:
+        deferrals = payload.get("deferrals", 0)
+        if deferrals >= MAX_DEFERRALS:
+            logger.error("Giving up %s %s after %s deferrals: %s", payload["op"], payload["sink"], deferrals, error)
+            return
+
+        breaker = self.breakers.get(self._breaker_name(payload))
+        delay = breaker.retry_after or DEFER_DELAY
+
+        if not await self._enqueue({**payload, "deferrals": deferrals + 1}, delay):
+            return
+
+        self.deferred += 1
+        logger.warning("%s %s deferred for %.0fs: %s", payload["op"], payload["sink"], delay, error)
+
+    async def _deliver_or_defer(self, payload: dict[str, Any]) -> Any:
+        try:
+            return await self._deliver(payload)
+        except Exception as e:
+            await self._defer(payload, e)
+            return None
+
+    async def _current_status(self, payload: dict[str, Any]) -> dict[str, Any]:
+        # пока статус ждал в очереди, его могли сменить ещё раз
+        async with self.session_factory() as session:
+            result = await session.execute(
+                select(Lead.manager_status).where(Lead.id == uuid.UUID(payload["lead_id"]))
+            )
+            status = result.scalar_one_or_none()
+        return {**payload, "status": status.value} if status else payload
+
+    async def _current_statuses(self, payload: dict[str, Any]) -> dict[str, Any]:
+        async with self.session_factory() as session:
+            result = await session.execute(
+                select(Lead.id, Lead.manager_status).where(
+                    Lead.id.in_([uuid.UUID(lead_id) for lead_id in payload["statuses"]])
+                )
+            )
+            current = {str(lead_id): status.value for lead_id, status in result.all()}
+        return {**payload, "statuses": {**payload["statuses"], **current}}
+
+    async def handle_job(self, job: Job) -> None:
+        payload = job.payload
+        if payload["op"] == "status":
+            payload = await self._current_status(payload)
+        elif payload["op"] == "statuses":
+            payload = await self._current_statuses(payload)
+
+        try:
+            result = await self._deliver(payload, retry=True)
+        except CircuitOpenError as e:
+            # цепь ещё разомкнута — переносим, не тратя попытки задачи
+            await self._defer(payload, e)
+        except CardQueued:
+            logger.warning("Deferred lead card for chat %s is still queued", payload["chat_id"])
+        else:
+            if payload["op"] == "card" and result is not None:
+                await self._save_card(payload, result)
+
+    # =========================================================
+    # API
+    # =========================================================
+
+    async def send_card(self, chat_id: int, lead_id: str, text: str) -> Optional[Message]:
+        """
+        Карточка лида в группу менеджера. None — не дождались отправки:
+        id карточки и ссылку в таблицы запишет доставка, когда сообщение уйдёт.
+        """
+
+        payload = {"op": "card", "sink": "telegram_group", "chat_id": chat_id, "lead_id": lead_id, "text": text}
+        try:
+            return await self._deliver(payload)
+        except CardQueued:
+            logger.warning("Lead card for chat %s is still queued after %ss", chat_id, self.telegram_timeout)
+            return None
+        except Exception as e:
+            await self._defer(payload, e)
+            return None
+
+    async def append_lead(self, lead_payload: dict[str, Any], manager_sheet_id: Optional[str]) -> None:
+        deliveries = [
+            {"op": "append", "sink": "sheets_master", "sheet_id": self.sheets_service.master_sheet_id, "lead": lead_payload},
+        ]
+        if manager_sheet_id:
+            deliveries.append(
+                {"op": "append", "sink": "sheets_manager", "sheet_id": manager_sheet_id, "lead": lead_payload}
+            )
+        await asyncio.gather(*(self._deliver_or_defer(payload) for payload in deliveries))
+
+    async def update_status(self, lead_id: str, status: str, manager_sheet_id: Optional[str]) -> None:
+        deliveries = [
+            {"op": "status", "sink": "sheets_master", "sheet_id": self.sheets_service.master_sheet_id},
+        ]
+        if manager_sheet_id:
+            deliveries.append({"op": "status", "sink": "sheets_manager", "sheet_id": manager_sheet_id})
+        await asyncio.gather(
+            *(
+                self._deliver_or_defer({**payload, "lead_id": lead_id, "status": status})
+                for payload in deliveries
+            )
+        )
+
+    async def update_statuses(self, changes: list[tuple[str, str, Optional[str]]]) -> None:
+        """
+        Массовая смена статуса: changes — (lead_id, статус, таблица менеджера).
+        Один batchUpdate в master и по одному в каждую таблицу менеджера.
+        """
+
+        by_sheet: dict[str, dict[str, str]] = defaultdict(dict)
+        for lead_id, status, manager_sheet_id in changes:
+            by_sheet[self.sheets_service.master_sheet_id][lead_id] = status
+            if manager_sheet_id:
+                by_sheet[manager_sheet_id][lead_id] = status
+
+        await asyncio.gather(
+            *(
+                self._deliver_or_defer(
+                    {
+                        "op": "statuses",
+                        "sink": "sheets_master" if sheet_id == self.sheets_service.master_sheet_id else "sheets_manager",
+                        "sheet_id": sheet_id,
+                        "statuses": statuses,
+                    }
+                )
+                for sheet_id, statuses in by_sheet.items()
+            )
+        )
@@ -0,0 +1,92 @@
+import asyncio
+import logging
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any, Optional
+
+from aiogram.dispatcher.middlewares.base import BaseMiddleware
+from aiogram.types import TelegramObject
+
+
+logger = logging.getLogger(__name__)
+
+
+WARM_UP_ATTEMPTS = 3
+
+PENDING = "pending"
+READY = "ready"
+FAILED = "failed"
+
+
+class Readiness:
+    """
+    Готовность процесса: бот принимает апдейты сразу, а тяжёлые сервисы
+    (OCR, Google Sheets) прогреваются в фоне. Пока сервис не готов,
+    он всё равно работает — просто подключится при первом обращении.
+    """
+
+    def __init__(self, started_at: float) -> None:
+        self.started_at = started_at
+        self.components: dict[str, str] = {}
+        self.first_update_at: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        return all(status == READY for status in self.components.values())
+
+    def since_start(self, moment: Optional[float] = None) -> float:
+        return (moment or time.monotonic()) - self.started_at
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "components": dict(self.components),
+            "uptime_seconds": round(self.since_start(), 3),
+            "first_update_seconds": (
+                round(self.since_start(self.first_update_at), 3) if self.first_update_at else None
+            ),
+        }
+
+    async def _warm_up_one(self, name: str, warm_up: Callable[[], Awaitable[None]]) -> None:
+        for attempt in range(1, WARM_UP_ATTEMPTS + 1):
+            try:
+                await warm_up()
+            except Exception:
+                logger.exception("Warm-up of %s failed (attempt %s)", name, attempt)
+                await asyncio.sleep(2 ** attempt)
+                continue
+
+            self.components[name] = READY
+            logger.info("%s warmed up %.2fs after start", name, self.since_start())
+            return
+
+        self.components[name] = FAILED
+
+    async def warm_up(self, components: dict[str, Callable[[], Awaitable[None]]]) -> None:
+        for name in components:
+            self.components[name] = PENDING
+
+        await asyncio.gather(
+            *(self._warm_up_one(name, warm_up) for name, warm_up in components.items())
+        )
+
+        if self.ready:
+            logger.info("All services ready %.2fs after start", self.since_start())
+
+
+class ReadinessMiddleware(BaseMiddleware):
+    """Засекает первый принятый апдейт — метрика time-to-first-update."""
+
+    def __init__(self, readiness: Readiness) -> None:
+        self.readiness = readiness
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        if self.readiness.first_update_at is None:
+            self.readiness.first_update_at = time.monotonic()
+            logger.info("First update received %.2fs after start", self.readiness.since_start())
+        return await handler(event, data)
@@ -0,0 +1,365 @@
+import asyncio
+import logging
+import time
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Any, Callable, Optional
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import Date, and_, cast, func, literal, select, union_all
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import (
+    UNASSIGNED_MANAGER_ID,
+    ArchivedLead,
+    Lead,
+    LeadStatsCounter,
+    LeadStatus,
+    Manager,
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+# asyncpg ограничивает запрос 32767 параметрами, в строке счётчика их 5
+UPSERT_CHUNK_ROWS = 5000
+
+PERIODS: dict[str, tuple[str, int]] = {
+    # период: (подпись, сколько дней назад от сегодня)
+    "day": ("сегодня", 0),
+    "week": ("7 дней", 6),
+    "month": ("30 дней", 29),
+}
+
+# Этапы воронки: лид «дошёл» до этапа, если его текущий статус — этот этап или дальше.
+FUNNEL_STAGES: list[tuple[str, set[LeadStatus]]] = [
+    (
+        "Консультация",
+        {LeadStatus.consult_scheduled, LeadStatus.surgery_scheduled, LeadStatus.operated},
+    ),
+    (
+        "Операция назначена",
+        {LeadStatus.surgery_scheduled, LeadStatus.operated},
+    ),
+    (
+        "Прооперирован",
+        {LeadStatus.operated},
+    ),
+]
+
+
+@dataclass(slots=True)
+class FunnelStats:
+    since: date
+    total: int = 0
+    by_type: dict[str, int] = field(default_factory=lambda: defaultdict(int))
+    by_status: dict[LeadStatus, int] = field(default_factory=lambda: defaultdict(int))
+    # manager name -> status -> count
+    by_manager: dict[str, dict[LeadStatus, int]] = field(
+        default_factory=lambda: defaultdict(lambda: defaultdict(int))
+    )
+
+
+class StatsService:
+    def __init__(self, timezone: str) -> None:
+        self.timezone = timezone
+
+    # =========================================================
+    # INCREMENTAL COUNTERS (в транзакции вызывающего)
+    # =========================================================
+
+    def _day(self, moment: Any) -> Any:
+        # день считаем на стороне Postgres в часовом поясе отчётов
+        return cast(func.timezone(self.timezone, moment), Date)
+
+    async def _bump(
+        self,
+        session: AsyncSession,
+        *,
+        day: Any,
+        manager_id: Optional[uuid.UUID],
+        status: LeadStatus,
+        lead_type: str,
+        delta: int,
+    ) -> None:
+        await self._upsert(
+            session,
+            [
+                {
+                    "day": day,
+                    "manager_id": manager_id or UNASSIGNED_MANAGER_ID,
+                    "manager_status": status,
+                    "lead_type": lead_type,
+                    "leads_count": delta,
+                }
+            ],
+        )
+
+    async def _upsert(self, session: AsyncSession, rows: list[dict[str, Any]]) -> None:
+        # ключи rows должны быть уникальны: ON CONFLICT не обновит строку дважды
+        for start in range(0, len(rows), UPSERT_CHUNK_ROWS):
+            stmt = insert(LeadStatsCounter).values(rows[start:start + UPSERT_CHUNK_ROWS])
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[
+                    LeadStatsCounter.day,
+                    LeadStatsCounter.manager_id,
+                    LeadStatsCounter.manager_status,
+                    LeadStatsCounter.lead_type,
+                ],
+                set_={"leads_count": LeadStatsCounter.leads_count + stmt.excluded.leads_count},
+            )
+            await session.execute(stmt)
+
+    async def record_lead_created(self, session: AsyncSession, lead: Lead) -> None:
+        """Вызывать до commit(): счётчик попадёт в ту же транзакцию, что и лид."""
+
+        # created_at ещё не выставлен сервером — now() в той же транзакции совпадёт
+        moment = lead.created_at if lead.created_at is not None else func.now()
+
+        await self._bump(
+            session,
+            day=self._day(moment),
+            manager_id=lead.manager_id,
+            status=lead.manager_status,
+            lead_type=lead.lead_type,
+            delta=1,
+        )
+
+    async def record_leads_created_bulk(
+        self,
+        session: AsyncSession,
+        created_at: datetime,
+        counts: dict[tuple[Optional[uuid.UUID], str], int],
+    ) -> None:
+        """Для пакетной загрузки: counts[(manager_id, lead_type)] новых лидов."""
+
+        for (manager_id, lead_type), count in counts.items():
+            await self._bump(
+                session,
+                day=self._day(literal(created_at)),
+                manager_id=manager_id,
+                status=LeadStatus.new,
+                lead_type=lead_type,
+                delta=count,
+            )
+
+    async def record_status_change(
+        self,
+        session: AsyncSession,
+        lead: Lead,
+        old_status: LeadStatus,
+    ) -> None:
+        if old_status == lead.manager_status:
+            return
+
+        day = self._day(literal(lead.created_at))
+
+        await self._bump(
+            session,
+            day=day,
+            manager_id=lead.manager_id,
+            status=old_status,
+            lead_type=lead.lead_type,
+            delta=-1,
+        )
+        await self._bump(
+            session,
+            day=day,
+            manager_id=lead.manager_id,
+            status=lead.manager_status,
+            lead_type=lead.lead_type,
+            delta=1,
+        )
+
+    async def record_status_changes(
+        self,
+        session: AsyncSession,
+        changes: list[tuple[Lead, LeadStatus]],
+    ) -> None:
+        """Массовая смена статуса: все счётчики одним INSERT ... ON CONFLICT."""
+
+        zone = ZoneInfo(self.timezone)
+        deltas: dict[tuple[date, uuid.UUID, LeadStatus, str], int] = defaultdict(int)
+
+        for lead, old_status in changes:
+            if old_status == lead.manager_status:
+                continue
+            day = lead.created_at.astimezone(zone).date()
+            manager_id = lead.manager_id or UNASSIGNED_MANAGER_ID
+            deltas[(day, manager_id, old_status, lead.lead_type)] -= 1
+            deltas[(day, manager_id, lead.manager_status, lead.lead_type)] += 1
+
+        rows = [
+            {
+                "day": day,
+                "manager_id": manager_id,
+                "manager_status": status,
+                "lead_type": lead_type,
+                "leads_count": delta,
+            }
+            for (day, manager_id, status, lead_type), delta in deltas.items()
+            if delta
+        ]
+        if rows:
+            await self._upsert(session, rows)
+
+    # =========================================================
+    # REPORT
+    # =========================================================
+
+    async def get_funnel(self, session: AsyncSession, period: str) -> FunnelStats:
+        _, days_back = PERIODS[period]
+
+        today = self._day(func.now())
+        since_result = await session.execute(select(today - days_back))
+        since: date = since_result.scalar_one()
+
+        stmt = (
+            select(
+                Manager.name,
+                LeadStatsCounter.manager_status,
+                LeadStatsCounter.lead_type,
+                func.sum(LeadStatsCounter.leads_count),
+            )
+            .select_from(LeadStatsCounter)
+            .outerjoin(Manager, Manager.id == LeadStatsCounter.manager_id)
+            .where(LeadStatsCounter.day >= since)
+            .group_by(Manager.name, LeadStatsCounter.manager_status, LeadStatsCounter.lead_type)
+        )
+        result = await session.execute(stmt)
+
+        stats = FunnelStats(since=since)
+
+        for manager_name, status, lead_type, count in result.all():
+            count = int(count or 0)
+            if not count:
+                continue
+            stats.total += count
+            stats.by_type[lead_type] += count
+            stats.by_status[status] += count
+            stats.by_manager[manager_name or "Без менеджера"][status] += count
+
+        return stats
+
+    def format_funnel(self, stats: FunnelStats, period: str) -> str:
+        title, _ = PERIODS[period]
+
+        lines = [
+            f"📊 Статистика за {title} (с {stats.since.isoformat()})",
+            "",
+            f"Всего лидов: {stats.total}",
+            f"🔥 Горячие: {stats.by_type.get('hot', 0)} / ❄️ Холодные: {stats.by_type.get('cold', 0)}",
+            "",
+            "Конверсия:",
+        ]
+
+        for stage_name, statuses in FUNNEL_STAGES:
+            reached = sum(stats.by_status.get(status, 0) for status in statuses)
+            percent = reached / stats.total * 100 if stats.total else 0.0
+            lines.append(f"  {stage_name}: {reached} ({percent:.1f}%)")
+
+        for manager_name, statuses in sorted(stats.by_manager.items()):
+            lines.append("")
+            lines.append(f"👤 {manager_name} — {sum(statuses.values())}")
+            for status in LeadStatus:
+                if statuses.get(status):
+                    lines.append(f"  {status.value}: {statuses[status]}")
+
+        return "\n".join(lines)
+
+    # =========================================================
+    # RECONCILIATION
+    # =========================================================
+
+    async def reconcile(self, session: AsyncSession) -> int:
+        """
+        Пересчитывает счётчики из leads и leads_archive. Возвращает число исправленных строк.
+
+        Пересчёт и чтение счётчиков — в одном снимке REPEATABLE READ без
+        блокировок: инкремент коммитится вместе со своим лидом, поэтому в
+        снимке расхождение — это настоящий дрейф. Исправления применяются
+        короткой транзакцией как дельты (+/-), так что инкременты, пришедшие
+        после снимка, не теряются, а горячий путь не ждёт сканирования.
+        """
+
+        await session.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+
+        # архивные лиды тоже входят в статистику
+        all_leads = union_all(
+            *[
+                select(
+                    model.created_at,
+                    model.manager_id,
+                    model.manager_status,
+                    model.lead_type,
+                )
+                for model in (Lead, ArchivedLead)
+            ]
+        ).subquery()
+
+        day = self._day(all_leads.c.created_at)
+        manager_id = func.coalesce(all_leads.c.manager_id, UNASSIGNED_MANAGER_ID)
+
+        source = (
+            select(
+                day.label("day"),
+                manager_id.label("manager_id"),
+                all_leads.c.manager_status.label("manager_status"),
+                all_leads.c.lead_type.label("lead_type"),
+                func.count().label("leads_count"),
+            )
+            .group_by(day, manager_id, all_leads.c.manager_status, all_leads.c.lead_type)
+            .subquery()
+        )
+
+        counters = LeadStatsCounter.__table__
+        keys = ("day", "manager_id", "manager_status", "lead_type")
+        delta = func.coalesce(source.c.leads_count, 0) - func.coalesce(counters.c.leads_count, 0)
+
+        drift_stmt = (
+            select(
+                *[func.coalesce(source.c[key], counters.c[key]).label(key) for key in keys],
+                delta.label("leads_count"),
+            )
+            .select_from(
+                source.outerjoin(
+                    counters,
+                    and_(*[source.c[key] == counters.c[key] for key in keys]),
+                    full=True,
+                )
+            )
+            .where(delta != 0)
+        )
+        rows = [dict(row._mapping) for row in (await session.execute(drift_stmt)).all()]
+        # снимок больше не нужен — дальше только короткая запись
+        await session.commit()
+
+        if rows:
+            await self._upsert(session, rows)
+            await session.execute(counters.delete().where(counters.c.leads_count == 0))
+            await session.commit()
+
+        return len(rows)
+
+    async def run_reconciliation(
+        self,
+        session_factory: Callable[[], AsyncSession],
+        interval_seconds: int,
+    ) -> None:
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                async with session_factory() as session:
+                    started = time.perf_counter()
+                    drift = await self.reconcile(session)
+                logger.info(
+                    "Stats counters reconciled: %s rows corrected in %.2fs",
+                    drift,
+                    time.perf_counter() - started,
+                )
+            except Exception:
+                logger.exception("Stats counters reconciliation failed")
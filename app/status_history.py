@@ -0,0 +1,164 @@
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import extract, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Lead, LeadStatus, LeadStatusEvent
+
+
+@dataclass(slots=True)
+class StageInterval:
+    status: LeadStatus
+    entered_at: datetime
+    left_at: Optional[datetime]
+    dwell_seconds: float
+
+
+@dataclass(slots=True)
+class StageDwell:
+    status: LeadStatus
+    transitions: int
+    still_open: int
+    avg_seconds: float
+    p50_seconds: float
+    p90_seconds: float
+
+
+class StatusHistoryService:
+    # =========================================================
+    # WRITE (горячий путь: один INSERT без RETURNING)
+    # =========================================================
+
+    async def record_transition(
+        self,
+        session: AsyncSession,
+        lead: Lead,
+        from_status: Optional[LeadStatus],
+        changed_by: Optional[int] = None,
+    ) -> None:
+        """Вызывать до commit(): событие пишется в транзакции смены статуса."""
+
+        if from_status == lead.manager_status:
+            return
+
+        await session.execute(
+            insert(LeadStatusEvent).values(
+                lead_id=lead.id,
+                manager_id=lead.manager_id,
+                from_status=from_status,
+                to_status=lead.manager_status,
+                changed_by=changed_by,
+            )
+        )
+
+    async def record_transitions(
+        self,
+        session: AsyncSession,
+        changes: list[tuple[Lead, LeadStatus]],
+        changed_by: Optional[int] = None,
+    ) -> None:
+        """Массовая смена статуса: все события одним многострочным INSERT."""
+
+        rows = [
+            {
+                "lead_id": lead.id,
+                "manager_id": lead.manager_id,
+                "from_status": from_status,
+                "to_status": lead.manager_status,
+                "changed_by": changed_by,
+            }
+            for lead, from_status in changes
+            if from_status != lead.manager_status
+        ]
+        if rows:
+            await session.execute(insert(LeadStatusEvent).values(rows))
+
+    # =========================================================
+    # READ
+    # =========================================================
+
+    async def lead_timeline(self, session: AsyncSession, lead_id: uuid.UUID) -> list[StageInterval]:
+        """История одного лида — идёт по индексу (lead_id, created_at)."""
+
+        left_at = func.lead(LeadStatusEvent.created_at).over(
+            order_by=(LeadStatusEvent.created_at, LeadStatusEvent.id)
+        )
+
+        stmt = (
+            select(
+                LeadStatusEvent.to_status,
+                LeadStatusEvent.created_at,
+                left_at.label("left_at"),
+                func.now().label("now"),
+            )
+            .where(LeadStatusEvent.lead_id == lead_id)
+            .order_by(LeadStatusEvent.created_at, LeadStatusEvent.id)
+        )
+        result = await session.execute(stmt)
+
+        return [
+            StageInterval(
+                status=status,
+                entered_at=entered_at,
+                left_at=left,
+                dwell_seconds=((left or now) - entered_at).total_seconds(),
+            )
+            for status, entered_at, left, now in result.all()
+        ]
+
+    async def stage_dwell(
+        self,
+        session: AsyncSession,
+        since: datetime,
+        manager_id: Optional[uuid.UUID] = None,
+    ) -> list[StageDwell]:
+        """
+        Сколько лиды проводят в каждом статусе (для new — время до первого контакта).
+        Фильтр по created_at отсекает старые секции; незакрытый этап считается до now().
+        """
+
+        intervals = select(
+            LeadStatusEvent.to_status.label("status"),
+            LeadStatusEvent.created_at.label("entered_at"),
+            func.lead(LeadStatusEvent.created_at)
+            .over(
+                partition_by=LeadStatusEvent.lead_id,
+                order_by=(LeadStatusEvent.created_at, LeadStatusEvent.id),
+            )
+            .label("left_at"),
+        ).where(LeadStatusEvent.created_at >= since)
+
+        if manager_id is not None:
+            intervals = intervals.where(LeadStatusEvent.manager_id == manager_id)
+
+        intervals = intervals.subquery()
+
+        dwell = extract("epoch", func.coalesce(intervals.c.left_at, func.now()) - intervals.c.entered_at)
+
+        stmt = (
+            select(
+                intervals.c.status,
+                func.count(),
+                func.count().filter(intervals.c.left_at.is_(None)),
+                func.avg(dwell),
+                func.percentile_cont(0.5).within_group(dwell),
+                func.percentile_cont(0.9).within_group(dwell),
+            )
+            .group_by(intervals.c.status)
+        )
+        result = await session.execute(stmt)
+
+        return [
+            StageDwell(
+                status=status,
+                transitions=int(transitions),
+                still_open=int(still_open),
+                avg_seconds=float(avg or 0),
+                p50_seconds=float(p50 or 0),
+                p90_seconds=float(p90 or 0),
+            )
+            for status, transitions, still_open, avg, p50, p90 in result.all()
+        ]
@@ -0,0 +1,318 @@
+import asyncio
+import logging
+import multiprocessing
+import time
+import zlib
+from collections.abc import Callable
+from typing import Any, Optional
+
+import aiohttp
+from aiogram import Bot
+from aiohttp import web
+
+import app.database as db
+from app.config import Settings
+from app.webhook import stop_event, webhook_url
+
+
+logger = logging.getLogger(__name__)
+
+
+HEALTH_INTERVAL = 5.0
+HEALTH_TIMEOUT = 3.0
+# столько проваленных проверок подряд — и шард перезапускается
+HEALTH_FAILURES = 3
+# сколько ждать обработки уже принятых апдейтов при остановке
+DRAIN_TIMEOUT = 60.0
+FORWARD_TIMEOUT = 300.0
+POLL_TIMEOUT = 30
+
+WorkerTarget = Callable[[int, int], None]
+
+
+def shard_key(update: dict[str, Any]) -> int:
+    """chat_id (или user_id) апдейта — всё, что приходит из одного чата, идёт в один шард."""
+
+    for field, payload in update.items():
+        if field == "update_id" or not isinstance(payload, dict):
+            continue
+        chat = payload.get("chat") or (payload.get("message") or {}).get("chat")
+        if chat:
+            return chat["id"]
+        user = payload.get("from") or payload.get("user")
+        if user:
+            return user["id"]
+    return update.get("update_id", 0)
+
+
+class _Shard:
+    __slots__ = ("index", "port", "process", "failures", "restarts")
+
+    def __init__(self, index: int, port: int) -> None:
+        self.index = index
+        self.port = port
+        self.process: Optional[multiprocessing.Process] = None
+        self.failures = 0
+        self.restarts = 0
+
+
+class Supervisor:
+    """
+    Принимает апдейты (polling или webhook) и раздаёт их N процессам-шардам
+    по хэшу chat_id. Апдейты одного чата уходят в шард строго по одному,
+    поэтому порядок шагов FSM у админа сохраняется, а OCR и разбор
+    разных чатов идут на разных ядрах.
+    """
+
+    def __init__(self, settings: Settings, worker_target: WorkerTarget) -> None:
+        self.settings = settings
+        self.worker_target = worker_target
+        self.context = multiprocessing.get_context("spawn")
+        self.shards = [
+            _Shard(index, settings.shard_base_port + index)
+            for index in range(settings.shard_workers)
+        ]
+        # последняя пересылка по каждому чату — следующая ждёт её завершения
+        self._tails: dict[int, asyncio.Task] = {}
+        self._http: Optional[aiohttp.ClientSession] = None
+        self._stopping = False
+
+    # =========================================================
+    # PROCESSES
+    # =========================================================
+
+    def _spawn(self, shard: _Shard) -> None:
+        shard.process = self.context.Process(
+            target=self.worker_target,
+            args=(shard.index, shard.port),
+            name=f"shard-{shard.index}",
+        )
+        shard.process.start()
+        shard.failures = 0
+        logger.info("Shard %s started (pid %s, port %s)", shard.index, shard.process.pid, shard.port)
+
+    async def _restart(self, shard: _Shard, reason: str) -> None:
+        logger.error("Restarting shard %s: %s", shard.index, reason)
+        if shard.process is not None and shard.process.is_alive():
+            shard.process.kill()
+            # join в потоке — пока шард умирает, пересылка апдейтов в другие шарды идёт
+            await asyncio.to_thread(shard.process.join, 5)
+        shard.restarts += 1
+        self._spawn(shard)
+
+    async def _check(self, shard: _Shard) -> None:
+        if shard.process is None or not shard.process.is_alive():
+            exitcode = shard.process.exitcode if shard.process else None
+            await self._restart(shard, f"process exited with {exitcode}")
+            return
+
+        try:
+            async with self._http.get(
+                f"http://127.0.0.1:{shard.port}/healthz",
+                timeout=aiohttp.ClientTimeout(total=HEALTH_TIMEOUT),
+            ) as response:
+                healthy = response.status == 200
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            healthy = False
+
+        shard.failures = 0 if healthy else shard.failures + 1
+        if shard.failures >= HEALTH_FAILURES:
+            await self._restart(shard, f"{shard.failures} failed health checks")
+
+    async def _health_loop(self) -> None:
+        # первые проверки после старта шардов: процессу нужно время на импорты
+        await asyncio.sleep(HEALTH_INTERVAL * 2)
+        while not self._stopping:
+            for shard in self.shards:
+                try:
+                    await self._check(shard)
+                except Exception:
+                    logger.exception("Health check of shard %s failed", shard.index)
+            await asyncio.sleep(HEALTH_INTERVAL)
+
+    def _terminate_all(self) -> None:
+        for shard in self.shards:
+            if shard.process is not None and shard.process.is_alive():
+                shard.process.terminate()
+
+        deadline = time.monotonic() + DRAIN_TIMEOUT
+        for shard in self.shards:
+            if shard.process is None:
+                continue
+            shard.process.join(max(0.0, deadline - time.monotonic()))
+            if shard.process.is_alive():
+                logger.warning("Shard %s did not stop in time, killing", shard.index)
+                shard.process.kill()
+                shard.process.join()
+
+    # =========================================================
+    # ROUTING
+    # =========================================================
+
+    def shard_for(self, update: dict[str, Any]) -> _Shard:
+        key = shard_key(update)
+        return self.shards[zlib.crc32(str(key).encode()) % len(self.shards)]
+
+    async def _forward(self, shard: _Shard, update: dict[str, Any]) -> None:
+        url = f"http://127.0.0.1:{shard.port}{self.settings.webhook_path}"
+        headers = {"X-Telegram-Bot-Api-Secret-Token": self.settings.webhook_secret}
+        deadline = time.monotonic() + FORWARD_TIMEOUT
+        delay = 0.2
+
+        # шард может перезапускаться — повторяем, пока он не примет соединение.
+        # Любой HTTP-ответ или таймаут значит, что апдейт уже дошёл до шарда:
+        # повтор привёл бы к двойной обработке.
+        while True:
+            try:
+                async with self._http.post(url, json=update, headers=headers) as response:
+                    if response.status >= 500:
+                        logger.error(
+                            "Shard %s failed update %s: HTTP %s",
+                            shard.index,
+                            update.get("update_id"),
+                            response.status,
+                        )
+                    return
+            except aiohttp.ClientConnectionError as e:
+                error = f"{type(e).__name__}: {e}"
+            except asyncio.TimeoutError:
+                logger.error("Shard %s timed out on update %s", shard.index, update.get("update_id"))
+                return
+
+            if time.monotonic() + delay > deadline:
+                logger.error(
+                    "Dropping update %s for shard %s: %s",
+                    update.get("update_id"),
+                    shard.index,
+                    error,
+                )
+                return
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 5.0)
+
+    def dispatch(self, update: dict[str, Any]) -> None:
+        key = shard_key(update)
+        shard = self.shard_for(update)
+        previous = self._tails.get(key)
+
+        async def chained() -> None:
+            if previous is not None:
+                await asyncio.gather(previous, return_exceptions=True)
+            await self._forward(shard, update)
+
+        task = asyncio.create_task(chained())
+        self._tails[key] = task
+
+        def _cleanup(done: asyncio.Task) -> None:
+            if self._tails.get(key) is done:
+                del self._tails[key]
+
+        task.add_done_callback(_cleanup)
+
+    async def drain(self) -> None:
+        tails = list(self._tails.values())
+        if not tails:
+            return
+        logger.info("Draining %s in-flight chats", len(tails))
+        _, pending = await asyncio.wait(tails, timeout=DRAIN_TIMEOUT)
+        if pending:
+            logger.warning("%s chats were not drained in %.0fs", len(pending), DRAIN_TIMEOUT)
+
+    # =========================================================
+    # INTAKE
+    # =========================================================
+
+    async def _poll(self, bot: Bot, allowed_updates: list[str], stop: asyncio.Event) -> None:
+        await bot.delete_webhook()
+        offset: Optional[int] = None
+
+        try:
+            while not stop.is_set():
+                try:
+                    updates = await bot.get_updates(
+                        offset=offset,
+                        timeout=POLL_TIMEOUT,
+                        allowed_updates=allowed_updates,
+                    )
+                except Exception:
+                    logger.exception("getUpdates failed")
+                    await asyncio.sleep(1)
+                    continue
+
+                for update in updates:
+                    offset = update.update_id + 1
+                    self.dispatch(update.model_dump(mode="json", exclude_none=True, by_alias=True))
+        finally:
+            # подтверждаем разосланные апдейты, иначе после рестарта они придут снова
+            if offset is not None:
+                try:
+                    await asyncio.shield(bot.get_updates(offset=offset, timeout=0, limit=1))
+                except Exception:
+                    logger.exception("Failed to confirm polled updates")
+
+    async def _serve_webhook(self, bot: Bot, allowed_updates: list[str], stop: asyncio.Event) -> None:
+        secret = self.settings.webhook_secret
+
+        async def receive(request: web.Request) -> web.Response:
+            if request.headers.get("X-Telegram-Bot-Api-Secret-Token") != secret:
+                return web.Response(status=401)
+            if self._stopping:
+                # Telegram повторит доставку после рестарта
+                return web.Response(status=503)
+            self.dispatch(await request.json())
+            return web.Response()
+
+        app = web.Application()
+        app.router.add_post(self.settings.webhook_path, receive)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, self.settings.webhook_host, self.settings.webhook_port).start()
+
+        await bot.set_webhook(
+            url=webhook_url(self.settings),
+            secret_token=secret,
+            allowed_updates=allowed_updates,
+        )
+        logger.info("Supervisor webhook listening on %s", webhook_url(self.settings))
+
+        try:
+            await stop.wait()
+        finally:
+            self._stopping = True
+            await runner.cleanup()
+
+    # =========================================================
+    # ENTRY POINT
+    # =========================================================
+
+    async def run(self, bot: Bot, allowed_updates: list[str]) -> None:
+        db.init_database(self.settings.database_url, db.pool_config(self.settings))
+        await db.create_tables()
+        await db.engine.dispose()
+
+        for shard in self.shards:
+            self._spawn(shard)
+
+        self._http = aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=FORWARD_TIMEOUT),
+        )
+        stop = stop_event()
+        health = asyncio.create_task(self._health_loop())
+
+        intake = self._serve_webhook if self.settings.run_mode == "webhook" else self._poll
+        intake_task = asyncio.create_task(intake(bot, allowed_updates, stop))
+
+        try:
+            await stop.wait()
+        finally:
+            # 1) перестаём принимать  2) дожидаемся отправленного в шарды  3) гасим шарды
+            self._stopping = True
+            logger.info("Supervisor stopping")
+            intake_task.cancel()
+            await asyncio.gather(intake_task, return_exceptions=True)
+            await self.drain()
+            health.cancel()
+            await asyncio.gather(health, return_exceptions=True)
+            await self._http.close()
+            await bot.session.close()
+            await asyncio.to_thread(self._terminate_all)
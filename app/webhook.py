@@ -0,0 +1,112 @@
+import asyncio
+import logging
+import signal
+import sys
+from typing import Optional
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+
+from app.config import Settings
+
+
+logger = logging.getLogger(__name__)
+
+
+def webhook_url(settings: Settings) -> str:
+    return settings.webhook_base_url.rstrip("/") + settings.webhook_path
+
+
+async def register_webhook(bot: Bot, dp: Dispatcher, settings: Settings) -> None:
+    """Регистрирует webhook в Telegram. Вызывается один раз, а не каждым воркером."""
+
+    await bot.set_webhook(
+        url=webhook_url(settings),
+        secret_token=settings.webhook_secret,
+        allowed_updates=dp.resolve_used_update_types(),
+    )
+    logger.info("Webhook set to %s", webhook_url(settings))
+
+
+async def _healthz(request: web.Request) -> web.Response:
+    return web.Response(text="ok")
+
+
+def _readyz(dp: Dispatcher):
+    async def handler(request: web.Request) -> web.Response:
+        readiness = dp.workflow_data.get("readiness")
+        if readiness is None:
+            return web.json_response({"ready": True})
+        snapshot = readiness.snapshot()
+        return web.json_response(snapshot, status=200 if snapshot["ready"] else 503)
+
+    return handler
+
+
+def build_webhook_app(
+    bot: Bot,
+    dp: Dispatcher,
+    settings: Settings,
+    handle_in_background: bool = True,
+) -> web.Application:
+    app = web.Application()
+
+    # Заголовок X-Telegram-Bot-Api-Secret-Token сверяется до разбора тела.
+    # handle_in_background: Telegram сразу получает 200, а апдейт
+    # обрабатывается отдельной задачей диспетчера. Шард за супервизором
+    # отвечает только после обработки — так супервизор держит порядок в чате.
+    SimpleRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        secret_token=settings.webhook_secret,
+        handle_in_background=handle_in_background,
+    ).register(app, path=settings.webhook_path)
+
+    app.router.add_get("/healthz", _healthz)
+    app.router.add_get("/readyz", _readyz(dp))
+    setup_application(app, dp, bot=bot)
+    return app
+
+
+def stop_event() -> asyncio.Event:
+    """Событие, которое выставляется по SIGTERM/SIGINT."""
+
+    stop = asyncio.Event()
+    if not sys.platform.startswith("win"):
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, stop.set)
+    return stop
+
+
+async def serve_webhook(
+    bot: Bot,
+    dp: Dispatcher,
+    settings: Settings,
+    reuse_port: bool = False,
+    host: Optional[str] = None,
+    port: Optional[int] = None,
+    handle_in_background: bool = True,
+) -> None:
+    """
+    Поднимает aiohttp-сервер и ждёт SIGTERM/SIGINT.
+    reuse_port — несколько процессов слушают один порт, ядро раздаёт соединения.
+    """
+
+    host = host or settings.webhook_host
+    port = port or settings.webhook_port
+
+    runner = web.AppRunner(build_webhook_app(bot, dp, settings, handle_in_background))
+    await runner.setup()
+
+    site = web.TCPSite(runner, host=host, port=port, reuse_port=reuse_port or None)
+    await site.start()
+    logger.info("Webhook server listening on %s:%s", host, port)
+
+    stop = stop_event()
+    try:
+        await stop.wait()
+    finally:
+        # cleanup дожидается запросов в полёте и вызывает shutdown диспетчера
+        await runner.cleanup()
@@ -0,0 +1,124 @@
+"""
+Бенчмарк FSM-хранилища: конкурентные get/set черновиков лидов.
+
+Каждый «пользователь» повторяет цикл мастера лида: get_state → update_data
+(черновик) → set_state → get_data → set_state(None). Сравниваются
+MemoryStorage, PostgresStorage без кэша и с кэшем.
+
+    python bench_fsm_storage.py --users 200 --rounds 20
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+import uuid
+
+from aiogram.fsm.storage.base import BaseStorage, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from sqlalchemy import delete
+
+from app.config import get_settings
+import app.database as db
+from app.fsm_storage import PostgresStorage, asyncpg_dsn
+from app.models import FsmRecord
+
+
+BOT_ID = 1
+BENCH_CHAT_OFFSET = -10**12
+
+
+def _draft(rng: random.Random) -> dict:
+    return {
+        "lead_draft": {
+            "id": str(uuid.uuid4()),
+            "name": "Анна Иванова",
+            "contact": f"+79{rng.randint(0, 999_999_999):09d}",
+            "contact_type": "phone",
+            "weight_kg": float(rng.randint(60, 160)),
+            "height_cm": float(rng.randint(150, 195)),
+            "bmi": 35.2,
+        },
+        "manager_id": str(uuid.uuid4()),
+    }
+
+
+async def _user_loop(
+    storage: BaseStorage,
+    user_id: int,
+    rounds: int,
+    rng: random.Random,
+    timings: list[float],
+) -> None:
+    key = StorageKey(bot_id=BOT_ID, chat_id=BENCH_CHAT_OFFSET - user_id, user_id=user_id)
+
+    for _ in range(rounds):
+        for operation in (
+            lambda: storage.get_state(key),
+            lambda: storage.update_data(key, _draft(rng)),
+            lambda: storage.set_state(key, "LeadFSM:waiting_manager"),
+            lambda: storage.get_state(key),
+            lambda: storage.get_data(key),
+            lambda: storage.set_state(key, None),
+        ):
+            started = time.perf_counter()
+            await operation()
+            timings.append((time.perf_counter() - started) * 1000)
+
+
+def _percentile(values: list[float], percent: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run(name: str, storage: BaseStorage, users: int, rounds: int, seed: int) -> None:
+    rng = random.Random(seed)
+    timings: list[float] = []
+
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(_user_loop(storage, user_id, rounds, rng, timings) for user_id in range(1, users + 1))
+    )
+    elapsed = time.perf_counter() - started
+
+    print(f"{name}")
+    print(f"  ops:  {len(timings)} in {elapsed:.2f}s = {len(timings) / elapsed:.0f} ops/s")
+    print(f"  mean: {statistics.mean(timings):.2f} ms")
+    print(f"  p50:  {_percentile(timings, 50):.2f} ms")
+    print(f"  p95:  {_percentile(timings, 95):.2f} ms")
+    print(f"  p99:  {_percentile(timings, 99):.2f} ms")
+    if isinstance(storage, PostgresStorage):
+        print(f"  cache hits/misses: {storage.cache_hits}/{storage.cache_misses}")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    settings = get_settings()
+    db.init_database(settings.database_url)
+    await db.create_tables()
+
+    await run("memory", MemoryStorage(), args.users, args.rounds, args.seed)
+
+    uncached = PostgresStorage(db.engine, cache_ttl=0)
+    await run("postgres, no cache", uncached, args.users, args.rounds, args.seed)
+
+    cached = PostgresStorage(db.engine, cache_ttl=settings.fsm_cache_ttl)
+    await cached.start_listener(asyncpg_dsn(settings.database_url))
+    await run("postgres, read-through cache", cached, args.users, args.rounds, args.seed)
+    await cached.close()
+
+    async with db.engine.begin() as connection:
+        await connection.execute(delete(FsmRecord).where(FsmRecord.key.like(f"{BOT_ID}:-%")))
+
+    await db.engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
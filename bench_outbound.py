@@ -0,0 +1,112 @@
+"""
+Проверка очереди исходящих сообщений на фейковом Bot API с flood-лимитами.
+
+Шлёт карточки лидов в несколько групп менеджеров двумя способами:
+напрямую через bot.send_message (как раньше в save_lead) и через
+OutboundQueue. Плюс серия правок одной карточки — проверка схлопывания.
+
+    python bench_outbound.py --groups 5 --messages 30
+"""
+
+import argparse
+import asyncio
+import time
+
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.exceptions import TelegramRetryAfter
+
+from app.outbound import OutboundQueue
+from fake_bot_api import FakeBotAPI
+
+
+TOKEN = "123456:BENCH"
+BASE_GROUP_ID = -1001000000000
+
+
+def _bot(port: int) -> Bot:
+    session = AiohttpSession(api=TelegramAPIServer.from_base(f"http://127.0.0.1:{port}"))
+    return Bot(token=TOKEN, session=session)
+
+
+async def direct(bot: Bot, groups: int, messages: int) -> tuple[int, int, float]:
+    async def send(chat_id: int, index: int) -> bool:
+        try:
+            await bot.send_message(chat_id, f"📥 Новый лид #{index}")
+            return True
+        except TelegramRetryAfter:
+            return False
+
+    started = time.perf_counter()
+    results = await asyncio.gather(
+        *(send(BASE_GROUP_ID - group, index) for group in range(groups) for index in range(messages))
+    )
+    return sum(results), len(results) - sum(results), time.perf_counter() - started
+
+
+async def queued(outbound: OutboundQueue, groups: int, messages: int) -> tuple[int, int, float]:
+    started = time.perf_counter()
+    futures = [
+        outbound.send_message(BASE_GROUP_ID - group, f"📥 Новый лид #{index}")
+        for group in range(groups)
+        for index in range(messages)
+    ]
+    results = await asyncio.gather(*futures, return_exceptions=True)
+    failed = sum(isinstance(result, Exception) for result in results)
+    return len(results) - failed, failed, time.perf_counter() - started
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--groups", type=int, default=5)
+    parser.add_argument("--messages", type=int, default=30, help="сообщений в каждую группу")
+    parser.add_argument("--edits", type=int, default=50)
+    parser.add_argument("--port", type=int, default=8081)
+    args = parser.parse_args()
+
+    total = args.groups * args.messages
+
+    api = FakeBotAPI(flood=True)
+    await api.start(port=args.port)
+    bot = _bot(args.port)
+
+    try:
+        delivered, failed, elapsed = await direct(bot, args.groups, args.messages)
+        print("direct bot.send_message")
+        print(f"  delivered: {delivered}/{total}, failed with 429: {failed}, {elapsed:.1f}s")
+
+        # новый фейковый сервер — окна лимитов с нуля
+        await api.stop()
+        api = FakeBotAPI(flood=True)
+        await api.start(port=args.port)
+
+        outbound = OutboundQueue(bot)
+        delivered, failed, elapsed = await queued(outbound, args.groups, args.messages)
+        print("OutboundQueue")
+        print(f"  delivered: {delivered}/{total}, failed: {failed}, {elapsed:.1f}s")
+        print(f"  429 from server: {api.flood_errors}, retries: {outbound.retries}")
+
+        chat_id = 555
+        edits_before = api.count("editMessageText")
+        futures = [
+            outbound.edit_message_text(chat_id, 1, f"🔄 Статус: {index}")
+            for index in range(args.edits)
+        ]
+        await asyncio.gather(*futures)
+        edits = api.count("editMessageText") - edits_before
+        final_text = next(
+            params["text"] for _, method, params in reversed(api.calls) if method == "editmessagetext"
+        )
+        print("edit coalescing")
+        print(f"  {args.edits} edits → {edits} API calls, coalesced: {outbound.coalesced}")
+        print(f"  final text: {final_text}")
+
+        await outbound.close()
+    finally:
+        await bot.session.close()
+        await api.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,139 @@
+"""
+Бенчмарк пула соединений: прямое подключение к Postgres против PgBouncer
+(transaction pooling) на нагрузке обработчиков бота.
+
+Один «апдейт» — как у выбора менеджера и клика по статусу: чтение FSM,
+активные менеджеры, лид по id, запись FSM (upsert + NOTIFY). Для PgBouncer
+прогоняются оба режима: без подготовленных запросов и, с --prepared,
+с уникальными именами (PgBouncer 1.21+, max_prepared_statements > 0).
+
+    python bench_pool.py --direct postgresql://bot@db:5432/crm \\
+        --pgbouncer postgresql://bot@pgbouncer:6432/crm --updates 5000 --concurrency 50
+    python bench_pool.py --pgbouncer ... --prepared --profile bot --no-warm-up
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+from aiogram.fsm.storage.base import StorageKey
+from sqlalchemy import delete, select
+
+import app.database as db
+from app.fsm_storage import PostgresStorage
+from app.models import FsmRecord, Lead, Manager
+
+
+BOT_ID = 2
+BENCH_CHAT_OFFSET = -10**12
+
+
+def _percentile(values: list[float], percent: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _asyncpg_url(url: str) -> str:
+    return url.replace("postgresql://", "postgresql+asyncpg://", 1)
+
+
+async def _update(storage: PostgresStorage, user_id: int, lead_ids: list[uuid.UUID], index: int) -> None:
+    key = StorageKey(bot_id=BOT_ID, chat_id=BENCH_CHAT_OFFSET - user_id, user_id=user_id)
+
+    await storage.get_state(key)
+    async with db.SessionLocal() as session:
+        await session.execute(select(Manager).where(Manager.active.is_(True)))
+        lead_id = lead_ids[index % len(lead_ids)] if lead_ids else uuid.UUID(int=0)
+        await session.execute(select(Lead).where(Lead.id == lead_id))
+    await storage.set_state(key, "LeadFSM:waiting_comment")
+
+
+async def run(
+    name: str,
+    url: str,
+    pool: db.PoolConfig,
+    updates: int,
+    concurrency: int,
+    warm_up: bool,
+) -> None:
+    db.pool_events.clear()
+    db.init_database(url, pool)
+    storage = PostgresStorage(db.engine, cache_ttl=0)
+
+    async with db.SessionLocal() as session:
+        result = await session.execute(select(Lead.id).limit(1000))
+        lead_ids = list(result.scalars().all())
+
+    if warm_up:
+        started = time.perf_counter()
+        await db.warm_up_pool()
+        print(f"{name}: warm-up {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    timings: list[float] = []
+    next_update = 0
+
+    async def user(user_id: int) -> None:
+        nonlocal next_update
+        while next_update < updates:
+            index = next_update
+            next_update += 1
+            started = time.perf_counter()
+            await _update(storage, user_id, lead_ids, index)
+            timings.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(user(user_id) for user_id in range(1, concurrency + 1)))
+    elapsed = time.perf_counter() - started
+
+    async with db.engine.begin() as connection:
+        await connection.execute(delete(FsmRecord).where(FsmRecord.key.like(f"{BOT_ID}:-%")))
+    await db.engine.dispose()
+
+    print(f"{name}")
+    print(f"  updates: {len(timings)} in {elapsed:.2f}s = {len(timings) / elapsed:.0f} updates/s")
+    print(f"  mean: {statistics.mean(timings):.2f} ms")
+    print(f"  p50:  {_percentile(timings, 50):.2f} ms")
+    print(f"  p95:  {_percentile(timings, 95):.2f} ms")
+    print(f"  p99:  {_percentile(timings, 99):.2f} ms")
+    print(f"  pool: {dict(db.pool_events)}")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--direct", help="DSN Postgres напрямую")
+    parser.add_argument("--pgbouncer", help="DSN PgBouncer (transaction pooling)")
+    parser.add_argument("--prepared", action="store_true", help="ещё прогон PgBouncer с именованными prepared statements")
+    parser.add_argument("--profile", default="bot", choices=sorted(db.POOL_PROFILES))
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--no-warm-up", action="store_true")
+    args = parser.parse_args()
+
+    if not args.direct and not args.pgbouncer:
+        raise SystemExit("Pass --direct and/or --pgbouncer")
+
+    profile = db.POOL_PROFILES[args.profile]
+    runs: list[tuple[str, str, db.PoolConfig]] = []
+    if args.direct:
+        runs.append(("direct", args.direct, db.PoolConfig(profile)))
+    if args.pgbouncer:
+        runs.append(("pgbouncer, no prepared statements", args.pgbouncer, db.PoolConfig(profile, pgbouncer=True)))
+        if args.prepared:
+            runs.append(
+                (
+                    "pgbouncer, named prepared statements",
+                    args.pgbouncer,
+                    db.PoolConfig(profile, pgbouncer=True, pgbouncer_prepared=True),
+                )
+            )
+
+    print(f"profile {args.profile}: {profile}, {args.updates} updates, concurrency {args.concurrency}")
+    for name, url, pool in runs:
+        await run(name, _asyncpg_url(url), pool, args.updates, args.concurrency, not args.no_warm_up)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,154 @@
+"""
+Бенчмарк /find: засевает синтетические лиды и меряет латентность поиска.
+
+    python bench_search.py --rows 1000000 --queries 500
+    python bench_search.py --skip-seed --queries 2000
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from app.config import get_settings
+import app.database as db
+from app.lead_search import search_leads
+
+
+FIRST_NAMES = [
+    "Анна", "Мария", "Елена", "Ольга", "Наталья", "Ирина", "Татьяна", "Светлана",
+    "Юлия", "Екатерина", "Алексей", "Дмитрий", "Сергей", "Андрей", "Иван", "Павел",
+]
+LAST_NAMES = [
+    "Иванова", "Смирнова", "Кузнецова", "Попова", "Васильева", "Петрова", "Соколова",
+    "Михайлова", "Новикова", "Федорова", "Морозова", "Волкова", "Алексеева", "Лебедева",
+]
+STATUSES = [
+    "new", "in_work", "callback_later", "no_answer",
+    "rejected", "consult_scheduled", "surgery_scheduled", "operated",
+]
+COLUMNS = [
+    "id", "created_at", "updated_at", "source", "name", "phone", "telegram_username",
+    "email", "weight_kg", "height_cm", "bmi", "lead_type", "manager_status",
+]
+
+
+def _synthetic_lead(rng: random.Random, now: datetime) -> tuple:
+    first = rng.choice(FIRST_NAMES)
+    last = rng.choice(LAST_NAMES)
+    created_at = now - timedelta(seconds=rng.randint(0, 365 * 24 * 3600))
+    weight = float(rng.randint(60, 160))
+    height = float(rng.randint(150, 195))
+
+    phone = f"+79{rng.randint(0, 999_999_999):09d}" if rng.random() < 0.7 else None
+    username = f"@{first.lower()}_{rng.randint(1000, 99999)}" if rng.random() < 0.3 else None
+    email = f"user{rng.randint(1, 10_000_000)}@example.com" if rng.random() < 0.2 else None
+
+    return (
+        uuid.uuid4(),
+        created_at,
+        created_at,
+        "bench",
+        f"{first} {last}",
+        phone,
+        username,
+        email,
+        weight,
+        height,
+        round(weight / ((height / 100) ** 2), 2),
+        "hot" if (phone or username or email) else "cold",
+        rng.choice(STATUSES),
+    )
+
+
+async def seed(rows: int, batch_size: int, rng: random.Random) -> None:
+    now = datetime.now(timezone.utc)
+
+    async with db.engine.connect() as connection:
+        raw = await connection.get_raw_connection()
+        driver = raw.driver_connection
+
+        inserted = 0
+        started = time.perf_counter()
+        while inserted < rows:
+            size = min(batch_size, rows - inserted)
+            records = [_synthetic_lead(rng, now) for _ in range(size)]
+            await driver.copy_records_to_table("leads", records=records, columns=COLUMNS)
+            inserted += size
+            print(f"seeded {inserted}/{rows}", end="\r", flush=True)
+
+        await connection.commit()
+        await driver.execute("ANALYZE leads")
+        print(f"\nseeded {rows} rows in {time.perf_counter() - started:.1f}s")
+
+
+def _random_query(rng: random.Random) -> str:
+    kind = rng.random()
+    if kind < 0.4:
+        return rng.choice(LAST_NAMES)[: rng.randint(3, 7)]
+    if kind < 0.7:
+        return f"9{rng.randint(10, 99)}{rng.randint(100, 999)}"
+    if kind < 0.85:
+        return f"@{rng.choice(FIRST_NAMES).lower()}_{rng.randint(10, 99)}"
+    return f"user{rng.randint(1, 99999)}"
+
+
+async def run_queries(count: int, rng: random.Random) -> list[float]:
+    timings: list[float] = []
+
+    async with db.SessionLocal() as session:
+        for _ in range(count):
+            query = _random_query(rng)
+            started = time.perf_counter()
+            _, cursor = await search_leads(session, query)
+            timings.append((time.perf_counter() - started) * 1000)
+
+            # вторая страница — проверяем и keyset-переход
+            if cursor is not None:
+                started = time.perf_counter()
+                await search_leads(session, query, after=cursor)
+                timings.append((time.perf_counter() - started) * 1000)
+
+    return timings
+
+
+def _percentile(values: list[float], percent: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--skip-seed", action="store_true")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    settings = get_settings()
+    db.init_database(settings.database_url)
+    await db.create_tables()
+
+    rng = random.Random(args.seed)
+
+    if not args.skip_seed:
+        await seed(args.rows, args.batch_size, rng)
+
+    timings = await run_queries(args.queries, rng)
+
+    print(f"searches: {len(timings)} (first pages + next pages)")
+    print(f"mean: {statistics.mean(timings):.2f} ms")
+    print(f"p50:  {_percentile(timings, 50):.2f} ms")
+    print(f"p95:  {_percentile(timings, 95):.2f} ms  (target < 50 ms)")
+    print(f"p99:  {_percentile(timings, 99):.2f} ms")
+
+    await db.engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,146 @@
+"""
+Бенчмарк старта бота и проверка на регрессии.
+
+1. `python -X importtime -c "import app.main"`: суммарное время импортов,
+   самые тяжёлые модули и контроль, что gspread/google-auth/PIL/pytesseract
+   не импортируются на старте.
+2. time-to-first-update: `python -m app.main` против фейкового Bot API
+   (fake_bot_api.py); апдейт /start лежит в очереди с момента запуска,
+   засекается ответ бота. Окружение (база) — как у бота.
+
+    python bench_startup.py --runs 3
+    python bench_startup.py --save-baseline startup_baseline.json
+    python bench_startup.py --baseline startup_baseline.json --tolerance 0.2
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from fake_bot_api import FakeBotAPI
+
+
+TOKEN = "123456:BENCH"
+CHAT_ID = 777000
+
+# не должны импортироваться до первого обращения к сервису
+DEFERRED_MODULES = ("gspread", "google.oauth2", "PIL", "pytesseract", "openpyxl")
+
+
+def _env(api_port: int) -> dict[str, str]:
+    env = {
+        **os.environ,
+        "BOT_TOKEN": TOKEN,
+        "RUN_MODE": "polling",
+        "SHARD_WORKERS": "0",
+        "TELEGRAM_API_URL": f"http://127.0.0.1:{api_port}",
+        "LOG_LEVEL": "WARNING",
+    }
+    return env
+
+
+def measure_imports() -> tuple[float, list[tuple[float, str]], list[str]]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        env={**os.environ, "BOT_TOKEN": TOKEN},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    total_us = 0
+    top_level: list[tuple[float, str]] = []
+    imported: list[str] = []
+
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, module = line.split(":", 1)[1].split("|")
+        total_us += int(self_us)
+        imported.append(module.strip())
+
+        # вложенность в выводе importtime — по два пробела на уровень
+        if len(module) - len(module.lstrip(" ")) <= 1:
+            top_level.append((int(cumulative_us) / 1000, module.strip()))
+
+    top_level.sort(reverse=True)
+    eager = [
+        module for module in imported
+        if any(module == deferred or module.startswith(deferred + ".") for deferred in DEFERRED_MODULES)
+    ]
+    return total_us / 1000, top_level, eager
+
+
+async def measure_first_update(api_port: int) -> float:
+    api = FakeBotAPI()
+    await api.start(port=api_port)
+    # апдейт ждёт в getUpdates с самого старта, как после рестарта в проде
+    api.push_update(api.message_update(CHAT_ID, "/start"))
+
+    started = time.perf_counter()
+    bot = subprocess.Popen([sys.executable, "-m", "app.main"], env=_env(api_port))
+
+    try:
+        deadline = time.monotonic() + 120
+        while not api.calls_by_chat.get(CHAT_ID):
+            if time.monotonic() > deadline or bot.poll() is not None:
+                raise RuntimeError("bot did not answer the first update")
+            await asyncio.sleep(0.01)
+        return (api.calls_by_chat[CHAT_ID][0][0] - started) * 1000
+    finally:
+        bot.terminate()
+        bot.wait(timeout=30)
+        await api.stop()
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--api-port", type=int, default=8081)
+    parser.add_argument("--baseline", help="JSON с прошлым результатом для сравнения")
+    parser.add_argument("--save-baseline", help="записать результат в JSON")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="допустимый рост, доля")
+    args = parser.parse_args()
+
+    import_runs = [measure_imports() for _ in range(args.runs)]
+    import_ms = statistics.median(run[0] for run in import_runs)
+    _, top_level, eager = import_runs[-1]
+
+    print(f"imports: {import_ms:.0f} ms (median of {args.runs})")
+    for cumulative_ms, module in top_level[:15]:
+        print(f"  {cumulative_ms:8.1f} ms  {module}")
+    if eager:
+        print(f"  eagerly imported heavy modules: {', '.join(sorted(set(eager)))}")
+
+    first_update_runs = [await measure_first_update(args.api_port) for _ in range(args.runs)]
+    first_update_ms = statistics.median(first_update_runs)
+    print(f"time to first update: {first_update_ms:.0f} ms (median of {args.runs})")
+
+    result = {"import_ms": round(import_ms, 1), "first_update_ms": round(first_update_ms, 1)}
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as file:
+            json.dump(result, file, indent=2)
+        print(f"baseline saved to {args.save_baseline}")
+
+    failed = bool(eager)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            baseline = json.load(file)
+        for key, value in result.items():
+            limit = baseline[key] * (1 + args.tolerance)
+            status = "OK" if value <= limit else "REGRESSION"
+            failed = failed or value > limit
+            print(f"{key}: {value} vs baseline {baseline[key]} (limit {limit:.1f}) {status}")
+
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,169 @@
+"""
+Нагрузочный тест приёма апдейтов: webhook против polling.
+
+Поднимает фейковый Bot API (fake_bot_api.py), запускает `python -m app.main`
+в нужном режиме и шлёт синтетические /chatid от разных чатов. Ответ бота
+в чат — конец пути апдейта. Остальное окружение (база, Google) — как у бота.
+
+    python bench_webhook.py --updates 2000 --concurrency 50
+    python bench_webhook.py --mode webhook --workers 4
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import aiohttp
+
+from fake_bot_api import FakeBotAPI
+
+
+TOKEN = "123456:BENCH"
+SECRET = "bench-secret"
+BASE_CHAT_ID = 10_000_000
+
+
+def _percentile(values: list[float], percent: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _start_bot(mode: str, api_port: int, web_port: int, workers: int) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "BOT_TOKEN": TOKEN,
+        "RUN_MODE": mode,
+        "TELEGRAM_API_URL": f"http://127.0.0.1:{api_port}",
+        "WEBHOOK_BASE_URL": f"http://127.0.0.1:{web_port}",
+        "WEBHOOK_PORT": str(web_port),
+        "WEBHOOK_SECRET": SECRET,
+        "WEBHOOK_WORKERS": str(workers),
+        "JOB_WORKERS": "0",
+        "LOG_LEVEL": "WARNING",
+    }
+    env.pop("PORT", None)
+    return subprocess.Popen([sys.executable, "-m", "app.main"], env=env)
+
+
+async def _wait_ready(api: FakeBotAPI, mode: str, web_port: int, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as http:
+        while time.monotonic() < deadline:
+            if mode == "polling" and api.count("getUpdates"):
+                return
+            if mode == "webhook" and api.count("setWebhook"):
+                try:
+                    async with http.get(f"http://127.0.0.1:{web_port}/healthz") as response:
+                        if response.status == 200:
+                            return
+                except aiohttp.ClientError:
+                    pass
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"bot did not start in {mode} mode within {timeout:.0f}s")
+
+
+async def _send_webhook(
+    api: FakeBotAPI,
+    web_port: int,
+    updates: int,
+    concurrency: int,
+) -> tuple[dict[int, float], int, float]:
+    url = f"http://127.0.0.1:{web_port}/telegram/webhook"
+    headers = {"X-Telegram-Bot-Api-Secret-Token": SECRET}
+    sent_at: dict[int, float] = {}
+    accepted = 0
+    queue: asyncio.Queue[int] = asyncio.Queue()
+    for index in range(updates):
+        queue.put_nowait(BASE_CHAT_ID + index)
+
+    async def sender(http: aiohttp.ClientSession) -> None:
+        nonlocal accepted
+        while not queue.empty():
+            chat_id = queue.get_nowait()
+            sent_at[chat_id] = time.perf_counter()
+            async with http.post(url, json=api.message_update(chat_id, "/chatid"), headers=headers) as response:
+                if response.status == 200:
+                    accepted += 1
+
+    started = time.perf_counter()
+    async with aiohttp.ClientSession() as http:
+        await asyncio.gather(*(sender(http) for _ in range(concurrency)))
+    return sent_at, accepted, time.perf_counter() - started
+
+
+async def _send_polling(api: FakeBotAPI, updates: int) -> tuple[dict[int, float], int, float]:
+    sent_at: dict[int, float] = {}
+    started = time.perf_counter()
+    for index in range(updates):
+        chat_id = BASE_CHAT_ID + index
+        sent_at[chat_id] = time.perf_counter()
+        api.push_update(api.message_update(chat_id, "/chatid"))
+
+    # «принят» = забран ботом через getUpdates
+    while api._updates and time.perf_counter() - started < 120:
+        await asyncio.sleep(0.01)
+    return sent_at, updates - len(api._updates), time.perf_counter() - started
+
+
+async def run_mode(mode: str, args: argparse.Namespace) -> None:
+    api = FakeBotAPI()
+    await api.start(port=args.api_port)
+    bot = _start_bot(mode, args.api_port, args.web_port, args.workers)
+
+    try:
+        await _wait_ready(api, mode, args.web_port)
+
+        if mode == "webhook":
+            sent_at, accepted, intake = await _send_webhook(api, args.web_port, args.updates, args.concurrency)
+        else:
+            sent_at, accepted, intake = await _send_polling(api, args.updates)
+
+        deadline = time.monotonic() + args.timeout
+        while time.monotonic() < deadline:
+            if all(api.calls_by_chat.get(chat_id) for chat_id in sent_at):
+                break
+            await asyncio.sleep(0.05)
+
+        latencies = [
+            (api.calls_by_chat[chat_id][0][0] - sent) * 1000
+            for chat_id, sent in sent_at.items()
+            if api.calls_by_chat.get(chat_id)
+        ]
+    finally:
+        bot.terminate()
+        bot.wait(timeout=30)
+        await api.stop()
+
+    print(f"{mode} (workers={args.workers if mode == 'webhook' else 1})")
+    print(f"  accepted: {accepted}/{args.updates} in {intake:.2f}s = {accepted / intake:.0f} updates/s")
+    print(f"  answered: {len(latencies)}/{args.updates}")
+    if latencies:
+        print(f"  e2e p50:  {_percentile(latencies, 50):.1f} ms")
+        print(f"  e2e p95:  {_percentile(latencies, 95):.1f} ms")
+        print(f"  e2e p99:  {_percentile(latencies, 99):.1f} ms")
+        print(f"  e2e mean: {statistics.mean(latencies):.1f} ms")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--mode", choices=("both", "webhook", "polling"), default="both")
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=1, help="WEBHOOK_WORKERS")
+    parser.add_argument("--api-port", type=int, default=8081)
+    parser.add_argument("--web-port", type=int, default=8088)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    args = parser.parse_args()
+
+    modes = ("polling", "webhook") if args.mode == "both" else (args.mode,)
+    for mode in modes:
+        await run_mode(mode, args)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,65 @@
+"""
+Выгрузка лидов в gzip CSV или XLSX из командной строки.
+
+    python export_leads.py --format csv --output ./exports
+    python export_leads.py --format xlsx --status rejected,operated --from 2026-01-01 --to 2026-03-31
+    python export_leads.py --manager "Марина" --archive
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+from app.config import get_settings
+import app.database as db
+from app.export_service import export_leads, find_manager_id, parse_export_args
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--format", choices=("csv", "xlsx"), default="csv")
+    parser.add_argument("--status", help="статусы через запятую")
+    parser.add_argument("--manager", help="имя менеджера")
+    parser.add_argument("--from", dest="date_from", help="YYYY-MM-DD")
+    parser.add_argument("--to", dest="date_to", help="YYYY-MM-DD, включительно")
+    parser.add_argument("--archive", action="store_true", help="включить архивные лиды")
+    parser.add_argument("--output", default=".")
+    args = parser.parse_args()
+
+    # тот же формат аргументов, что и у /export в боте
+    tokens = [args.format]
+    if args.status:
+        tokens.append(f"status={args.status}")
+    if args.date_from:
+        tokens.append(f"from={args.date_from}")
+    if args.date_to:
+        tokens.append(f"to={args.date_to}")
+    if args.archive:
+        tokens.append("archive")
+    file_format, filters, _ = parse_export_args(tokens)
+
+    settings = get_settings()
+    filters.timezone = settings.stats_timezone
+    db.init_database(settings.database_url)
+
+    os.makedirs(args.output, exist_ok=True)
+
+    async with db.SessionLocal() as session:
+        if args.manager:
+            filters.manager_id = await find_manager_id(session, args.manager)
+            if filters.manager_id is None:
+                raise SystemExit(f"Менеджер «{args.manager}» не найден.")
+
+        started = time.perf_counter()
+        paths, rows = await export_leads(session, filters, args.output, file_format)
+
+    print(f"Выгружено лидов: {rows} за {time.perf_counter() - started:.1f}s")
+    for path in paths:
+        print(f"  {path} ({os.path.getsize(path) / 1024 / 1024:.1f} МБ)")
+
+    await db.engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
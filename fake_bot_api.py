@@ -0,0 +1,285 @@
+"""
+Фейковый Telegram Bot API для нагрузочных тестов и бенчмарков.
+
+Бот направляется сюда через TELEGRAM_API_URL=http://127.0.0.1:<port>.
+Сервер отвечает на вызовы методов правдоподобными объектами, отдаёт
+апдейты через getUpdates, раздаёт файлы и записывает все вызовы.
+С --flood имитирует лимиты Telegram и отвечает 429 с retry_after.
+
+    python fake_bot_api.py --port 8081
+    python fake_bot_api.py --flood
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from collections import defaultdict
+from typing import Any, Optional
+
+from aiohttp import web
+
+
+FLOOD_METHODS = {"sendmessage", "editmessagetext", "senddocument"}
+
+BOT_USER = {"id": 123456, "is_bot": True, "first_name": "Fake", "username": "fake_crm_bot"}
+
+
+def _param(value: Any) -> Any:
+    # сложные параметры aiogram передаёт JSON-строками
+    if isinstance(value, str) and value[:1] in "{[":
+        try:
+            return json.loads(value)
+        except ValueError:
+            return value
+    return value
+
+
+class FakeBotAPI:
+    def __init__(
+        self,
+        file_bytes: bytes = b"",
+        latency: float = 0.0,
+        flood: bool = False,
+    ) -> None:
+        self.file_bytes = file_bytes
+        self.files: dict[str, bytes] = {}
+        self.latency = latency
+        self.flood = flood
+        self.flood_errors = 0
+        self._chat_sends: dict[int, list[float]] = defaultdict(list)
+        self._global_sends: list[float] = []
+        self.calls: list[tuple[float, str, dict[str, Any]]] = []
+        self.calls_by_chat: dict[int, list[tuple[float, str]]] = defaultdict(list)
+        self._updates: list[dict[str, Any]] = []
+        self._update_id = 0
+        self._message_id = 0
+        self._new_updates = asyncio.Event()
+        self._runner: Optional[web.AppRunner] = None
+
+    # =========================================================
+    # UPDATES
+    # =========================================================
+
+    def _next_update_id(self) -> int:
+        self._update_id += 1
+        return self._update_id
+
+    def message_update(self, chat_id: int, text: str, user_id: Optional[int] = None) -> dict[str, Any]:
+        user_id = user_id or chat_id
+        return {
+            "update_id": self._next_update_id(),
+            "message": {
+                "message_id": self._next_message_id(),
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "from": {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"},
+                "text": text,
+                "entities": (
+                    [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+                    if text.startswith("/") else None
+                ),
+            },
+        }
+
+    def photo_update(self, chat_id: int, file_id: str, user_id: Optional[int] = None) -> dict[str, Any]:
+        user_id = user_id or chat_id
+        return {
+            "update_id": self._next_update_id(),
+            "message": {
+                "message_id": self._next_message_id(),
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "from": {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"},
+                "photo": [
+                    {
+                        "file_id": file_id,
+                        "file_unique_id": file_id,
+                        "width": 1080,
+                        "height": 2340,
+                        "file_size": len(self._file(file_id)),
+                    }
+                ],
+            },
+        }
+
+    def callback_update(
+        self,
+        chat_id: int,
+        message_id: int,
+        data: str,
+        user_id: Optional[int] = None,
+    ) -> dict[str, Any]:
+        user_id = user_id or chat_id
+        return {
+            "update_id": self._next_update_id(),
+            "callback_query": {
+                "id": str(self._update_id),
+                "chat_instance": str(chat_id),
+                "from": {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"},
+                "data": data,
+                "message": {
+                    "message_id": message_id,
+                    "date": int(time.time()),
+                    "chat": {"id": chat_id, "type": "private"},
+                    "text": "card",
+                },
+            },
+        }
+
+    def add_file(self, file_id: str, data: bytes) -> None:
+        """Свой файл для file_id; остальные file_id отдают file_bytes."""
+
+        self.files[file_id] = data
+
+    def _file(self, file_id: str) -> bytes:
+        return self.files.get(file_id, self.file_bytes)
+
+    def push_update(self, update: dict[str, Any]) -> None:
+        """Кладёт апдейт в очередь getUpdates (режим polling)."""
+
+        self._updates.append(update)
+        self._new_updates.set()
+
+    # =========================================================
+    # METHODS
+    # =========================================================
+
+    def _next_message_id(self) -> int:
+        self._message_id += 1
+        return self._message_id
+
+    def _message(self, params: dict[str, Any], **extra: Any) -> dict[str, Any]:
+        chat_id = int(params.get("chat_id", 0))
+        return {
+            "message_id": int(params.get("message_id") or self._next_message_id()),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private" if chat_id > 0 else "group"},
+            "from": BOT_USER,
+            "text": params.get("text"),
+            **extra,
+        }
+
+    async def _get_updates(self, params: dict[str, Any]) -> list[dict[str, Any]]:
+        offset = int(params.get("offset", 0))
+        timeout = float(params.get("timeout", 0))
+        limit = int(params.get("limit", 100))
+
+        self._updates = [update for update in self._updates if update["update_id"] >= offset]
+        if not self._updates and timeout:
+            self._new_updates.clear()
+            try:
+                await asyncio.wait_for(self._new_updates.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self._updates[:limit]
+
+    async def _result(self, method: str, params: dict[str, Any]) -> Any:
+        if method == "getme":
+            return BOT_USER
+        if method == "getupdates":
+            return await self._get_updates(params)
+        if method in ("sendmessage", "editmessagetext"):
+            return self._message(params)
+        if method == "senddocument":
+            return self._message(params, document={"file_id": "doc", "file_unique_id": "doc"})
+        if method == "getfile":
+            return {
+                "file_id": params.get("file_id"),
+                "file_unique_id": params.get("file_id"),
+                "file_size": len(self._file(str(params.get("file_id")))),
+                "file_path": f"photos/{params.get('file_id')}.jpg",
+            }
+        return True
+
+    def _retry_after(self, chat_id: int) -> int:
+        """Упрощённые лимиты Telegram: 1/s в личку, 20/min в группу, 30/s всего."""
+
+        now = time.monotonic()
+        self._global_sends = [sent for sent in self._global_sends if now - sent < 1]
+        if len(self._global_sends) >= 30:
+            return 1
+
+        window, limit = (60, 20) if chat_id < 0 else (1, 1)
+        sends = [sent for sent in self._chat_sends[chat_id] if now - sent < window]
+        self._chat_sends[chat_id] = sends
+        if len(sends) >= limit:
+            return max(1, int(window - (now - sends[0])) + 1)
+
+        sends.append(now)
+        self._global_sends.append(now)
+        return 0
+
+    async def _handle_method(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"].lower()
+        params = {key: _param(value) for key, value in (await request.post()).items()}
+
+        received = time.perf_counter()
+        self.calls.append((received, method, params))
+        if "chat_id" in params:
+            self.calls_by_chat[int(params["chat_id"])].append((received, method))
+
+        if self.latency and method != "getupdates":
+            await asyncio.sleep(self.latency)
+
+        if self.flood and method in FLOOD_METHODS:
+            retry_after = self._retry_after(int(params.get("chat_id", 0)))
+            if retry_after:
+                self.flood_errors += 1
+                return web.json_response(
+                    {
+                        "ok": False,
+                        "error_code": 429,
+                        "description": f"Too Many Requests: retry after {retry_after}",
+                        "parameters": {"retry_after": retry_after},
+                    },
+                    status=429,
+                )
+
+        return web.json_response({"ok": True, "result": await self._result(method, params)})
+
+    async def _handle_file(self, request: web.Request) -> web.Response:
+        file_id = request.match_info["path"].rsplit("/", 1)[-1].rsplit(".", 1)[0]
+        return web.Response(body=self._file(file_id))
+
+    # =========================================================
+    # SERVER
+    # =========================================================
+
+    def app(self) -> web.Application:
+        app = web.Application(client_max_size=50 * 1024 * 1024)
+        app.router.add_post("/bot{token}/{method}", self._handle_method)
+        app.router.add_get("/file/bot{token}/{path:.+}", self._handle_file)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8081) -> None:
+        self._runner = web.AppRunner(self.app())
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def count(self, method: str) -> int:
+        method = method.lower()
+        return sum(1 for _, name, _ in self.calls if name == method)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.0, help="задержка ответа, с")
+    parser.add_argument("--flood", action="store_true", help="имитировать flood-лимиты")
+    args = parser.parse_args()
+
+    api = FakeBotAPI(latency=args.latency, flood=args.flood)
+    await api.start(args.host, args.port)
+    print(f"Fake Bot API on http://{args.host}:{args.port}")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,299 @@
+"""
+Сквозной нагрузочный тест конвейера лидов без Telegram и Google.
+
+Синтетические апдейты идут через настоящие Dispatcher и router
+(build_dispatcher из app.main, dp.feed_update): скриншот из корпуса →
+выбор менеджера → комментарий → клик по статусу. Bot направлен в
+фейковый Bot API (fake_bot_api.py), база — локальный Postgres из
+DATABASE_URL/DB_*, Google Sheets заменён заглушкой с задержкой.
+
+Лиды пишутся в базу по-настоящему — запускать на тестовой базе,
+в которой есть хотя бы один активный менеджер (seed_managers.py).
+
+    python loadtest.py --corpus screenshots/ --leads 200 --concurrency 20
+    python loadtest.py --corpus screenshots/ --save-baseline loadtest_baseline.json
+    python loadtest.py --corpus screenshots/ --baseline loadtest_baseline.json --tolerance 0.2
+"""
+
+import argparse
+import asyncio
+import dataclasses
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Optional
+
+from aiogram import Bot, Dispatcher
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.types import Update
+from sqlalchemy import select
+
+import app.database as db
+from app.config import get_settings
+from app.fsm_storage import build_fsm_storage
+from app.lead_pipeline import LeadFSM
+from app.main import build_dispatcher, create_bot
+from app.models import Manager
+from app.sheets_service import SheetsService
+from fake_bot_api import FakeBotAPI
+
+
+TOKEN = "123456:LOADTEST"
+BASE_CHAT_ID = 500000
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".webp"}
+# сколько ждать, пока воркер очереди дойдёт до фото
+PIPELINE_TIMEOUT = 120
+
+STEPS = ("process_lead_photo", "photo_pipeline", "choose_manager", "save_lead", "update_lead_status")
+
+
+class StubSheetsService(SheetsService):
+    """Google Sheets без сети: только задержка, как у настоящего запроса."""
+
+    def __init__(self, latency: float) -> None:
+        super().__init__(service_account_json="", master_sheet_id="loadtest")
+        self.latency = latency
+        self.calls = 0
+
+    async def _request(self) -> None:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+
+    async def warm_up(self) -> None:
+        return None
+
+    async def append_to_master(self, lead_data: dict[str, Any], skip_existing: bool = False) -> None:
+        await self._request()
+
+    async def append_to_manager_sheet(
+        self,
+        manager_sheet_id: str,
+        lead_data: dict[str, Any],
+        skip_existing: bool = False,
+    ) -> None:
+        await self._request()
+
+    async def append_many_to_master(self, leads_data: list[dict[str, Any]]) -> None:
+        await self._request()
+
+    async def append_many_to_manager_sheet(self, manager_sheet_id: str, leads_data: list[dict[str, Any]]) -> None:
+        await self._request()
+
+    async def update_status_in_sheet(self, sheet_id: str, lead_id: str, new_status: str) -> None:
+        await self._request()
+
+    async def update_statuses_in_sheet(self, sheet_id: str, statuses: dict[str, str]) -> None:
+        await self._request()
+
+
+def _percentile(values: list[float], percent: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(percent / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def _peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:
+        # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux отдаёт килобайты, macOS — байты
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class LoadTest:
+    def __init__(
+        self,
+        bot: Bot,
+        dp: Dispatcher,
+        api: FakeBotAPI,
+        file_ids: list[str],
+        manager_ids: list[str],
+    ) -> None:
+        self.bot = bot
+        self.dp = dp
+        self.api = api
+        self.file_ids = file_ids
+        self.manager_ids = manager_ids
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.completed = 0
+        self.failed = 0
+        self._next_lead = 0
+
+    async def _feed(self, step: str, update: dict[str, Any]) -> None:
+        started = time.perf_counter()
+        await self.dp.feed_update(self.bot, Update.model_validate(update, context={"bot": self.bot}))
+        self.latencies[step].append((time.perf_counter() - started) * 1000)
+
+    async def _wait_for_card(self, key: StorageKey) -> bool:
+        """Фото разбирает воркер очереди — ждём черновик в FSM."""
+
+        deadline = time.monotonic() + PIPELINE_TIMEOUT
+        while time.monotonic() < deadline:
+            if await self.dp.storage.get_state(key) == LeadFSM.waiting_manager.state:
+                return True
+            await asyncio.sleep(0.02)
+        return False
+
+    async def _lead(self, chat_id: int, index: int) -> None:
+        key = StorageKey(bot_id=self.bot.id, chat_id=chat_id, user_id=chat_id)
+        file_id = self.file_ids[index % len(self.file_ids)]
+        manager_id = self.manager_ids[index % len(self.manager_ids)]
+
+        started = time.perf_counter()
+        await self._feed("process_lead_photo", self.api.photo_update(chat_id, file_id))
+        if not await self._wait_for_card(key):
+            # OCR не нашёл текста или воркер не успел
+            self.failed += 1
+            return
+        self.latencies["photo_pipeline"].append((time.perf_counter() - started) * 1000)
+
+        await self._feed("choose_manager", self.api.callback_update(chat_id, 1, f"manager:{manager_id}"))
+
+        data = await self.dp.storage.get_data(key)
+        lead_id = data["lead_draft"]["id"]
+        await self._feed("save_lead", self.api.message_update(chat_id, f"нагрузочный тест #{index}"))
+
+        await self._feed(
+            "update_lead_status",
+            self.api.callback_update(chat_id, 1, f"status:{lead_id}:in_work"),
+        )
+        self.completed += 1
+
+    async def _user(self, chat_id: int, total: int) -> None:
+        # у каждого пользователя свой FSM — лиды одного чата строго по очереди
+        while self._next_lead < total:
+            index = self._next_lead
+            self._next_lead += 1
+            try:
+                await self._lead(chat_id, index)
+            except Exception as e:
+                self.failed += 1
+                print(f"lead #{index} failed: {type(e).__name__}: {e}", file=sys.stderr)
+
+    async def run(self, leads: int, concurrency: int) -> float:
+        started = time.perf_counter()
+        await asyncio.gather(
+            *(self._user(BASE_CHAT_ID + user, leads) for user in range(concurrency))
+        )
+        return time.perf_counter() - started
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--corpus", required=True, help="каталог со скриншотами заявок")
+    parser.add_argument("--leads", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=10, help="одновременных пользователей")
+    parser.add_argument("--api-port", type=int, default=8081)
+    parser.add_argument("--api-latency", type=float, default=0.05, help="задержка Bot API, с")
+    parser.add_argument("--sheets-latency", type=float, default=0.3, help="задержка Google Sheets, с")
+    parser.add_argument("--baseline", help="JSON с прошлым результатом для сравнения")
+    parser.add_argument("--save-baseline", help="записать результат в JSON")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="допустимое ухудшение, доля")
+    args = parser.parse_args()
+
+    images = sorted(path for path in Path(args.corpus).iterdir() if path.suffix.lower() in IMAGE_SUFFIXES)
+    if not images:
+        raise SystemExit(f"No screenshots in {args.corpus}")
+
+    api = FakeBotAPI(latency=args.api_latency)
+    file_ids = []
+    for index, path in enumerate(images):
+        file_id = f"corpus{index}"
+        api.add_file(file_id, path.read_bytes())
+        file_ids.append(file_id)
+    await api.start(port=args.api_port)
+
+    os.environ.setdefault("BOT_TOKEN", TOKEN)
+    settings = dataclasses.replace(
+        get_settings(),
+        bot_token=TOKEN,
+        telegram_api_url=f"http://127.0.0.1:{args.api_port}",
+        metrics_port=0,
+    )
+
+    db.init_database(settings.database_url)
+    await db.create_tables()
+
+    async with db.SessionLocal() as session:
+        result = await session.execute(select(Manager.id).where(Manager.active.is_(True)))
+        manager_ids = [str(manager_id) for manager_id in result.scalars().all()]
+    if not manager_ids:
+        raise SystemExit("No active managers in the database, run seed_managers.py first")
+
+    bot = create_bot(settings)
+    storage = await build_fsm_storage(settings, db.engine)
+    sheets_service = StubSheetsService(args.sheets_latency)
+    dp = build_dispatcher(settings, bot, storage, sheets_service=sheets_service)
+    background_tasks = dp["job_queue"].start_workers(settings.job_workers)
+
+    test = LoadTest(bot, dp, api, file_ids, manager_ids)
+    try:
+        elapsed = await test.run(args.leads, args.concurrency)
+    finally:
+        for task in background_tasks:
+            task.cancel()
+        await asyncio.gather(*background_tasks, return_exceptions=True)
+        await dp["outbound"].close()
+        dp["bulk_import"].close()
+        await storage.close()
+        await bot.session.close()
+        await api.stop()
+        await db.engine.dispose()
+
+    leads_per_min = test.completed / elapsed * 60 if elapsed else 0.0
+    peak_rss = _peak_rss_mb()
+
+    print(
+        f"leads: {test.completed} done, {test.failed} failed in {elapsed:.1f}s "
+        f"at concurrency {args.concurrency}"
+    )
+    print(f"throughput: {leads_per_min:.1f} leads/min")
+    print(f"{'step':<22}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'n':>7}")
+    result: dict[str, float] = {"leads_per_min": round(leads_per_min, 1)}
+    for step in STEPS:
+        values = test.latencies.get(step, [])
+        p50, p95, p99 = (_percentile(values, percent) for percent in (50, 95, 99))
+        print(f"{step:<22}{p50:>10.1f}{p95:>10.1f}{p99:>10.1f}{len(values):>7}")
+        result[f"{step}_p95_ms"] = round(p95, 1)
+    if peak_rss is not None:
+        print(f"peak RSS: {peak_rss:.0f} MB")
+        result["peak_rss_mb"] = round(peak_rss, 1)
+    print(f"Bot API calls: {len(api.calls)}, Sheets calls: {sheets_service.calls}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as file:
+            json.dump(result, file, indent=2)
+        print(f"baseline saved to {args.save_baseline}")
+
+    failed = False
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            baseline = json.load(file)
+        for key, value in result.items():
+            if key not in baseline:
+                continue
+            # пропускная способность должна не падать, остальное — не расти
+            if key == "leads_per_min":
+                limit = baseline[key] * (1 - args.tolerance)
+                regression = value < limit
+            else:
+                limit = baseline[key] * (1 + args.tolerance)
+                regression = value > limit
+            failed = failed or regression
+            status = "REGRESSION" if regression else "OK"
+            print(f"{key}: {value} vs baseline {baseline[key]} (limit {limit:.1f}) {status}")
+
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,74 @@
+"""
+Однократный перевод существующей таблицы leads на секционирование по created_at.
+
+Старая таблица переименовывается в leads_unpartitioned и остаётся в базе:
+после проверки её можно удалить вручную (DROP TABLE leads_unpartitioned).
+
+    python migrate_partition_leads.py
+"""
+
+import asyncio
+
+from sqlalchemy import text
+
+from app.config import get_settings
+import app.database as db
+from app.models import Lead
+from app.partitions import ensure_partitions
+
+
+async def migrate() -> None:
+    settings = get_settings()
+    db.init_database(settings.database_url)
+
+    async with db.engine.begin() as connection:
+        result = await connection.execute(
+            text("SELECT relkind FROM pg_class WHERE relname = 'leads' AND relnamespace = 'public'::regnamespace")
+        )
+        relkind = result.scalar_one_or_none()
+
+        if relkind is None:
+            print("Таблицы leads нет — create_tables() создаст её сразу секционированной.")
+            return
+        if relkind == "p":
+            print("leads уже секционирована.")
+            return
+
+        await connection.execute(text("ALTER TABLE leads RENAME TO leads_unpartitioned"))
+        await connection.execute(
+            text("ALTER TABLE leads_unpartitioned RENAME CONSTRAINT leads_pkey TO leads_unpartitioned_pkey")
+        )
+        # имена индексов глобальны в схеме — освобождаем их для новой таблицы
+        for index in Lead.__table__.indexes:
+            await connection.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+
+    # создаём секционированную leads, секции с самого старого лида
+    await db.create_tables()
+
+    async with db.engine.begin() as connection:
+        result = await connection.execute(text("SELECT min(created_at) FROM leads_unpartitioned"))
+        oldest = result.scalar_one_or_none()
+
+        if oldest is not None:
+            await ensure_partitions(connection, "leads", since=oldest.date())
+
+        columns = ", ".join(column.name for column in Lead.__table__.columns)
+        result = await connection.execute(
+            text(f"INSERT INTO leads ({columns}) SELECT {columns} FROM leads_unpartitioned")
+        )
+        await connection.execute(text("ANALYZE leads"))
+
+        # лиды с датами позже созданных секций легли в DEFAULT — их разнесёт
+        # обслуживание секций, когда дойдёт до их периода
+        defaults = await connection.execute(text("SELECT count(*) FROM leads_default"))
+        in_default = defaults.scalar_one()
+
+    print(f"Перенесено лидов: {result.rowcount}. Старая таблица: leads_unpartitioned.")
+    if in_default:
+        print(f"В leads_default: {in_default} — будут перенесены в секции при обслуживании.")
+
+    await db.engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
@@ -0,0 +1,6 @@
+import sys
+from pathlib import Path
+
+
+# тесты запускаются и как `pytest`, и как `python -m pytest` из корня репозитория
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
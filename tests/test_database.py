@@ -0,0 +1,65 @@
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+
+from app.database import POOL_PROFILES, PoolConfig, _caches_statements, _connect_args, pool_config
+
+
+PROFILE = POOL_PROFILES["bot"]
+
+
+def test_direct_connection_keeps_statement_cache():
+    args = _connect_args(PoolConfig(PROFILE))
+
+    assert args == {"ssl": None}
+    assert _caches_statements(PoolConfig(PROFILE))
+
+
+def test_pgbouncer_without_prepared_disables_caches_and_names_uniquely():
+    pool = PoolConfig(PROFILE, pgbouncer=True)
+    args = _connect_args(pool)
+
+    assert args["statement_cache_size"] == 0
+    assert args["prepared_statement_cache_size"] == 0
+    name = args["prepared_statement_name_func"]
+    assert name() != name()
+    assert name().startswith("__asyncpg_")
+    assert not _caches_statements(pool)
+
+
+def test_pgbouncer_prepared_keeps_caches_with_unique_names():
+    pool = PoolConfig(PROFILE, pgbouncer=True, pgbouncer_prepared=True)
+    args = _connect_args(pool)
+
+    assert "statement_cache_size" not in args
+    assert "prepared_statement_cache_size" not in args
+    assert args["prepared_statement_name_func"]() != args["prepared_statement_name_func"]()
+    assert _caches_statements(pool)
+
+
+def _settings(**overrides):
+    values = {
+        "db_pool_profile": "",
+        "db_pool_size": 0,
+        "db_max_overflow": -1,
+        "db_pgbouncer": False,
+        "db_pgbouncer_prepared": False,
+    }
+    values.update(overrides)
+    return SimpleNamespace(**values)
+
+
+def test_pool_config_uses_process_profile_and_overrides():
+    assert pool_config(_settings(), "worker").profile == POOL_PROFILES["worker"]
+
+    pool = pool_config(_settings(db_pool_profile="bot", db_pool_size=3, db_max_overflow=0, db_pgbouncer=True), "worker")
+
+    assert (pool.profile.size, pool.profile.max_overflow, pool.profile.timeout) == (3, 0, PROFILE.timeout)
+    assert pool.pgbouncer and not pool.pgbouncer_prepared
+
+
+def test_pool_config_rejects_unknown_profile():
+    with pytest.raises(ValueError):
+        pool_config(_settings(db_pool_profile="huge"))
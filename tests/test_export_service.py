@@ -0,0 +1,32 @@
+from datetime import date, timedelta
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+
+from app.export_service import ExportFilter, parse_export_args
+from app.models import LeadStatus
+
+
+def test_parse_export_args():
+    file_format, filters, manager = parse_export_args(
+        ["xlsx", "status=rejected,operated", "manager=Марина", "from=2026-01-01", "to=2026-01-31", "archive"]
+    )
+
+    assert file_format == "xlsx"
+    assert manager == "Марина"
+    assert filters.statuses == [LeadStatus.rejected, LeadStatus.operated]
+    assert (filters.date_from, filters.date_to) == (date(2026, 1, 1), date(2026, 1, 31))
+    assert filters.include_archive
+
+
+def test_parse_export_args_rejects_unknown():
+    with pytest.raises(ValueError):
+        parse_export_args(["pdf"])
+
+
+def test_day_start_uses_timezone():
+    start = ExportFilter(timezone="Europe/Moscow").day_start(date(2026, 1, 1))
+
+    assert start.utcoffset() == timedelta(hours=3)
+    assert start.isoformat() == "2026-01-01T00:00:00+03:00"
@@ -0,0 +1,120 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+
+pytest.importorskip("aiogram")
+pytest.importorskip("sqlalchemy")
+
+from aiogram.fsm.storage.base import StorageKey
+
+from app.fsm_storage import PostgresStorage, _dump, _load, _serialize_key
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr("app.fsm_storage.time.monotonic", clock)
+    return clock
+
+
+def test_serialize_key_is_stable_and_distinct():
+    key = StorageKey(bot_id=1, chat_id=-100500, user_id=42)
+
+    assert _serialize_key(key) == "1:-100500:42:::default"
+    assert _serialize_key(StorageKey(bot_id=1, chat_id=-100500, user_id=42, thread_id=7)) == "1:-100500:42:7::default"
+    assert _serialize_key(StorageKey(bot_id=1, chat_id=42, user_id=42)) != _serialize_key(key)
+
+
+def test_dump_is_compact_and_round_trips():
+    data = {"lead_draft": {"name": "Анна", "bmi": 31.2}}
+
+    raw = _dump(data)
+
+    assert b" " not in raw
+    assert "Анна".encode() in raw
+    assert _load(raw) == data
+    assert _load(None) == {}
+
+
+def test_cache_expires_after_ttl(clock):
+    storage = PostgresStorage(engine=None, cache_ttl=30)
+    storage._cache_put("k", "LeadFSM:waiting_comment", {})
+
+    assert storage._cache_get("k").state == "LeadFSM:waiting_comment"
+    clock.now += 31
+    assert storage._cache_get("k") is None
+
+
+def test_cache_evicts_least_recently_used(clock):
+    storage = PostgresStorage(engine=None, cache_size=2)
+    storage._cache_put("a", None, {})
+    storage._cache_put("b", None, {})
+    storage._cache_get("a")
+    storage._cache_put("c", None, {})
+
+    assert set(storage._cache) == {"a", "c"}
+
+
+def test_disabled_cache_stores_nothing():
+    storage = PostgresStorage(engine=None, cache_ttl=0)
+    storage._cache_put("k", None, {})
+
+    assert storage._cache_get("k") is None
+
+
+def test_notify_from_other_process_invalidates():
+    storage = PostgresStorage(engine=None)
+    storage._cache_put("k", None, {})
+
+    storage._on_notify(None, 0, "fsm_states", f"{storage._instance_id}|k")
+    assert storage._cache_get("k") is not None
+
+    storage._on_notify(None, 0, "fsm_states", "other|k")
+    assert storage._cache_get("k") is None
+
+
+class _Result:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def all(self):
+        return self.rows
+
+
+class _Engine:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def begin(self):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, statement):
+        return _Result(self.rows)
+
+
+def test_sweep_passes_expired_data_and_drops_cache():
+    rows = [("k1", _dump({"auto_manager_id": "m1"})), ("k2", _dump({}))]
+    storage = PostgresStorage(_Engine(rows))
+    storage._cache_put("k1", None, {})
+    expired = []
+
+    removed = asyncio.run(storage.sweep(timedelta(hours=1), expired.append))
+
+    assert removed == 2
+    assert expired == [{"auto_manager_id": "m1"}, {}]
+    assert storage._cache_get("k1") is None
@@ -0,0 +1,100 @@
+import asyncio
+import io
+
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+pytest.importorskip("aiogram")
+
+from app.image_ingest import (
+    BYTES_PER_PIXEL,
+    MAX_FILE_SIZE,
+    REJECT_FACTOR,
+    ImageIngest,
+    ImageRejected,
+    MemoryBudget,
+    decode_for_ocr,
+    image_size,
+)
+
+
+def _encode(width: int, height: int, image_format: str) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), "white").save(buffer, image_format)
+    return buffer.getvalue()
+
+
+def test_small_image_keeps_size():
+    image = decode_for_ocr(_encode(300, 200, "PNG"), max_pixels=100_000)
+
+    assert image.size == (300, 200)
+
+
+@pytest.mark.parametrize("image_format", ["JPEG", "PNG"])
+def test_large_image_is_scaled_to_max_pixels(image_format):
+    image = decode_for_ocr(_encode(1600, 1200, image_format), max_pixels=200_000)
+
+    assert image.width * image.height <= 200_000
+    assert image.width / image.height == pytest.approx(4 / 3, rel=0.02)
+
+
+def test_jpeg_is_drafted_to_grayscale():
+    image = decode_for_ocr(_encode(1600, 1200, "JPEG"), max_pixels=200_000)
+
+    assert image.mode == "L"
+
+
+def test_rejects_above_reject_factor():
+    with pytest.raises(ImageRejected):
+        decode_for_ocr(_encode(500, 500, "PNG"), max_pixels=250_000 // (REJECT_FACTOR + 1))
+
+
+def test_rejects_garbage():
+    with pytest.raises(ImageRejected):
+        decode_for_ocr(b"not an image")
+
+
+def test_image_size_reads_header():
+    assert image_size(_encode(640, 480, "PNG")) == (640, 480)
+    assert image_size(b"garbage") == (None, None)
+
+
+def test_estimate_counts_real_pixels_up_to_reject_limit():
+    ingest = ImageIngest(bot=None, max_pixels=1_000_000)
+
+    # PNG больше max_pixels декодируется целиком — оценка не должна его срезать
+    assert ingest.estimate(1000, 2000, 2000) == 1000 + 4_000_000 * BYTES_PER_PIXEL
+    assert ingest.estimate(1000, 10_000, 10_000) == 1000 + 1_000_000 * REJECT_FACTOR * BYTES_PER_PIXEL
+    assert ingest.estimate(None, None, None) == MAX_FILE_SIZE + 1_000_000 * BYTES_PER_PIXEL
+
+
+def test_reserve_memory_rejects_before_budget():
+    ingest = ImageIngest(bot=None, max_pixels=1_000)
+
+    async def scenario():
+        async with ingest.reserve_memory(10, 1_000, 1_000):
+            pass
+
+    with pytest.raises(ImageRejected):
+        asyncio.run(scenario())
+    assert ingest.budget.in_use == 0
+
+
+def test_budget_waits_for_release():
+    async def scenario():
+        budget = MemoryBudget(100)
+        order = []
+
+        async def user(name, amount, hold):
+            async with budget.reserve(amount):
+                order.append(name)
+                await asyncio.sleep(hold)
+
+        await asyncio.gather(user("a", 80, 0.02), user("b", 50, 0), user("c", 500, 0))
+        return order, budget.in_use
+
+    order, in_use = asyncio.run(scenario())
+
+    assert order[0] == "a"
+    assert set(order) == {"a", "b", "c"}
+    assert in_use == 0
@@ -0,0 +1,79 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+
+from app.job_queue import MAX_ATTEMPTS, JobQueue
+from app.metrics import JOB_SECONDS
+
+
+class _Session:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class _FakeQueue(JobQueue):
+    """Очередь без базы: _claim отдаёт задачи из списка, _finish их запоминает."""
+
+    def __init__(self, jobs):
+        super().__init__(_Session)
+        self.jobs = list(jobs)
+        self.finished = []
+
+    async def _claim(self, session):
+        return self.jobs.pop(0) if self.jobs else None
+
+    async def _finish(self, session, job, error):
+        self.finished.append((job.kind, error))
+
+
+def _job(kind):
+    return SimpleNamespace(id=1, kind=kind, attempts=1)
+
+
+def test_limit_caps_concurrent_jobs_of_kind():
+    async def scenario():
+        queue = _FakeQueue([_job("photo") for _ in range(5)])
+        running = peak = 0
+
+        async def handler(job):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+        queue.register("photo", handler, limit=2)
+        await asyncio.gather(*(queue.run_once() for _ in range(5)))
+        return peak, queue.finished
+
+    peak, finished = asyncio.run(scenario())
+
+    assert peak == 2
+    assert finished == [("photo", None)] * 5
+
+
+def test_unknown_kind_is_recorded_as_error():
+    queue = _FakeQueue([_job("missing")])
+
+    assert asyncio.run(queue.run_once()) is True
+    assert queue.finished[0][1].startswith("RuntimeError")
+
+
+@pytest.mark.parametrize(("attempts", "outcome"), [(1, "retry"), (MAX_ATTEMPTS, "failed")])
+def test_job_seconds_outcome(attempts, outcome):
+    job = SimpleNamespace(id=1, kind=f"broken-{attempts}", attempts=attempts)
+    queue = _FakeQueue([job])
+
+    async def handler(job):
+        raise ValueError("boom")
+
+    queue.register(job.kind, handler)
+    asyncio.run(queue.run_once())
+
+    assert JOB_SECONDS._series[(job.kind, outcome)][-2] == 1
@@ -0,0 +1,87 @@
+import asyncio
+import uuid
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("aiogram")
+pytest.importorskip("sqlalchemy")
+
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from app.handlers import cmd_cancel
+from app.lead_pipeline import PhotoPipeline
+from app.routing import ManagerRouter, ManagerSlot
+
+
+class _Bot:
+    id = 1
+
+    async def edit_message_text(self, **kwargs):
+        pass
+
+
+class _Parser:
+    async def parse_lead_text(self, raw_text):
+        return {"name": "Анна", "phone": "+79990000000"}
+
+
+class _Result:
+    def scalars(self):
+        return self
+
+    def all(self):
+        return []
+
+
+class _Session:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, statement):
+        return _Result()
+
+
+class _Message:
+    async def answer(self, text):
+        pass
+
+
+def _pipeline(router: ManagerRouter) -> PhotoPipeline:
+    pipeline = PhotoPipeline(_Bot(), MemoryStorage(), _Session, None, _Parser(), None, manager_router=router)
+
+    async def recognize(payload):
+        return "Анна +79990000000"
+
+    pipeline._recognize = recognize
+    return pipeline
+
+
+def test_manual_draft_drops_previous_auto_assignment():
+    anna = ManagerSlot(uuid.uuid4(), "Анна", 1.0, None, None)
+    router = ManagerRouter("Europe/Moscow")
+    router.managers = [anna]
+    router.assign(anna.id)  # уже сохранённый лид Анны
+    pipeline = _pipeline(router)
+    payload = {"chat_id": 10, "user_id": 10, "progress_message_id": 5}
+
+    async def scenario():
+        await pipeline.process(payload)
+        assert router.load[anna.id] == 2
+
+        # смена Анны закончилась — следующее фото уходит на ручной выбор
+        router.managers = []
+        await pipeline.process(payload)
+        state = pipeline._state(payload)
+        data = await state.get_data()
+        assert data["manager_id"] is None and data["auto_manager_id"] is None
+
+        await cmd_cancel(_Message(), FSMContext(storage=pipeline.storage, key=state.key), router)
+
+    asyncio.run(scenario())
+
+    assert router.load[anna.id] == 1
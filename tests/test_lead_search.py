@@ -0,0 +1,63 @@
+import pytest
+
+pytest.importorskip("sqlalchemy")
+
+from app.lead_search import _conditions, _pattern, _phone_digits, normalize_query
+
+
+def _patterns(query: str) -> set[tuple[str, str]]:
+    """(колонка, шаблон LIKE) всех условий поиска."""
+
+    return {(condition.left.name, condition.right.value) for condition in _conditions(query)}
+
+
+def test_normalize_query_strips_spaces_and_at():
+    assert normalize_query("  @ivan_petrov ") == "ivan_petrov"
+    assert normalize_query("@ ivan") == "ivan"
+    assert normalize_query("Анна") == "Анна"
+
+
+def test_phone_digits_requires_three_digits():
+    assert _phone_digits("12") is None
+    assert _phone_digits("1 2") is None
+    assert _phone_digits("123") == "123"
+
+
+def test_phone_digits_normalizes_leading_eight():
+    assert _phone_digits("8 (999) 123-45") == "799912345"
+
+
+def test_phone_digits_ignores_text():
+    assert _phone_digits("Анна 123") is None
+
+
+def test_short_pattern_is_prefix():
+    assert _pattern("ab") == "ab%"
+    assert _pattern("abc") == "%abc%"
+
+
+def test_pattern_escapes_like_wildcards():
+    assert _pattern("50%_off") == "%50\\%\\_off%"
+
+
+def test_short_digit_query_has_no_phone_condition():
+    assert "phone" not in {column for column, _ in _patterns("12")}
+
+
+def test_phone_condition_uses_normalized_digits():
+    assert ("phone", "%7999%") in _patterns("8999")
+
+
+def test_all_fields_use_the_normalized_query():
+    patterns = _patterns(normalize_query("  @ivan"))
+    assert patterns == {
+        ("name", "%ivan%"),
+        ("telegram_username", "%ivan%"),
+        ("email", "%ivan%"),
+    }
+
+
+def test_short_telegram_prefix_also_matches_stored_at():
+    patterns = _patterns("iv")
+    assert ("telegram_username", "iv%") in patterns
+    assert ("telegram_username", "@iv%") in patterns
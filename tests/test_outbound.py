@@ -0,0 +1,83 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("aiogram")
+
+from app.outbound import OutboundQueue, TokenBucket
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr("app.outbound.time.monotonic", clock)
+    return clock
+
+
+def test_bucket_burst_then_waits(clock):
+    bucket = TokenBucket(rate=2, burst=2)
+
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == pytest.approx(0.5)
+    assert bucket.reserve() == pytest.approx(1.0)
+
+
+def test_bucket_refills_up_to_burst(clock):
+    bucket = TokenBucket(rate=1, burst=2)
+    bucket.reserve()
+    bucket.reserve()
+
+    clock.now += 10
+
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == pytest.approx(1.0)
+
+
+def test_bucket_block(clock):
+    bucket = TokenBucket(rate=1, burst=5)
+
+    bucket.block(30)
+
+    assert bucket.reserve() == pytest.approx(31)
+
+
+class _Bot:
+    def __init__(self, delay):
+        self.delay = delay
+        self.sent = []
+
+    async def send_message(self, **kwargs):
+        await asyncio.sleep(self.delay)
+        self.sent.append(kwargs)
+        return SimpleNamespace(message_id=len(self.sent), chat=SimpleNamespace(id=kwargs["chat_id"]))
+
+
+def test_timeout_applies_to_request_only():
+    async def scenario():
+        # второе сообщение ждёт лимита чата дольше своего timeout, но запрос быстрый
+        queue = OutboundQueue(_Bot(delay=0), chat_rate=20)
+        first = queue.send_message(1, "a", timeout=0.02)
+        second = queue.send_message(1, "b", timeout=0.02)
+        return (await first).message_id, (await second).message_id
+
+    assert asyncio.run(scenario()) == (1, 2)
+
+
+def test_slow_request_times_out():
+    async def scenario():
+        queue = OutboundQueue(_Bot(delay=1), chat_rate=20)
+        return await queue.send_message(1, "a", timeout=0.01)
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(scenario())
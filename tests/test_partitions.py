@@ -0,0 +1,89 @@
+import asyncio
+from datetime import date
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+
+from app.partitions import (
+    _PARTITION_SUFFIX,
+    _add_months,
+    _next_period,
+    _period_start,
+    ensure_partition_for,
+    ensure_partitions,
+    partition_name,
+)
+
+
+def test_add_months_crosses_year():
+    assert _add_months(date(2024, 11, 15), 2) == date(2025, 1, 1)
+    assert _add_months(date(2024, 1, 31), -1) == date(2023, 12, 1)
+    assert _add_months(date(2024, 5, 1), -17) == date(2022, 12, 1)
+
+
+def test_period_start():
+    assert _period_start(date(2024, 5, 17), "month") == date(2024, 5, 1)
+    assert _period_start(date(2024, 5, 17), "year") == date(2024, 1, 1)
+
+
+def test_next_period():
+    assert _next_period(date(2024, 12, 1), "month") == date(2025, 1, 1)
+    assert _next_period(date(2024, 1, 1), "year") == date(2025, 1, 1)
+
+
+def test_partition_name():
+    assert partition_name("leads", date(2024, 3, 1), "month") == "leads_p202403"
+    assert partition_name("leads_archive", date(2024, 1, 1), "year") == "leads_archive_p2024"
+
+
+@pytest.mark.parametrize(
+    ("table", "start", "unit"),
+    [("leads", date(2024, 3, 1), "month"), ("leads_archive", date(2023, 1, 1), "year")],
+)
+def test_partition_suffix_round_trip(table, start, unit):
+    match = _PARTITION_SUFFIX.search(partition_name(table, start, unit))
+    month = int(match.group(2)) if match.group(2) else 1
+    assert date(int(match.group(1)), month, 1) == start
+
+
+def test_default_partition_has_no_suffix():
+    assert _PARTITION_SUFFIX.search("leads_default") is None
+
+
+class _Connection:
+    def __init__(self, relkind=None, existing=()):
+        self.relkind = relkind
+        self.existing = set(existing)
+        self.statements = []
+
+    async def execute(self, statement, params=None):
+        sql = str(statement)
+        self.statements.append(sql)
+        if "relkind" in sql:
+            value = self.relkind
+        elif "to_regclass" in sql:
+            value = params["name"] in self.existing
+        else:
+            value = False
+        return SimpleNamespace(scalar_one=lambda: value, scalar_one_or_none=lambda: value)
+
+
+def test_unpartitioned_leads_points_to_migration():
+    with pytest.raises(RuntimeError, match="migrate_partition_leads.py"):
+        asyncio.run(ensure_partitions(_Connection(relkind="r"), "leads"))
+
+
+def test_partition_for_old_row_is_created_once():
+    connection = _Connection(existing={"leads_default"})
+    asyncio.run(ensure_partition_for(connection, "leads", date(2021, 7, 19)))
+
+    created = [sql for sql in connection.statements if sql.startswith("CREATE TABLE")]
+    assert created == [
+        "CREATE TABLE IF NOT EXISTS leads_p202107 PARTITION OF leads FOR VALUES FROM ('2021-07-01') TO ('2021-08-01')"
+    ]
+
+    connection = _Connection(existing={"leads_p202107"})
+    asyncio.run(ensure_partition_for(connection, "leads", date(2021, 7, 19)))
+    assert not any(sql.startswith("CREATE TABLE") for sql in connection.statements)
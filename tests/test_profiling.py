@@ -0,0 +1,56 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("aiogram")
+
+from app.metrics import stage
+from app.profiling import UpdateProfiler
+
+
+def _job():
+    return SimpleNamespace(id=7, kind="photo", attempts=1, payload={"file_id": "x", "file_size": 1024})
+
+
+def test_slow_job_is_recorded_with_stages(tmp_path):
+    profiler = UpdateProfiler(str(tmp_path), sample_rate=0, slow_threshold=0.01)
+
+    async def handler(job):
+        with stage("ocr", engine="test"):
+            await asyncio.sleep(0.03)
+
+    asyncio.run(profiler.run_job(_job(), handler))
+
+    [record] = profiler.slowest()
+    assert record["kind"] == "job:photo"
+    assert record["job_id"] == "7"
+    assert record["input"] == {"file_size": 1024}
+    assert [item["stage"] for item in record["stages"]] == ["ocr"]
+    assert record["profile"] == "tail"
+    assert profiler.profile_path(record["id"]) is not None
+
+
+def test_fast_job_is_not_recorded(tmp_path):
+    profiler = UpdateProfiler(str(tmp_path), sample_rate=0, slow_threshold=10)
+
+    async def handler(job):
+        pass
+
+    asyncio.run(profiler.run_job(_job(), handler))
+
+    assert profiler.slowest() == []
+
+
+def test_failed_job_error_is_recorded(tmp_path):
+    profiler = UpdateProfiler(str(tmp_path), sample_rate=1, slow_threshold=0)
+
+    async def handler(job):
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        asyncio.run(profiler.run_job(_job(), handler))
+
+    [record] = profiler.slowest()
+    assert record["error"] == "ValueError: boom"
+    assert record["profile"] == "sampled"
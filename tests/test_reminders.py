@@ -0,0 +1,41 @@
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+import pytest
+
+pytest.importorskip("aiogram")
+pytest.importorskip("sqlalchemy")
+
+from app.reminders import MORNING, ReminderScheduler, preset_due
+
+
+MOSCOW = ZoneInfo("Europe/Moscow")
+
+
+def test_hour_presets_are_relative():
+    now = datetime(2026, 3, 10, 21, 30, tzinfo=MOSCOW)
+
+    assert preset_due("1h", MOSCOW, now) == now + timedelta(hours=1)
+    assert preset_due("3h", MOSCOW, now) == datetime(2026, 3, 11, 0, 30, tzinfo=MOSCOW)
+
+
+@pytest.mark.parametrize(("preset", "day"), [("1d", 11), ("3d", 13), ("7d", 17)])
+def test_day_presets_land_on_morning(preset, day):
+    now = datetime(2026, 3, 10, 23, 50, tzinfo=MOSCOW)
+
+    due = preset_due(preset, MOSCOW, now)
+
+    assert due == datetime(2026, 3, day, MORNING.hour, MORNING.minute, tzinfo=MOSCOW)
+
+
+def test_day_preset_uses_local_date():
+    # 22:30 UTC — уже следующий день в Москве
+    now = datetime(2026, 3, 10, 22, 30, tzinfo=timezone.utc)
+
+    assert preset_due("1d", MOSCOW, now) == datetime(2026, 3, 12, 10, 0, tzinfo=MOSCOW)
+
+
+def test_window_never_exceeds_shortest_preset():
+    scheduler = ReminderScheduler(None, None, "Europe/Moscow", window_seconds=7200)
+
+    assert scheduler.window == timedelta(hours=1)
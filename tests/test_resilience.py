@@ -0,0 +1,119 @@
+import asyncio
+
+import pytest
+
+from app.resilience import CLOSED, HALF_OPEN, OPEN, Breakers, CircuitBreaker, CircuitOpenError
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr("app.resilience.time.monotonic", clock)
+    return clock
+
+
+def test_opens_after_threshold(clock):
+    breaker = CircuitBreaker("sheets:x", failure_threshold=2, reset_timeout=60)
+
+    breaker.acquire()
+    breaker.record_failure(RuntimeError("1"))
+    assert breaker.state == CLOSED
+
+    breaker.acquire()
+    breaker.record_failure(RuntimeError("2"))
+    assert breaker.state == OPEN
+    assert breaker.trips == 1
+
+    with pytest.raises(CircuitOpenError):
+        breaker.acquire()
+
+
+def test_success_resets_failures(clock):
+    breaker = CircuitBreaker("sheets:x", failure_threshold=2, reset_timeout=60)
+
+    breaker.record_failure(RuntimeError("1"))
+    breaker.record_success()
+    breaker.record_failure(RuntimeError("2"))
+
+    assert breaker.state == CLOSED
+
+
+def test_half_open_lets_one_probe(clock):
+    breaker = CircuitBreaker("sheets:x", failure_threshold=1, reset_timeout=60)
+    breaker.record_failure(RuntimeError("down"))
+
+    clock.now += 61
+    breaker.acquire()
+    assert breaker.state == HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.acquire()
+
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    breaker.acquire()
+
+
+def test_failed_probe_reopens(clock):
+    breaker = CircuitBreaker("sheets:x", failure_threshold=3, reset_timeout=60)
+    for _ in range(3):
+        breaker.record_failure(RuntimeError("down"))
+
+    clock.now += 61
+    breaker.acquire()
+    breaker.record_failure(RuntimeError("still down"))
+
+    assert breaker.state == OPEN
+    assert breaker.trips == 2
+    assert breaker.retry_after == 60
+
+
+def test_cancelled_probe_is_released(clock):
+    breaker = CircuitBreaker("sheets:x", failure_threshold=1, reset_timeout=60)
+    breaker.record_failure(RuntimeError("down"))
+    clock.now += 61
+
+    breaker.acquire()
+    breaker.release()
+    breaker.acquire()
+
+    assert breaker.state == HALF_OPEN
+
+
+def test_call_timeout_counts_as_failure():
+    breakers = Breakers(failure_threshold=1, reset_timeout=60)
+
+    async def slow():
+        await asyncio.sleep(1)
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(breakers.call("sheets:x", slow, timeout=0.01))
+
+    assert breakers.get("sheets:x").state == OPEN
+
+
+def test_watch_records_outcome_when_future_completes():
+    breakers = Breakers(failure_threshold=1, reset_timeout=60)
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        future = breakers.watch("telegram:1", loop.create_future)
+        # долгое ожидание в очереди — ещё не отказ
+        await asyncio.sleep(0.01)
+        assert breakers.get("telegram:1").state == CLOSED
+
+        future.set_exception(asyncio.TimeoutError())
+        await asyncio.sleep(0)
+
+    asyncio.run(scenario())
+
+    assert breakers.get("telegram:1").state == OPEN
+    with pytest.raises(CircuitOpenError):
+        breakers.watch("telegram:1", lambda: None)
@@ -0,0 +1,120 @@
+import asyncio
+import uuid
+from datetime import datetime, time
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+
+from app.models import LeadStatus
+from app.routing import ManagerRouter, ManagerSlot
+
+
+def _router(*slots: ManagerSlot) -> ManagerRouter:
+    router = ManagerRouter("Europe/Moscow")
+    router.managers = list(slots)
+    return router
+
+
+def _slot(name: str, weight: float = 1.0, hours: tuple = (None, None)) -> ManagerSlot:
+    return ManagerSlot(uuid.uuid4(), name, weight, *hours)
+
+
+def test_pick_balances_by_load_and_weight():
+    anna, boris = _slot("Анна", weight=2), _slot("Борис")
+    router = _router(anna, boris)
+
+    picked = [router.pick().name for _ in range(3)]
+
+    assert sorted(picked) == ["Анна", "Анна", "Борис"]
+    assert router.load[anna.id] == 2
+
+
+def test_pick_skips_managers_off_shift():
+    night = _slot("Ночь", hours=(time(22), time(6)))
+    router = _router(night)
+
+    assert router.pick(datetime(2026, 1, 1, 12, 0, tzinfo=router.timezone)) is None
+    assert router.pick(datetime(2026, 1, 1, 23, 0, tzinfo=router.timezone)) is night
+
+
+def test_release_draft_drops_auto_assignment():
+    anna = _slot("Анна")
+    router = _router(anna)
+    router.pick()
+
+    router.release_draft({"lead_draft": {}, "auto_manager_id": str(anna.id)})
+    router.release_draft({"lead_draft": {}})
+
+    assert router.load[anna.id] == 0
+
+
+def test_release_never_goes_negative():
+    anna = _slot("Анна")
+    router = _router(anna)
+
+    router.release_draft({"auto_manager_id": str(anna.id)})
+
+    assert router.load[anna.id] == 0
+
+
+def test_status_change_moves_load():
+    manager_id = uuid.uuid4()
+    router = _router()
+    router.assign(manager_id)
+
+    router.on_status_change(manager_id, LeadStatus.new, LeadStatus.rejected)
+    assert router.load[manager_id] == 0
+
+    router.on_status_change(manager_id, LeadStatus.rejected, LeadStatus.new)
+    assert router.load[manager_id] == 1
+
+
+class _Result:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def scalars(self):
+        return self
+
+    def all(self):
+        return self.rows
+
+
+class _Session:
+    def __init__(self, managers, counts):
+        self.results = [_Result(managers), _Result(counts)]
+
+    async def execute(self, statement):
+        return self.results.pop(0)
+
+
+def test_reconcile_keeps_draft_reservations():
+    anna = _slot("Анна")
+    router = _router(anna)
+    router.pick()
+    manager = SimpleNamespace(
+        id=anna.id, name=anna.name, routing_weight=1.0, available_from=None, available_to=None,
+    )
+
+    drift = asyncio.run(router.reconcile(_Session([manager], [(anna.id, 3)])))
+
+    assert router.load[anna.id] == 4
+    assert drift == 3
+
+    router.release_draft({"auto_manager_id": str(anna.id)})
+    assert router.load[anna.id] == 3
+
+
+def test_confirm_draft_turns_reservation_into_lead():
+    anna = _slot("Анна")
+    router = _router(anna)
+    router.pick()
+    data = {"auto_manager_id": str(anna.id)}
+
+    router.confirm_draft(data)
+    router.release_draft(data)
+
+    assert router.load[anna.id] == 1
+    assert router.reserved[anna.id] == 0
@@ -0,0 +1,46 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("aiogram")
+pytest.importorskip("sqlalchemy")
+
+from app.resilience import Breakers
+from app.sinks import LeadSinks
+
+
+class _Outbound:
+    def __init__(self, error=None):
+        self.error = error
+
+    def send_message(self, **kwargs):
+        future = asyncio.get_running_loop().create_future()
+        if self.error is not None:
+            future.set_exception(self.error)
+        return future
+
+
+def _sinks(outbound: _Outbound) -> tuple[LeadSinks, list]:
+    sinks = LeadSinks(None, outbound, Breakers(), None, None, sheets_timeout=1.0, telegram_timeout=0.01)
+    enqueued = []
+
+    async def enqueue(payload, delay):
+        enqueued.append(payload)
+        return True
+
+    sinks._enqueue = enqueue
+    return sinks, enqueued
+
+
+def test_card_request_timeout_is_deferred():
+    sinks, enqueued = _sinks(_Outbound(asyncio.TimeoutError()))
+
+    assert asyncio.run(sinks.send_card(-100500, "lead", "text")) is None
+    assert [payload["op"] for payload in enqueued] == ["card"]
+
+
+def test_card_still_queued_is_not_repeated():
+    sinks, enqueued = _sinks(_Outbound())
+
+    assert asyncio.run(sinks.send_card(-100500, "lead", "text")) is None
+    assert enqueued == []
@@ -0,0 +1,55 @@
+import asyncio
+import uuid
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.sql.dml import Insert
+
+from app.models import LeadStatus
+from app.stats_service import UPSERT_CHUNK_ROWS, StatsService
+
+
+class _Session:
+    def __init__(self, drift_rows):
+        self.drift_rows = drift_rows
+        self.inserts = []
+
+    async def connection(self, **kwargs):
+        pass
+
+    async def commit(self):
+        pass
+
+    async def execute(self, statement):
+        if isinstance(statement, Insert):
+            self.inserts.append(statement.compile(dialect=postgresql.dialect()))
+        rows = [SimpleNamespace(_mapping=row) for row in self.drift_rows]
+        self.drift_rows = []
+        return SimpleNamespace(all=lambda: rows)
+
+
+def test_reconcile_upserts_drift_in_chunks():
+    manager_id = uuid.uuid4()
+    rows = [
+        {
+            "day": date(2020, 1, 1) + timedelta(days=i),
+            "manager_id": manager_id,
+            "manager_status": LeadStatus.new,
+            "lead_type": "hot",
+            "leads_count": 1,
+        }
+        for i in range(UPSERT_CHUNK_ROWS + 10)
+    ]
+    session = _Session(rows)
+
+    fixed = asyncio.run(StatsService("Europe/Moscow").reconcile(session))
+
+    assert fixed == len(rows)
+    assert len(session.inserts) == 2
+    assert all(len(compiled.params) <= 32767 for compiled in session.inserts)
+    assert sum(len(compiled.params) for compiled in session.inserts) == len(rows) * 5